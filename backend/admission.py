@@ -0,0 +1,278 @@
+import asyncio
+import contextlib
+import math
+import os
+import time
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+
+import metrics
+
+# -------------------------------
+# Admission Control
+# -------------------------------
+# Graph executions (the LLM-bound work behind /chat, /vision, /pdf and
+# /generate-image) go through one scheduler instead of all starting at once:
+#
+#   rate limits   token buckets per user (JWT subject) and, optionally, for all
+#                 users together; an empty bucket is a 429 with Retry-After
+#   concurrency   at most ADMISSION_MAX_CONCURRENT executions in flight, and
+#                 ADMISSION_USER_CONCURRENT per user
+#   queue         the rest wait, chat turns first (ADMISSION_PRIORITIES), for
+#                 at most ADMISSION_MAX_WAIT seconds. The queue holds
+#                 ADMISSION_QUEUE_SIZE requests; when it is full, a request
+#                 displaces a lower-priority waiter or is turned away with a
+#                 503 and Retry-After
+#
+# Anonymous requests (AUTH_REQUIRED=off, no token) have no subject and only
+# count against the global limits.
+ADMISSION = os.getenv("ADMISSION", "on") == "on"
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "64"))
+ADMISSION_USER_CONCURRENT = int(os.getenv("ADMISSION_USER_CONCURRENT", "4"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "256"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+# "RATE/BURST": requests per second refilled, bucket size; empty disables
+USER_RATE_LIMIT = os.getenv("USER_RATE_LIMIT", "1/20")
+GLOBAL_RATE_LIMIT = os.getenv("GLOBAL_RATE_LIMIT", "")
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", "10000"))
+
+
+def parse_rate(spec: str):
+    """(rate, burst) from "RATE/BURST" (burst defaults to one second of rate), or None."""
+    if not spec.strip():
+        return None
+    rate, _, burst = spec.partition("/")
+    return float(rate), float(burst or max(1.0, float(rate)))
+
+
+def parse_priorities(spec: str) -> dict:
+    """Lower runs first: "chat=0,vision=1,pdf=2,generate-image=2"."""
+    return {name.strip(): int(p) for name, _, p in (item.partition("=") for item in spec.split(",")) if p}
+
+
+ADMISSION_PRIORITIES = parse_priorities(os.getenv("ADMISSION_PRIORITIES", "chat=0,vision=1,pdf=2,generate-image=2"))
+
+# JWT subject of the request, set by main.py's request dependency
+current_user = ContextVar("current_user", default=None)
+
+
+class Rejected(Exception):
+    """The request was not admitted: a 429 or 503 to return with Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1) -> float:
+        """Take `cost` tokens; returns 0, or the seconds until they are available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class Waiter:
+    __slots__ = ("priority", "seq", "user", "kind", "future")
+
+    def __init__(self, priority: int, seq: int, user, kind: str, future: asyncio.Future):
+        self.priority, self.seq, self.user, self.kind, self.future = priority, seq, user, kind, future
+
+    def order(self) -> tuple:
+        return self.priority, self.seq
+
+
+class Scheduler:
+    def __init__(self, enabled: bool = ADMISSION, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 user_concurrent: int = ADMISSION_USER_CONCURRENT, queue_size: int = ADMISSION_QUEUE_SIZE,
+                 max_wait: float = ADMISSION_MAX_WAIT, user_rate=parse_rate(USER_RATE_LIMIT),
+                 global_rate=parse_rate(GLOBAL_RATE_LIMIT), priorities: dict = ADMISSION_PRIORITIES):
+        self.enabled = enabled
+        self.max_concurrent = max_concurrent
+        self.user_concurrent = user_concurrent
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.user_rate = user_rate
+        self.priorities = priorities
+        self.in_flight = 0
+        self.peak = 0
+        self._user_in_flight = defaultdict(int)
+        self._waiting = []
+        self._seq = 0
+        self._user_buckets = OrderedDict()     # LRU of per-user buckets
+        self._global_bucket = TokenBucket(*global_rate) if global_rate else None
+        self._service_seconds = 1.0            # moving average of an execution, for Retry-After
+
+    # Rate limits
+    def max_cost(self, user=None) -> float:
+        """The most tokens one request can take at once (the smallest burst that applies)."""
+        if not self.enabled:
+            return math.inf
+        bursts = [self.user_rate[1]] if user is not None and self.user_rate else []
+        if self._global_bucket:
+            bursts.append(self._global_bucket.burst)
+        return min(bursts, default=math.inf)
+
+    def check_rate(self, kind: str, user=None, cost: int = 1):
+        """Take `cost` tokens for the request; raises Rejected (429) when a bucket is short."""
+        if not self.enabled or cost <= 0:
+            return
+        wait = 0.0
+        if user is not None and self.user_rate:
+            bucket = self._user_buckets.get(user)
+            if bucket is None:
+                bucket = self._user_buckets[user] = TokenBucket(*self.user_rate)
+                if len(self._user_buckets) > RATE_LIMIT_MAX_USERS:
+                    self._user_buckets.popitem(last=False)
+            self._user_buckets.move_to_end(user)
+            wait = bucket.take(cost)
+        if not wait and self._global_bucket:
+            wait = self._global_bucket.take(cost)
+        if wait:
+            metrics.ADMISSION_DECISIONS.inc(kind=kind, outcome="rate_limited")
+            raise Rejected(429, "Rate limit exceeded; slow down.", wait)
+
+    # Concurrency and the wait queue
+    def _can_run(self, user) -> bool:
+        if self.in_flight >= self.max_concurrent:
+            return False
+        return user is None or not self.user_concurrent or self._user_in_flight.get(user, 0) < self.user_concurrent
+
+    def _start(self, user):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        if user is not None:
+            self._user_in_flight[user] += 1
+
+    def _finish(self, user, seconds: float = None):
+        self.in_flight -= 1
+        if user is not None:
+            self._user_in_flight[user] -= 1
+            if not self._user_in_flight[user]:
+                del self._user_in_flight[user]
+        if seconds is not None:
+            self._service_seconds += 0.1 * (seconds - self._service_seconds)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Start waiters, best priority first, while there is capacity for them."""
+        for waiter in sorted(self._waiting, key=Waiter.order):
+            if self.in_flight >= self.max_concurrent:
+                break
+            if self._can_run(waiter.user):
+                self._waiting.remove(waiter)
+                self._start(waiter.user)
+                waiter.future.set_result(True)
+
+    def retry_after(self) -> float:
+        """Rough seconds until the queue has drained enough to take another request."""
+        return self._service_seconds * (len(self._waiting) + 1) / max(1, self.max_concurrent)
+
+    def _enqueue(self, kind: str, user, priority: int) -> Waiter:
+        if len(self._waiting) >= self.queue_size:
+            worst = max(self._waiting, key=Waiter.order, default=None)
+            if worst is None or worst.priority <= priority:
+                metrics.ADMISSION_DECISIONS.inc(kind=kind, outcome="queue_full")
+                raise Rejected(503, "Server is at capacity; retry shortly.", self.retry_after())
+            # Full, but this request outranks the newest lowest-priority waiter
+            self._waiting.remove(worst)
+            metrics.ADMISSION_DECISIONS.inc(kind=worst.kind, outcome="displaced")
+            worst.future.set_exception(Rejected(503, "Server is at capacity; retry shortly.", self.retry_after()))
+        self._seq += 1
+        waiter = Waiter(priority, self._seq, user, kind, asyncio.get_running_loop().create_future())
+        self._waiting.append(waiter)
+        # Waiters blocked only by their own user's limit don't hold up others
+        self._dispatch()
+        return waiter
+
+    async def _wait(self, waiter: Waiter):
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                # Started just as the wait ran out, or displaced (re-raises its Rejected)
+                waiter.future.result()
+                return
+            if waiter in self._waiting:
+                self._waiting.remove(waiter)
+            metrics.ADMISSION_DECISIONS.inc(kind=waiter.kind, outcome="timeout")
+            raise Rejected(503, "Timed out waiting for capacity; retry shortly.", self.retry_after())
+        except asyncio.CancelledError:
+            # Client gone: give back the slot if it was granted meanwhile
+            if waiter.future.done() and not waiter.future.cancelled() and not waiter.future.exception():
+                self._finish(waiter.user)
+            elif waiter in self._waiting:
+                self._waiting.remove(waiter)
+            raise
+
+    async def acquire(self, kind: str, user=None) -> "Ticket":
+        """
+        An execution slot, waiting for one in priority order. Raises Rejected
+        (503) when the queue is full or the wait runs out.
+        """
+        if not self.enabled:
+            return Ticket(None, user)
+        start = time.perf_counter()
+        if self._waiting or not self._can_run(user):
+            await self._wait(self._enqueue(kind, user, self.priorities.get(kind, max(self.priorities.values(), default=0))))
+        else:
+            self._start(user)
+        metrics.ADMISSION_WAIT.observe(time.perf_counter() - start, kind=kind)
+        metrics.ADMISSION_DECISIONS.inc(kind=kind, outcome="admitted")
+        return Ticket(self, user)
+
+    @contextlib.asynccontextmanager
+    async def admit(self, kind: str, user=None):
+        """Hold an execution slot for the body (see `acquire`)."""
+        ticket = await self.acquire(kind, user)
+        try:
+            yield
+        finally:
+            ticket.release()
+
+    def queue_depth(self) -> dict:
+        depth = defaultdict(int)
+        for waiter in self._waiting:
+            depth[waiter.kind] += 1
+        return dict(depth)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "peak": self.peak,
+            "max_concurrent": self.max_concurrent,
+            "user_concurrent": self.user_concurrent,
+            "waiting": len(self._waiting),
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue_depth(),
+            "service_seconds": round(self._service_seconds, 3),
+        }
+
+
+class Ticket:
+    """A granted slot; `release` may be called more than once."""
+
+    def __init__(self, scheduler, user):
+        self.scheduler = scheduler
+        self.user = user
+        self.start = time.perf_counter()
+
+    def release(self):
+        if self.scheduler is not None:
+            scheduler, self.scheduler = self.scheduler, None
+            scheduler._finish(self.user, time.perf_counter() - self.start)
+
+
+scheduler = Scheduler()
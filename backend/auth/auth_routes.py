@@ -1,20 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
-from . import models, hashing, token
-from .database import SessionLocal, engine
-
-models.Base.metadata.create_all(bind=engine)
+from . import models, token
+from .hashing import hash_pool, HashingBusy
+from .database import SessionLocal, init_models
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-# Database Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+# Database Dependency (a pooled async session per request)
+async def get_db():
+    await init_models()
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # Schemas
 class UserCreate(BaseModel):
@@ -27,29 +26,69 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+async def find_user(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+def _insert_ignoring_duplicates(dialect: str):
+    """INSERT ... ON CONFLICT (email) DO NOTHING where the dialect has it."""
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(models.User).on_conflict_do_nothing(index_elements=["email"])
+
+async def create_user(db: AsyncSession, username: str, email: str, password: str) -> bool:
+    """
+    Insert a user in one statement, relying on the unique email index instead
+    of a check-then-insert; False if the email is already registered.
+    """
+    values = {"username": username, "email": email, "password": password}
+    statement = _insert_ignoring_duplicates(db.bind.dialect.name)
+    try:
+        if statement is None:
+            await db.execute(insert(models.User).values(**values))
+            created = True
+        else:
+            created = (await db.execute(statement.values(**values))).rowcount == 1
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    return created
+
+def busy(e: HashingBusy) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e),
+                         headers={"Retry-After": str(e.retry_after)})
+
 # Signup Route
+# Argon2 runs in the hashing process pool and the DB through the async engine,
+# so neither blocks the event loop the model endpoints run on.
 @router.post("/signup")
-def signup(request: UserCreate, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == request.email).first()
-    if user:
-        raise HTTPException(status_code=400, detail="Email already registered")
+async def signup(request: UserCreate, db: AsyncSession = Depends(get_db)):
     if request.password != request.confirm_password:
         raise HTTPException(status_code=400, detail="Passwords do not match")
 
-    hashed_pass = hashing.hash_password(request.password)
-    new_user = models.User(username=request.username, email=request.email, password=hashed_pass)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        hashed_pass = await hash_pool.hash(request.password)
+    except HashingBusy as e:
+        raise busy(e)
+    if not await create_user(db, request.username, request.email, hashed_pass):
+        raise HTTPException(status_code=400, detail="Email already registered")
     return {"message": "User created successfully"}
 
 # Login Route
 @router.post("/login")
-def login(request: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == request.email).first()
+async def login(request: UserLogin, db: AsyncSession = Depends(get_db)):
+    user = await find_user(db, request.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if not hashing.verify_password(request.password, user.password):
+    try:
+        verified = await hash_pool.verify(request.password, user.password)
+    except HashingBusy as e:
+        raise busy(e)
+    if not verified:
         raise HTTPException(status_code=400, detail="Incorrect password")
 
     access_token = token.create_access_token(data={"sub": user.email})
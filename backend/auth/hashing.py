@@ -1,7 +1,29 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
+# -------------------------------
+# Password Hashing Pool
+# -------------------------------
+# Argon2 is deliberately CPU- and memory-heavy, so hashing and verification run
+# in a small dedicated process pool instead of the event loop or the threadpool
+# shared with the rest of the app: a login storm can use at most
+# PASSWORD_HASH_WORKERS cores. Admission control: at most PASSWORD_HASH_QUEUE
+# calls may wait for a worker; beyond that callers get HashingBusy right away
+# (503 with Retry-After) rather than queueing without bound.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, min((os.cpu_count() or 2) // 2, 4)))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+# Workers also run at a lower CPU priority, so request handling wins on busy cores
+PASSWORD_HASH_NICE = int(os.getenv("PASSWORD_HASH_NICE", "10"))
+
+
 def hash_password(password: str):
     """Hashes a password using Argon2."""
     return pwd_context.hash(password)
@@ -9,3 +31,76 @@ def hash_password(password: str):
 def verify_password(plain_password: str, hashed_password: str):
     """Verifies a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def _lower_priority(increment: int):
+    if increment and hasattr(os, "nice"):
+        os.nice(increment)
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are already waiting for a worker."""
+
+    retry_after = PASSWORD_HASH_RETRY_AFTER
+
+
+class HashPool:
+    """
+    Bounded process pool for password hashing. `await pool.hash(...)` and
+    `await pool.verify(...)` raise HashingBusy when the queue is full.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_QUEUE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0          # submitted and not finished (running + waiting)
+        self.peak = 0
+        self.counts = {"hashed": 0, "verified": 0, "rejected": 0}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: workers must not inherit the server's threads and sockets
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_lower_priority,
+                    initargs=(PASSWORD_HASH_NICE,),
+                )
+            return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.workers + self.max_pending:
+            self.counts["rejected"] += 1
+            raise HashingBusy(f"Password hashing is at capacity ({self.pending} pending); retry shortly.")
+        self.pending += 1
+        self.peak = max(self.peak, self.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(hash_password, password)
+        self.counts["hashed"] += 1
+        return hashed
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        ok = await self._run(verify_password, plain_password, hashed_password)
+        self.counts["verified"] += 1
+        return ok
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "max_pending": self.max_pending, "pending": self.pending,
+                "peak": self.peak, **self.counts}
+
+
+hash_pool = HashPool()
@@ -6,5 +6,7 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, nullable=False)
-    email = Column(String, unique=True, nullable=False)
+    # Unique index: logins look users up by email, and signups rely on the
+    # constraint rather than checking first
+    email = Column(String, unique=True, index=True, nullable=False)
     password = Column(String, nullable=False)
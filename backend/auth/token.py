@@ -1,12 +1,99 @@
-from jose import jwt
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+
 SECRET_KEY = "my_secret_key_change_it"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# Model endpoints accept anonymous requests unless AUTH_REQUIRED=on; a token
+# that is sent must always be valid.
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "off") == "on"
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+# -------------------------------
+# Verified Token Cache
+# -------------------------------
+class ClaimsCache:
+    """
+    Decoded claims of tokens whose signature has already been verified, kept
+    (LRU-bounded) until the token's own `exp`, so repeat requests with the
+    same token skip signature verification.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        with self._lock:
+            claims = self._entries.get(token)
+            if claims is not None and claims["exp"] > time.time():
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return claims
+            if claims is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, claims: dict):
+        with self._lock:
+            self._entries[token] = claims
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+
+claims_cache = ClaimsCache()
+
+
+def decode_access_token(token: str) -> dict:
+    """Claims of a valid token; raises JWTError for a bad or expired one."""
+    claims = claims_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if "exp" not in claims:
+            raise JWTError("Token has no expiry.")
+        claims_cache.put(token, claims)
+    return claims
+
+
+bearer = HTTPBearer(auto_error=False)
+
+async def request_user(credentials: HTTPAuthorizationCredentials = Depends(bearer)):
+    """
+    Dependency: the claims of the request's bearer token, or None for an
+    anonymous request (401 instead when AUTH_REQUIRED is on).
+    """
+    if credentials is None:
+        if AUTH_REQUIRED:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated",
+                                headers={"WWW-Authenticate": "Bearer"})
+        return None
+    try:
+        return decode_access_token(credentials.credentials)
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token",
+                            headers={"WWW-Authenticate": "Bearer"})
@@ -0,0 +1,111 @@
+"""
+A traffic spike against a provider with limited capacity, admission control
+off vs on.
+
+The stub text and vision models accept --capacity concurrent calls and
+answer 429 beyond that, like a rate-limited provider. A burst of --chat
+/chat and --vision /vision requests (with a --slow-share of them from one
+heavy user holding a token) arrives at once. Without admission control every
+request calls the provider immediately and the excess fails as 500s. With it,
+at most --capacity executions run at a time, chat turns are served first,
+the heavy user is capped at ADMISSION_USER_CONCURRENT, and requests the queue
+can't take are turned away quickly with 503 and Retry-After. Each mode runs
+in its own process, since the scheduler reads its settings at import.
+
+    cd backend && python -m benchmarks.bench_admission --chat 150 --vision 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+MODES = ("off", "on")
+
+
+async def drive(args) -> dict:
+    import httpx
+
+    from benchmarks import stubs
+    from registry import registry
+
+    stubs.install(latency=args.latency, router_latency=0)
+    for name in ("text_model", "vision_model"):
+        registry.override(name, stubs.StubChatModel(latency=args.latency, capacity=args.capacity))
+    from auth.token import create_access_token
+    from main import app
+    from vision_images import vision_images
+
+    vision_images.transport = stubs.image_transport("0.01")
+    vision_images.resolve = stubs.public_resolver
+    heavy = {"Authorization": f"Bearer {create_access_token({'sub': 'heavy@example.com'})}"}
+    results = defaultdict(list)     # kind -> [(status, seconds, retry_after)]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300) as c:
+        async def request(kind, i):
+            headers = heavy if i % round(1 / args.slow_share) == 0 else {}
+            start = time.perf_counter()
+            if kind == "chat":
+                r = await c.post("/chat", headers=headers, json={"message": f"spike {i}", "cache": False})
+            else:
+                r = await c.post("/vision", headers=headers, json={"question": f"image {i}?",
+                                                                    "image_url": f"http://images.bench/{i}.png"})
+            results[kind].append((r.status_code, time.perf_counter() - start, r.headers.get("retry-after")))
+
+        await asyncio.gather(*(request("vision", i) for i in range(args.vision)),
+                             *(request("chat", i) for i in range(args.chat)))
+
+    rows = {}
+    for kind, outcomes in results.items():
+        ok = [s for status, s, _ in outcomes if status == 200]
+        rejected = [s for status, s, _ in outcomes if status in (429, 503)]
+        rows[kind] = {
+            "statuses": dict(sorted(Counter(status for status, _, _ in outcomes).items())),
+            "ok p50": round(statistics.median(ok), 2) if ok else None,
+            "ok p95": round(sorted(ok)[int(0.95 * (len(ok) - 1))], 2) if ok else None,
+            "reject p50": round(statistics.median(rejected), 3) if rejected else None,
+            "retry-after": sorted({int(ra) for _, _, ra in outcomes if ra}),
+        }
+    rows["peak provider calls"] = max(registry.get(n).peak_in_flight for n in ("text_model", "vision_model"))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat", type=int, default=150)
+    parser.add_argument("--vision", type=int, default=50)
+    parser.add_argument("--capacity", type=int, default=8, help="provider concurrency before 429s")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--slow-share", type=float, default=0.25, help="share of requests from one heavy user")
+    parser.add_argument("--queue", type=int, default=128, help="ADMISSION_QUEUE_SIZE")
+    parser.add_argument("--mode", choices=MODES, help="run one mode in this process")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(drive(args))))
+        return
+
+    for mode in MODES:
+        env = {
+            **{k: v for k, v in os.environ.items() if k not in ("GOOGLE_API_KEY", "GROQ_API_KEY")},
+            "ADMISSION": mode,
+            "ADMISSION_MAX_CONCURRENT": str(args.capacity),
+            "ADMISSION_QUEUE_SIZE": str(args.queue),
+            "USER_RATE_LIMIT": "",
+            "COALESCE": "off",
+            "LOG_LEVEL": "CRITICAL",
+        }
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_admission", *sys.argv[1:], "--mode", mode],
+                             capture_output=True, text=True, check=True, env=env).stdout
+        rows = json.loads(out.strip().splitlines()[-1])
+        print(f"admission {mode}: peak provider calls {rows.pop('peak provider calls')} (capacity {args.capacity})")
+        for kind, row in rows.items():
+            print(f"  {kind:<8}" + "  ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Load benchmark for the async request path.
+
+Fires concurrent /chat requests at the FastAPI app in-process with stubbed
+models and reports throughput and effective concurrency (model time served per
+second of wall time, i.e. conversations progressing at once), first with stubs
+that block the event loop (the old `graph.invoke` behaviour) and once fully
+async.
+
+    cd backend && python -m benchmarks.bench_async_graph --requests 64
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks import stubs
+
+
+async def run(app, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            async with semaphore:
+                r = await client.post("/chat", json={"message": f"hello {i}", "thread_id": f"bench-{i}"})
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency in seconds")
+    args = parser.parse_args()
+
+    from concurrency import limiters
+    from main import app
+
+    router_latency = args.latency / 4
+    work = args.requests * (args.latency + router_latency)
+
+    print(f"{'mode':<10}{'requests':>10}{'seconds':>10}{'req/s':>10}{'concurrency':>13}{'peak text calls':>17}")
+    for blocking in (True, False):
+        stubs.install(latency=args.latency, router_latency=router_latency, blocking=blocking)
+        limiters["text"].peak = 0
+        elapsed = asyncio.run(run(app, args.requests, args.concurrency))
+        mode = "blocking" if blocking else "async"
+        print(f"{mode:<10}{args.requests:>10}{elapsed:>10.2f}{args.requests / elapsed:>10.1f}"
+              f"{work / elapsed:>13.1f}{limiters['text'].peak:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Chat latency during a login storm, and the verified-token cache.
+
+Runs --clients concurrent login loops against the app for --seconds while
+/chat requests arrive every --interval seconds (stubbed model), twice: with
+the old synchronous login (Argon2 on FastAPI's threadpool, re-created here as
+/auth/login-legacy) and with the hashing process pool. Reports logins/sec,
+logins turned away with 503, and chat p50/p99. Then checks that concurrent
+signups for one email create exactly one user, and times token verification
+with and without the claims cache.
+
+    cd backend && python -m benchmarks.bench_auth --clients 16 --seconds 8
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from benchmarks import stubs
+
+EMAIL, PASSWORD = "bench@bench.dev", "correct horse battery staple"
+
+
+def add_legacy_login(app):
+    """The login route as it was: Argon2 on the threadpool shared with the app."""
+    from auth import auth_routes, hashing, token
+
+    legacy = APIRouter()
+
+    @legacy.post("/auth/login-legacy")
+    async def login_legacy(request: auth_routes.UserLogin, db=Depends(auth_routes.get_db)):
+        user = await auth_routes.find_user(db, request.email)
+        if not user or not await run_in_threadpool(hashing.verify_password, request.password, user.password):
+            raise HTTPException(status_code=400, detail="Incorrect password")
+        return {"access_token": token.create_access_token(data={"sub": user.email})}
+
+    app.include_router(legacy)
+
+
+def run(coro):
+    """asyncio.run, returning the user store's pooled connections before the loop closes."""
+    from auth.database import engine
+
+    async def wrapped():
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(wrapped())
+
+
+async def ensure_user():
+    from auth import auth_routes, hashing
+    from auth.database import SessionLocal, init_models
+
+    await init_models()
+    async with SessionLocal() as db:
+        await auth_routes.create_user(db, "bench", EMAIL, hashing.hash_password(PASSWORD))
+
+
+async def signup_race(app, n: int) -> list:
+    """n concurrent signups for one new email: exactly one may succeed."""
+    email = f"race-{uuid.uuid4().hex[:8]}@bench.dev"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        responses = await asyncio.gather(*(
+            client.post("/auth/signup", json={"username": "race", "email": email,
+                                              "password": PASSWORD, "confirm_password": PASSWORD})
+            for _ in range(n)
+        ))
+    return sorted(r.status_code for r in responses)
+
+
+async def storm(app, login_path: str, clients: int, seconds: float, interval: float) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    logins, busy, chat_latency = 0, 0, []
+    deadline = time.perf_counter() + seconds
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def login_loop():
+            nonlocal logins, busy
+            while time.perf_counter() < deadline:
+                r = await client.post(login_path, json={"email": EMAIL, "password": PASSWORD})
+                if r.status_code == 503:
+                    busy += 1
+                    await asyncio.sleep(float(r.headers.get("retry-after", "1")))
+                else:
+                    r.raise_for_status()
+                    logins += 1
+
+        async def chat(i):
+            start = time.perf_counter()
+            r = await client.post("/chat", json={"message": f"storm question {i}", "cache": False})
+            r.raise_for_status()
+            chat_latency.append(time.perf_counter() - start)
+
+        async def chat_loop():
+            tasks, i = [], 0
+            while time.perf_counter() < deadline:
+                tasks.append(asyncio.ensure_future(chat(i)))
+                i += 1
+                await asyncio.sleep(interval)
+            await asyncio.gather(*tasks)
+
+        start = time.perf_counter()
+        await asyncio.gather(chat_loop(), *(login_loop() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    chat_latency.sort()
+    return {
+        "logins_per_s": logins / elapsed,
+        "busy": busy,
+        "chat_p50": statistics.median(chat_latency) * 1000,
+        "chat_p99": chat_latency[max(int(len(chat_latency) * 0.99) - 1, 0)] * 1000,
+        "chats": len(chat_latency),
+    }
+
+
+def token_cache_bench(n: int = 20000):
+    from auth import token
+
+    access_token = token.create_access_token(data={"sub": EMAIL})
+    start = time.perf_counter()
+    for _ in range(n):
+        token.jwt.decode(access_token, token.SECRET_KEY, algorithms=[token.ALGORITHM])
+    uncached = (time.perf_counter() - start) / n
+    start = time.perf_counter()
+    for _ in range(n):
+        token.decode_access_token(access_token)
+    cached = (time.perf_counter() - start) / n
+    print(f"\ntoken verification: {uncached * 1e6:.1f} µs uncached, {cached * 1e6:.1f} µs cached "
+          f"(hit rate {token.claims_cache.stats()['hit_rate']:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=8)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between chat requests")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub model latency in seconds")
+    args = parser.parse_args()
+
+    stubs.install(latency=args.latency, router_latency=0)
+    from main import app
+    from auth.hashing import hash_pool
+
+    add_legacy_login(app)
+    run(ensure_user())
+
+    print(f"{'login path':<22}{'logins/s':>10}{'503s':>7}{'chats':>7}{'chat p50 ms':>13}{'chat p99 ms':>13}")
+    for label, path, clients in (("no logins", "/auth/login", 0),
+                                 ("sync (threadpool)", "/auth/login-legacy", args.clients),
+                                 ("hashing pool", "/auth/login", args.clients)):
+        r = run(storm(app, path, clients, args.seconds, args.interval))
+        print(f"{label:<22}{r['logins_per_s']:>10.1f}{r['busy']:>7}{r['chats']:>7}"
+              f"{r['chat_p50']:>13.0f}{r['chat_p99']:>13.0f}")
+    statuses = run(signup_race(app, 8))
+    hash_pool.shutdown()
+    assert statuses.count(200) == 1 and statuses.count(400) == len(statuses) - 1, statuses
+    print(f"\nsignup race: {len(statuses)} concurrent signups for one email -> {statuses}")
+
+    token_cache_bench()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Memory and latency benchmark for the checkpointer backends.
+
+Runs --threads conversations of --turns turns each through the real graph
+(stub models, zero latency) and reports per-turn latency, peak RSS and what
+the checkpointer still holds. Each backend runs in its own subprocess so RSS
+numbers don't bleed into each other.
+
+    cd backend && python -m benchmarks.bench_checkpointer --threads 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKENDS = ("unbounded", "memory", "sqlite")
+
+
+async def drive(graph, threads: int, turns: int, concurrency: int) -> list:
+    from langchain_core.messages import HumanMessage
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def conversation(i):
+        config = {"configurable": {"thread_id": f"thread-{i}"}}
+        for turn in range(turns):
+            async with semaphore:
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=f"hello {turn}")]}, config=config)
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(conversation(i) for i in range(threads)))
+    return latencies
+
+
+def run_backend(args) -> dict:
+    from benchmarks import stubs
+    graphs = stubs.install(latency=0, router_latency=0)
+    from langgraph.checkpoint.memory import InMemorySaver
+    from checkpointing import BoundedInMemorySaver, PersistentSqliteSaver
+
+    if args.backend == "unbounded":
+        checkpointer = InMemorySaver()
+    elif args.backend == "memory":
+        checkpointer = BoundedInMemorySaver(max_threads=args.max_threads, ttl_seconds=3600,
+                                            keep_last=args.keep_last)
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite")
+        checkpointer = PersistentSqliteSaver.from_path(path, ttl_seconds=3600, keep_last=args.keep_last)
+    graph = graphs.workflow.compile(checkpointer=checkpointer)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    latencies = sorted(asyncio.run(drive(graph, args.threads, args.turns, args.concurrency)))
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    held = checkpointer.stats() if hasattr(checkpointer, "stats") else {
+        "threads": len(checkpointer.storage),
+        "checkpoints": sum(len(ns) for t in checkpointer.storage.values() for ns in t.values()),
+    }
+    return {
+        "backend": args.backend,
+        "turns": len(latencies),
+        "seconds": round(elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "rss_growth_mb": round((rss_after - rss_before) / 1024, 1),
+        "threads_held": held["threads"],
+        "checkpoints_held": held["checkpoints"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-threads", type=int, default=5000, help="LRU cap for the memory backend")
+    parser.add_argument("--keep-last", type=int, default=4)
+    parser.add_argument("--backend", choices=BACKENDS, help="run one backend in this process")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args)))
+        return
+
+    rows = []
+    for backend in BACKENDS:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_checkpointer", *sys.argv[1:], "--backend", backend],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+
+    columns = list(rows[0])
+    print("".join(f"{c:>17}" for c in columns))
+    for row in rows:
+        print("".join(f"{row[c]!s:>17}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
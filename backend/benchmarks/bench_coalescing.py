@@ -0,0 +1,90 @@
+"""
+Request coalescing under bursts of identical requests.
+
+Fires --distinct different questions, each --duplicates times at once, at
+/chat (new threads, response cache off) and at /pdf (same uploaded PDF and
+question), with coalescing off and on. Reports model calls, wall time and the
+single-flight dedup ratio, then checks that a request which shared another's
+execution still has the exchange on its own thread.
+
+    cd backend && python -m benchmarks.bench_coalescing --distinct 8 --duplicates 16
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, List, Optional
+
+import httpx
+from langchain_core.messages import BaseMessage
+
+from benchmarks import fixtures, stubs
+from registry import registry
+
+calls = {"model": 0}
+
+
+class CountingStub(stubs.StubChatModel):
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any):
+        calls["model"] += 1
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+async def burst(client, distinct: int, duplicates: int, pdf: bytes) -> list:
+    async def chat(i):
+        r = await client.post("/chat", json={"message": f"what is item {i} about?", "cache": False})
+        r.raise_for_status()
+        return r.json()
+
+    async def ask_pdf(i):
+        r = await client.post("/pdf", params={"query": f"what does part {i} say?"},
+                              files={"file": ("bench.pdf", pdf, "application/pdf")})
+        r.raise_for_status()
+        return r.json()
+
+    return await asyncio.gather(*(
+        ask(i) for ask in (chat, ask_pdf) for i in range(distinct) for _ in range(duplicates)
+    ))
+
+
+async def run(app, graphs, distinct: int, duplicates: int, pdf: bytes) -> tuple:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        start = time.perf_counter()
+        responses = await burst(client, distinct, duplicates, pdf)
+        elapsed = time.perf_counter() - start
+
+    # Every request's own thread must hold its question and the answer
+    for body in responses:
+        state = await graphs.get_graph().aget_state({"configurable": {"thread_id": body["thread_id"]}})
+        messages = state.values.get("messages", [])
+        assert len(messages) == 2 and messages[-1].content == body["response"], body["thread_id"]
+    return elapsed, len(responses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--distinct", type=int, default=8)
+    parser.add_argument("--duplicates", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency in seconds")
+    args = parser.parse_args()
+
+    graphs = stubs.install(latency=args.latency, router_latency=args.latency / 4)
+    registry.override("text_model", CountingStub(latency=args.latency))
+    import coalescing
+    import main as app_module
+
+    pdf = fixtures.make_pdf(40)
+    print(f"{'coalescing':<12}{'requests':>10}{'model calls':>13}{'seconds':>10}{'dedup ratio':>13}")
+    for enabled in (False, True):
+        coalescing.COALESCE_ENABLED = enabled
+        single_flight = app_module.single_flight = coalescing.SingleFlight()
+        calls["model"] = 0
+        elapsed, total = asyncio.run(run(app_module.app, graphs, args.distinct, args.duplicates, pdf))
+        print(f"{'on' if enabled else 'off':<12}{total:>10}{calls['model']:>13}{elapsed:>10.2f}"
+              f"{single_flight.stats()['dedup_ratio']:>13.1%}")
+    print("✅ Every request's thread holds its own question and answer")
+
+
+if __name__ == "__main__":
+    main()
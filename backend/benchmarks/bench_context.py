@@ -0,0 +1,66 @@
+"""
+Prompt size per turn on a long conversation, for each context strategy.
+
+Runs one thread for --turns turns against stubbed models and records how many
+(estimated) tokens the chat model is sent on each turn, plus how many extra
+summary calls the summarize strategy made.
+
+    cd backend && python -m benchmarks.bench_context --turns 60
+"""
+import argparse
+import asyncio
+from typing import Any, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from benchmarks import stubs
+from registry import registry
+
+prompt_tokens = []
+
+
+class RecordingStub(stubs.StubChatModel):
+    """StubChatModel that records the size of every prompt it is sent."""
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any):
+        import context
+        prompt_tokens.append(sum(context.message_tokens(m) for m in messages))
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+async def conversation(graph, strategy: str, turns: int) -> list:
+    """Prompt tokens of each turn's answer (summary calls excluded) and the summary call count."""
+    config = {"configurable": {"thread_id": f"bench-context-{strategy}"}}
+    question = "Tell me more about the history and the trade-offs of this design, point {0} please. " * 3
+    per_turn, summary_calls = [], 0
+    for turn in range(turns):
+        prompt_tokens.clear()
+        await graph.ainvoke({
+            "messages": [HumanMessage(content=question.format(turn))],
+            "context_settings": {"strategy": strategy},
+            "cache_enabled": False,   # every strategy asks the same first question
+        }, config=config)
+        per_turn.append(prompt_tokens[-1])
+        summary_calls += len(prompt_tokens) - 1
+    return per_turn, summary_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=60)
+    args = parser.parse_args()
+
+    graphs = stubs.install(latency=0, router_latency=0)
+    model = registry.override("text_model", RecordingStub(latency=0, reply="A fairly detailed answer sentence. " * 25))
+    registry.override("summary_model", model)
+
+    marks = [t for t in (1, 10, 25, 50, 100, 200) if t <= args.turns]
+    print(f"{'strategy':<12}" + "".join(f"{'turn ' + str(t):>11}" for t in marks) + f"{'summaries':>11}")
+    for strategy in ("full", "window", "summarize"):
+        per_turn, summary_calls = asyncio.run(conversation(graphs.get_graph(), strategy, args.turns))
+        print(f"{strategy:<12}" + "".join(f"{per_turn[t - 1]:>11}" for t in marks) + f"{summary_calls:>11}")
+
+
+if __name__ == "__main__":
+    main()
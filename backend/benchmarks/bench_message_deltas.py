@@ -0,0 +1,112 @@
+"""
+Per-step graph overhead on long threads, and a regression check that nodes
+return message deltas.
+
+`messages` uses the `add_messages` reducer, so a node that returns
+`state["messages"] + [response]` makes every step copy and re-merge the whole
+thread. The check runs each node against a --messages long state and fails if
+it returns anything but its new messages. The benchmark then times one step on
+a --messages long thread for a node returning the full list vs a delta, with
+zero-latency stub models, so only graph overhead is measured. The check also
+runs under pytest (tests/test_message_deltas.py).
+
+    cd backend && python -m benchmarks.bench_message_deltas --messages 1000
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks import stubs
+from benchmarks.fixtures import long_thread
+
+
+async def check_deltas(graphs, n: int) -> list:
+    """Names of nodes that return more than their own new messages."""
+    history = long_thread(n)
+    cases = {
+        "chatbot": HumanMessage(content="hello", id="q"),
+        "vision": HumanMessage(content=[
+            {"type": "text", "text": "what is this?"},
+            {"type": "image_url", "image_url": "http://example.invalid/cat.png"},
+        ], id="q"),
+        "pdf": HumanMessage(content=[{"type": "text", "text": "summarize"}], id="q"),
+        "image_generation": HumanMessage(content=[{"type": "text", "text": "generate image: a cat"}], id="q"),
+    }
+    nodes = {
+        "chatbot": graphs.chat_node,
+        "vision": graphs.vision_node,
+        "pdf": graphs.pdf_query_node,
+        "image_generation": graphs.image_generation_node,
+    }
+    # Keep the image node's background fetch off the network
+    graphs.image_jobs.transport = httpx.MockTransport(lambda request: httpx.Response(503))
+    existing = {m.id for m in history} | {"q"}
+    failures = []
+    for name, node in nodes.items():
+        update = await node({"messages": history + [cases[name]]})
+        returned = update.get("messages", [])
+        if len(returned) > 2 or any(m.id in existing for m in returned):
+            failures.append(f"{name} returned {len(returned)} messages")
+    return failures
+
+
+def build(graphs, full_list: bool):
+    """One-node graph over the real State and checkpointer settings."""
+    from langgraph.graph import StateGraph, START, END
+    from checkpointing import build_checkpointer
+
+    async def node(state):
+        response = AIMessage(content="stub reply")
+        return {"messages": state["messages"] + [response] if full_list else [response]}
+
+    workflow = StateGraph(graphs.State)
+    workflow.add_node("chatbot", node)
+    workflow.add_edge(START, "chatbot")
+    workflow.add_edge("chatbot", END)
+    return workflow.compile(checkpointer=build_checkpointer("memory"))
+
+
+async def step_times(graph, n: int, steps: int) -> list:
+    config = {"configurable": {"thread_id": "bench-deltas"}}
+    await graph.aupdate_state(config, {"messages": long_thread(n)})
+    times = []
+    for i in range(steps):
+        start = time.perf_counter()
+        await graph.ainvoke({"messages": [HumanMessage(content=f"step {i}")]}, config=config)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--check-only", action="store_true", help="run the regression check and exit")
+    args = parser.parse_args()
+
+    graphs = stubs.install(latency=0, router_latency=0)
+
+    failures = asyncio.run(check_deltas(graphs, args.messages))
+    if failures:
+        print("❌ Nodes must return only new messages:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print(f"✅ All nodes return message deltas ({args.messages}-message state)")
+    if args.check_only:
+        return
+
+    print(f"\n{'node returns':<14}{'messages':>10}{'ms/step p50':>14}{'ms/step p95':>14}")
+    for label, full_list in (("full list", True), ("delta", False)):
+        times = asyncio.run(step_times(build(graphs, full_list), args.messages, args.steps))
+        times.sort()
+        p50 = statistics.median(times) * 1000
+        p95 = times[int(len(times) * 0.95) - 1] * 1000
+        print(f"{label:<14}{args.messages:>10}{p50:>14.2f}{p95:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
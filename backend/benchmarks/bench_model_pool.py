@@ -0,0 +1,87 @@
+"""
+Failover, backoff and hedging in the model pool, against stub backends that
+inject latency and errors.
+
+Each scenario sends --requests calls (--concurrency at a time) through a
+ModelPool and reports the failure rate and latency percentiles:
+
+  rate-limited   one backend returning 429 on 30% of calls, alone vs pooled
+                 with a healthy second backend
+  tail latency   backends with a 10% slow tail, without hedging vs hedged
+                 after the observed p95
+
+    cd backend && python -m benchmarks.bench_model_pool --requests 200
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from benchmarks import stubs
+import model_pool as model_pool_module
+from model_pool import Backend, ModelPool
+
+
+def pool(*models, hedge: str = "off") -> ModelPool:
+    return ModelPool("bench", [Backend(f"stub-{i}", m) for i, m in enumerate(models)], hedge=hedge)
+
+
+async def drive(model_pool: ModelPool, total: int, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await model_pool.ainvoke("hello")
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return sorted(latencies), failures
+
+
+def row(label: str, latencies: list, failures: int, total: int):
+    pct = lambda q: latencies[max(int(len(latencies) * q) - 1, 0)] * 1000 if latencies else float("nan")
+    p50 = statistics.median(latencies) * 1000 if latencies else float("nan")
+    print(f"{label:<30}{failures / total:>9.1%}{p50:>10.0f}{pct(0.95):>10.0f}{pct(0.99):>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--backoff-max", type=float, default=1.0,
+                        help="cap on the 429 cooldown (MODEL_BACKOFF_MAX) so the run stays short")
+    args = parser.parse_args()
+    model_pool_module.MODEL_BACKOFF_MAX = args.backoff_max
+    logging.getLogger("model_pool").setLevel(logging.ERROR)
+
+    flaky = lambda: stubs.StubChatModel(latency=args.latency, error_rate=0.3, error_status=429)
+    healthy = lambda: stubs.StubChatModel(latency=args.latency * 1.5)
+    tail = lambda: stubs.StubChatModel(latency=args.latency, tail_rate=0.1, tail_latency=args.latency * 20)
+
+    scenarios = [
+        ("429s, single backend (1 try)", ModelPool("bench", [Backend("stub-0", flaky())], max_attempts=1)),
+        ("429s, single backend + retry", pool(flaky())),
+        ("429s, pooled with healthy", pool(flaky(), healthy())),
+        ("tail, no hedging", pool(tail(), tail())),
+        ("tail, hedged after p95", pool(tail(), tail(), hedge="auto")),
+    ]
+
+    print(f"{'scenario':<30}{'failed':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for label, model_pool in scenarios:
+        if model_pool.hedge == "auto":
+            # Warm up so the backends have a p95 to hedge against
+            asyncio.run(drive(model_pool, 50, args.concurrency))
+        latencies, failures = asyncio.run(drive(model_pool, args.requests, args.concurrency))
+        row(label, latencies, failures, args.requests)
+
+
+if __name__ == "__main__":
+    main()
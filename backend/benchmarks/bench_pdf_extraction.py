@@ -0,0 +1,75 @@
+"""
+PDF text extraction benchmark on synthetic 100-500 page documents.
+
+Compares the original inline loop (one PdfReader pass with `+=` string
+concatenation) against the process-pool extractor, cold and from the
+per-page cache, and reports time to the first page.
+
+    cd backend && python -m benchmarks.bench_pdf_extraction --pages 100 250 500
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+import PyPDF2
+
+from benchmarks.fixtures import make_pdf
+import pdf_extraction
+from pdf_extraction import PageCache, iter_pages
+
+
+def baseline(path: str) -> int:
+    extracted_text = ""
+    reader = PyPDF2.PdfReader(path)
+    for page in reader.pages:
+        extracted_text += page.extract_text() or ""
+    return len(extracted_text)
+
+
+def timed_iter(path: str, doc_id: str, cache: PageCache):
+    start = time.perf_counter()
+    first, chars = None, 0
+    for text in iter_pages(path, doc_id, cache, max_pages=10_000):
+        if first is None:
+            first = time.perf_counter() - start
+        chars += len(text)
+    return first, time.perf_counter() - start, chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 250, 500])
+    parser.add_argument("--words", type=int, default=400, help="words per page")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    # Spawn the pool outside the measurements
+    warm = os.path.join(workdir, "warm.pdf")
+    with open(warm, "wb") as f:
+        f.write(make_pdf(pdf_extraction.PDF_PARALLEL_MIN_PAGES, 10))
+    timed_iter(warm, "warmup", PageCache(os.path.join(workdir, "warm-cache")))
+
+    print(f"workers={pdf_extraction.PDF_EXTRACT_WORKERS} pages/task={pdf_extraction.PDF_PAGES_PER_TASK}")
+    print(f"{'pages':>6}{'baseline s':>12}{'pool s':>10}{'pool 1st page s':>17}{'cached s':>10}{'speedup':>9}")
+    for pages in args.pages:
+        data = make_pdf(pages, args.words, seed=pages)
+        path = os.path.join(workdir, f"{pages}.pdf")
+        with open(path, "wb") as f:
+            f.write(data)
+        doc_id = hashlib.sha256(data).hexdigest()
+        cache = PageCache(os.path.join(workdir, "cache"))
+
+        start = time.perf_counter()
+        baseline(path)
+        base = time.perf_counter() - start
+        first, cold, _ = timed_iter(path, doc_id, cache)
+        _, cached, _ = timed_iter(path, doc_id, cache)
+        print(f"{pages:>6}{base:>12.2f}{cold:>10.2f}{first:>17.3f}{cached:>10.3f}{base / cold:>8.1f}x")
+
+    pdf_extraction.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
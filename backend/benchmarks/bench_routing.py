@@ -0,0 +1,156 @@
+"""
+Routing accuracy and latency of `router_node` over the labelled fixture set
+(fixtures.ROUTING_CASES), with the LLM tier answered offline.
+
+Two router models are compared: "large" (the chat model, which used to do the
+routing) and "small" (ROUTER_MODELS). The cheap tiers always run for real;
+cases that reach the LLM tier are answered from recorded decisions and
+latencies in --replay, written once against the real APIs with --record.
+Cases missing from the replay (all of them without --replay) are answered
+with "chatbot", the router's own fallback, after --large-latency /
+--small-latency seconds; they are left out of the accuracy columns, which
+then cover only the cheap tiers and the recorded decisions.
+
+    cd backend && python -m benchmarks.bench_routing
+    cd backend && python -m benchmarks.bench_routing --record routing_replay.json   # real API keys
+    cd backend && python -m benchmarks.bench_routing --replay routing_replay.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import time
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from benchmarks.fixtures import ROUTING_CASES
+
+MODELS = ("large", "small")
+current = {"key": None, "replayed": False}
+
+
+def case_key(content) -> str:
+    return content if isinstance(content, str) else json.dumps(content, sort_keys=True)
+
+
+def replayed(decisions: dict, latency: float):
+    """Stand-in for `structured_router_llm` answering from recorded decisions."""
+    from graphs import RouterDecision
+
+    async def decide(_):
+        recorded = decisions.get(current["key"])
+        current["replayed"] = recorded is not None
+        recorded = recorded or {"route": "chatbot", "seconds": latency}
+        await asyncio.sleep(recorded["seconds"])
+        return RouterDecision(route=recorded["route"], reasoning="replayed")
+
+    return RunnableLambda(decide)
+
+
+def recording(llm, decisions: dict):
+    """Wrap a real structured router LLM, recording each decision and its latency."""
+
+    async def decide(prompt_value):
+        start = time.perf_counter()
+        decision = await llm.ainvoke(prompt_value)
+        decisions[current["key"]] = {"route": decision.route, "seconds": round(time.perf_counter() - start, 4)}
+        return decision
+
+    return RunnableLambda(decide)
+
+
+async def run_cases(graphs) -> list:
+    import routing
+
+    results = []
+    for content, expected in ROUTING_CASES:
+        current["key"], current["replayed"] = case_key(content), False
+        before = dict(routing.counters)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            route = await graphs.router_node({"messages": [HumanMessage(content=content)]})
+        seconds = time.perf_counter() - start
+        tier = next(t for t in routing.TIERS if routing.counters[t] != before.get(t, 0))
+        results.append({"content": content, "expected": expected, "route": route, "tier": tier, "seconds": seconds,
+                        "scored": not tier.startswith("llm") or current["replayed"]})
+    return results
+
+
+def pct(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(int(len(ordered) * q) - 1, 0)] * 1000 if ordered else float("nan")
+
+
+def accuracy(results: list) -> str:
+    """Share of correctly routed cases, leaving out LLM-tier cases without a recorded decision."""
+    scored = [r for r in results if r["scored"]]
+    return f"{sum(r['route'] == r['expected'] for r in scored) / len(scored):.1%}" if scored else "n/a"
+
+
+def record(path: str):
+    import graphs
+    from registry import registry
+
+    llms = {"large": registry.get("text_model").with_structured_output(graphs.RouterDecision),
+            "small": registry.get("structured_router_llm")}
+    decisions = {}
+    for name, llm in llms.items():
+        decisions[name] = {}
+        registry.override("structured_router_llm", recording(llm, decisions[name]))
+        asyncio.run(run_cases(graphs))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(decisions, f, indent=1)
+    print(f"Recorded {sum(len(d) for d in decisions.values())} LLM-tier decisions to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replay", help="decisions recorded with --record")
+    parser.add_argument("--record", help="call the real router models and write their decisions here")
+    parser.add_argument("--large-latency", type=float, default=0.45)
+    parser.add_argument("--small-latency", type=float, default=0.12)
+    parser.add_argument("--verbose", action="store_true", help="list misrouted cases")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record)
+        return
+
+    import graphs
+    from registry import registry
+
+    decisions = {}
+    if args.replay:
+        with open(args.replay, "r", encoding="utf-8") as f:
+            decisions = json.load(f)
+    latency = {"large": args.large_latency, "small": args.small_latency}
+
+    print(f"{len(ROUTING_CASES)} labelled cases" + (f", LLM tier replayed from {args.replay}" if args.replay else
+                                                    ", LLM tier not recorded (no --replay): accuracy covers "
+                                                    "the cheap tiers only"))
+    print(f"{'router':<8}{'accuracy':>10}{'llm share':>11}{'llm acc':>9}"
+          f"{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'llm p50':>9}")
+    for name in MODELS:
+        registry.override("structured_router_llm", replayed(decisions.get(name, {}), latency[name]))
+        results = asyncio.run(run_cases(graphs))
+        llm = [r for r in results if r["tier"].startswith("llm")]
+        seconds = [r["seconds"] for r in results]
+        llm_p50 = pct([r["seconds"] for r in llm], 0.5)
+        print(f"{name:<8}{accuracy(results):>10}{len(llm) / len(results):>11.1%}{accuracy(llm):>9}"
+              f"{statistics.mean(seconds) * 1000:>9.0f}{pct(seconds, 0.5):>9.0f}{pct(seconds, 0.95):>9.0f}{llm_p50:>9.0f}")
+        if args.verbose:
+            for r in results:
+                if r["scored"] and r["route"] != r["expected"]:
+                    print(f"    {r['tier']:<11}{r['expected']:>17} -> {r['route']:<17}{case_key(r['content'])[:60]}")
+
+    print(f"\n{'tier':<12}{'cases':>7}{'accuracy':>10}")
+    for tier in dict.fromkeys(r["tier"] for r in results):
+        subset = [r for r in results if r["tier"] == tier]
+        print(f"{tier:<12}{len(subset):>7}{accuracy(subset):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Import time and cold start of the backend.
+
+Each measurement runs in a fresh interpreter (--runs times, median reported):
+
+  import             `import main` with no API keys set: registers factories only
+  import + warm      `import main` then the lifespan startup (registry.warm):
+                     provider clients, tools, checkpointer and graph built, i.e.
+                     what every import used to cost (dummy keys, no network)
+  first request      stubbed models, no lifespan: the first /chat builds the
+                     graph and tools on demand; compared with the second /chat
+
+It also checks that importing the app loads no provider SDK.
+
+    cd backend && python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROVIDER_MODULES = ("langchain_groq", "langchain_google_genai", "langchain_community.tools")
+SCENARIOS = ("import", "warm", "request")
+
+
+def scenario_import() -> dict:
+    start = time.perf_counter()
+    import main  # noqa: F401
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "providers_loaded": [m for m in PROVIDER_MODULES if m in sys.modules]}
+
+
+def scenario_warm() -> dict:
+    import asyncio
+
+    start = time.perf_counter()
+    import main
+    imported = time.perf_counter() - start
+
+    async def startup():
+        async with main.app.router.lifespan_context(main.app):
+            return time.perf_counter() - start
+
+    return {"seconds": asyncio.run(startup()), "import": imported}
+
+
+def scenario_request() -> dict:
+    import asyncio
+
+    import httpx
+
+    from benchmarks import stubs
+
+    stubs.install(latency=0, router_latency=0)
+    from main import app
+
+    async def requests():
+        times = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for i in range(2):
+                start = time.perf_counter()
+                r = await client.post("/chat", json={"message": f"startup question {i}", "cache": False})
+                r.raise_for_status()
+                times.append(time.perf_counter() - start)
+        return times
+
+    first, second = asyncio.run(requests())
+    return {"seconds": first, "second": second}
+
+
+def child(name: str, runs: int, env: dict) -> list:
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--scenario", name],
+                             capture_output=True, text=True, check=True, env=env).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scenario", choices=SCENARIOS, help="run one measurement in this process")
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(globals()[f"scenario_{args.scenario}"]()))
+        return
+
+    no_keys = {k: v for k, v in os.environ.items() if k not in ("GOOGLE_API_KEY", "GROQ_API_KEY")}
+    dummy_keys = {**no_keys, "GOOGLE_API_KEY": "bench", "GROQ_API_KEY": "bench"}
+
+    imports = child("import", args.runs, no_keys)
+    warms = child("warm", args.runs, dummy_keys)
+    firsts = child("request", args.runs, no_keys)
+
+    def ms(rows, key="seconds"):
+        return statistics.median(r[key] for r in rows) * 1000
+
+    print(f"{'measurement':<36}{'median ms':>11}")
+    print(f"{'import main (no API keys)':<36}{ms(imports):>11.0f}")
+    print(f"{'import main + startup warm-up':<36}{ms(warms):>11.0f}")
+    print(f"{'  of which import':<36}{ms(warms, 'import'):>11.0f}")
+    print(f"{'first /chat, lazy (stub models)':<36}{ms(firsts):>11.0f}")
+    print(f"{'second /chat':<36}{ms(firsts, 'second'):>11.0f}")
+    loaded = sorted({m for r in imports for m in r["providers_loaded"]})
+    print(f"\nprovider SDKs loaded by the import: {', '.join(loaded) or 'none'}")
+    assert not loaded, loaded
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Time-to-first-token benchmark: /chat versus /chat/stream.
+
+The stub model emits a 60-word answer, first token after --latency and one
+word every --token-latency seconds. The blocking endpoint can only answer
+once the whole completion is done; the SSE endpoint forwards the first token.
+
+    cd backend && python -m benchmarks.bench_streaming
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from benchmarks import stubs
+from benchmarks.harness import running_server
+
+
+async def time_blocking(client, i) -> float:
+    start = time.perf_counter()
+    r = await client.post("/chat", json={"message": "hello", "thread_id": f"blocking-{i}", "cache": False})
+    r.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def time_streaming(client, i) -> float:
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", "/chat/stream", json={"message": "hello", "thread_id": f"stream-{i}", "cache": False}) as r:
+        event = None
+        async for line in r.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "token" and first is None:
+                first = time.perf_counter() - start
+            elif line.startswith("data: ") and event == "done":
+                assert json.loads(line[len("data: "):])["response"]
+    return first
+
+
+async def run(app, rounds: int):
+    async with running_server(app) as base_url, httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        blocking = await asyncio.gather(*(time_blocking(client, i) for i in range(rounds)))
+        streaming = await asyncio.gather(*(time_streaming(client, i) for i in range(rounds)))
+    return blocking, streaming
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    stubs.install(latency=args.latency, router_latency=0.05, token_latency=args.token_latency,
+                  reply=" ".join(["word"] * 60))
+    from main import app
+
+    blocking, streaming = asyncio.run(run(app, args.rounds))
+    print(f"{'endpoint':<14}{'p50 ttft (s)':>14}{'max ttft (s)':>14}")
+    for name, samples in (("/chat", blocking), ("/chat/stream", streaming)):
+        print(f"{name:<14}{statistics.median(samples):>14.3f}{max(samples):>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Offline end-to-end load test of the FastAPI app.
+
+Drives main.py's app with every external dependency replaced by a local
+stand-in (see stubs.py): the Groq/Gemini models, DuckDuckGo/Wikipedia, the
+Pollinations image API and the hosts serving /vision image URLs, each with a
+configurable latency distribution ("0.2", "uniform:0.1:0.3",
+"lognormal:0.2:0.5" or "exp:0.2"). No API keys or network are needed.
+
+Every (scenario, concurrency, history) cell runs in a fresh subprocess with
+its own data directories, so caches and RSS don't carry over between cells:
+
+  chat      POST /chat, unique messages (no response-cache or coalescing hits)
+  tools     as chat, with --tool-call-rate of turns calling a search tool first
+  vision    POST /vision with a distinct image URL per request
+  pdf       POST /pdf: each client uploads a --pdf-pages PDF, then asks follow-ups
+  image     POST /generate-image, then polls the job until the image is stored
+
+Chat scenarios also run per --history length: each client's thread is
+preloaded with that many messages. Reported per cell: throughput, p50/p95/p99
+latency, error count, current and peak RSS. --output writes the results as
+JSON; --compare checks them against an earlier file and exits 1 on a
+regression beyond --tolerance.
+
+    cd backend && python -m benchmarks.bench_suite --output results.json
+    cd backend && python -m benchmarks.bench_suite --smoke --compare results.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCENARIOS = ("chat", "tools", "vision", "pdf", "image")
+HISTORY_SCENARIOS = ("chat", "tools")
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux), falling back to the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# -------------------------------
+# One cell, inside the subprocess
+# -------------------------------
+class Client:
+    """One simulated user: its own thread, issuing requests back to back."""
+
+    def __init__(self, http, index: int, args):
+        self.http = http
+        self.index = index
+        self.args = args
+        self.thread_id = f"bench-{index}"
+        self.sent = 0
+
+    async def preload(self, history: int):
+        from langchain_core.messages import AIMessage
+
+        from benchmarks.fixtures import long_thread
+        from graphs import get_graph
+
+        if history:
+            config = {"configurable": {"thread_id": self.thread_id}}
+            await get_graph().aupdate_state(config, {"messages": long_thread(history)}, as_node="chatbot")
+            assert isinstance((await get_graph().aget_state(config)).values["messages"][-1], AIMessage)
+
+    async def request(self, scenario: str):
+        n = self.sent
+        self.sent += 1
+        tag = f"{self.index}-{n}"
+        if scenario in ("chat", "tools"):
+            r = await self.http.post("/chat", json={"message": f"question {tag} about benchmarks",
+                                                    "thread_id": self.thread_id, "cache": False})
+        elif scenario == "vision":
+            r = await self.http.post("/vision", json={"question": f"what is in image {tag}?",
+                                                      "image_url": f"http://images.bench/{tag}.png",
+                                                      "thread_id": self.thread_id})
+        elif scenario == "pdf":
+            from benchmarks.fixtures import make_pdf
+
+            params = {"query": f"what does the document say about item {tag}?", "thread_id": self.thread_id}
+            files = None
+            if n == 0:
+                pdf = make_pdf(self.args.pdf_pages, seed=self.index)
+                files = {"file": (f"bench-{self.index}.pdf", pdf, "application/pdf")}
+            r = await self.http.post("/pdf", params=params, files=files)
+        else:
+            r = await self.http.post("/generate-image", params={"thread_id": self.thread_id},
+                                     json={"prompt": f"a lighthouse number {tag}", "width": 512, "height": 512})
+            r.raise_for_status()
+            job = r.json()["job"]
+            while job and job["status"] in ("queued", "running"):
+                await asyncio.sleep(0.01)
+                r = await self.http.get(job["status_url"])
+                job = r.json()
+            if job and job["status"] == "failed":
+                raise RuntimeError(job["error"])
+        r.raise_for_status()
+
+
+async def drive(http, args) -> dict:
+    clients = [Client(http, i, args) for i in range(args.concurrency)]
+    if args.scenario in HISTORY_SCENARIOS:
+        await asyncio.gather(*(c.preload(args.history) for c in clients))
+    # Warm-up on a throwaway client (lazy state, connection pools), not measured
+    await Client(http, -1, args).request(args.scenario)
+
+    latencies, errors = [], []
+    remaining = args.requests
+
+    async def run(client):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                await client.request(args.scenario)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(c) for c in clients))
+    wall = time.perf_counter() - start
+    if errors:
+        print(f"{len(errors)} errors, first: {errors[0]}", file=sys.stderr)
+    return {
+        "scenario": args.scenario,
+        "concurrency": args.concurrency,
+        "history": args.history,
+        "requests": len(latencies) + len(errors),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else None,
+        "rss_mb": round(rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_cell(args) -> dict:
+    import httpx
+
+    from benchmarks import harness, stubs
+
+    stubs.install(latency=0, latency_dist=args.model_latency, router_latency=0,
+                  tool_call_rate=args.tool_call_rate if args.scenario == "tools" else 0,
+                  tool_latency=args.tool_latency, seed=args.seed)
+    from image_jobs import image_jobs
+    from main import app
+    from vision_images import vision_images
+
+    image_jobs.transport = stubs.image_transport(args.image_latency)
+    vision_images.transport = stubs.image_transport(args.fetch_latency)
+    vision_images.resolve = stubs.public_resolver
+
+    async def go():
+        if args.server:
+            # uvicorn runs the lifespan itself
+            async with harness.running_server(app) as base_url:
+                async with httpx.AsyncClient(base_url=base_url, timeout=300) as http:
+                    return await drive(http, args)
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+                return await drive(http, args)
+
+    return asyncio.run(go())
+
+
+# -------------------------------
+# Grid, output and comparison
+# -------------------------------
+def cells(args) -> list:
+    grid = []
+    for scenario in args.scenarios:
+        for concurrency in args.concurrency_levels:
+            histories = args.histories if scenario in HISTORY_SCENARIOS else [0]
+            grid.extend((scenario, concurrency, history) for history in histories)
+    return grid
+
+
+def run_grid(args) -> list:
+    forwarded = ["--requests", str(args.requests), "--model-latency", args.model_latency,
+                 "--tool-latency", args.tool_latency, "--tool-call-rate", str(args.tool_call_rate),
+                 "--image-latency", args.image_latency, "--fetch-latency", args.fetch_latency,
+                 "--pdf-pages", str(args.pdf_pages), "--seed", str(args.seed)]
+    if args.server:
+        forwarded.append("--server")
+    rows = []
+    for scenario, concurrency, history in cells(args):
+        with tempfile.TemporaryDirectory() as data:
+            env = {
+                **{k: v for k, v in os.environ.items() if k not in ("GOOGLE_API_KEY", "GROQ_API_KEY")},
+                "DOCUMENT_STORE_DIR": os.path.join(data, "documents"),
+                "VISION_CACHE_DIR": os.path.join(data, "vision"),
+                "IMAGE_CACHE_DIR": os.path.join(data, "images"),
+                "CHECKPOINTER": "memory",
+                "AUTH_REQUIRED": "off",
+                "PROFILE_SAMPLE_RATE": "0",
+                "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+            }
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_suite", *forwarded, "--cell",
+                 scenario, str(concurrency), str(history)],
+                capture_output=True, text=True, env=env,
+            )
+        if out.returncode:
+            sys.stderr.write(out.stderr)
+            raise SystemExit(f"cell {scenario}/{concurrency}/{history} failed")
+        row = json.loads(out.stdout.strip().splitlines()[-1])
+        rows.append(row)
+        print_row(row)
+    return rows
+
+
+COLUMNS = ("scenario", "concurrency", "history", "requests", "errors", "throughput_rps",
+           "p50_ms", "p95_ms", "p99_ms", "rss_mb", "peak_rss_mb")
+
+
+def print_row(row: dict):
+    print("".join(f"{row[c]!s:>15}" for c in COLUMNS), flush=True)
+
+
+def metadata(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "mode": "server" if args.server else "asgi",
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "cell")},
+    }
+
+
+def compare(rows: list, baseline: dict, tolerance: float) -> list:
+    """Regressions of `rows` against a --output file of an earlier run."""
+    def key(row):
+        return row["scenario"], row["concurrency"], row["history"]
+
+    before = {key(row): row for row in baseline["results"]}
+    regressions = []
+    for row in rows:
+        old = before.get(key(row))
+        if not old:
+            continue
+        name = "/".join(map(str, key(row)))
+        if row["errors"] > old["errors"]:
+            regressions.append(f"{name}: errors {old['errors']} -> {row['errors']}")
+        for metric in ("p95_ms", "p99_ms", "peak_rss_mb"):
+            if old[metric] and row[metric] and row[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {old[metric]} -> {row[metric]}")
+        if old["throughput_rps"] and row["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput_rps {old['throughput_rps']} -> {row['throughput_rps']}")
+    return regressions
+
+
+SMOKE = dict(concurrency_levels=[1, 4], histories=[0, 20], requests=12, pdf_pages=2, model_latency="0.001",
+             tool_latency="0.001", fetch_latency="0.001", image_latency="0.005")
+
+
+def csv_list(cast):
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=csv_list(str), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", dest="concurrency_levels", type=csv_list(int), default=[1, 8, 32])
+    parser.add_argument("--history", dest="histories", type=csv_list(int), default=[0, 50, 200],
+                        help="thread lengths (messages) for the chat scenarios")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per cell")
+    parser.add_argument("--model-latency", default="lognormal:0.2:0.5")
+    parser.add_argument("--tool-latency", default="lognormal:0.3:0.5")
+    parser.add_argument("--tool-call-rate", type=float, default=0.5)
+    parser.add_argument("--image-latency", default="uniform:1:3", help="Pollinations stand-in")
+    parser.add_argument("--fetch-latency", default="0.05", help="image hosts for /vision URLs")
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server", action="store_true", help="serve with uvicorn instead of in-process ASGI")
+    parser.add_argument("--smoke", action="store_true",
+                        help="tiny grid with near-zero latencies, for CI: checks every scenario works")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --output")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--cell", nargs=3, metavar=("SCENARIO", "CONCURRENCY", "HISTORY"),
+                        help="run one cell in this process")
+    args = parser.parse_args()
+    if args.smoke:
+        # Explicit options still win over the smoke defaults
+        parser.set_defaults(**SMOKE)
+        args = parser.parse_args()
+
+    if args.cell:
+        args.scenario, args.concurrency, args.history = args.cell[0], int(args.cell[1]), int(args.cell[2])
+        print(json.dumps(run_cell(args)))
+        return
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    print("".join(f"{c:>15}" for c in COLUMNS), flush=True)
+    rows = run_grid(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(args), "results": rows}, f, indent=2)
+        print(f"\nresults written to {args.output}")
+
+    failed = [r for r in rows if r["errors"]]
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(rows, json.load(f), args.tolerance)
+        print(f"\n{len(regressions)} regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+        for line in regressions:
+            print(f"  {line}")
+        if regressions:
+            sys.exit(1)
+    if args.smoke and failed:
+        sys.exit(f"{len(failed)} cells had errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Conversations across several uvicorn workers.
+
+Serves the app (stub models, see --latency) with `uvicorn --workers N` and
+runs --threads conversations of --turns turns, each turn on a fresh
+connection so consecutive turns of a thread land on arbitrary workers. Half
+of every thread's turns are sent two at a time, to exercise the per-thread
+turn locks. A thread is intact when its checkpoint holds all of its
+messages. Compares the in-process state (STATE_STORE=memory) with the
+shared one (STATE_STORE=sqlite, sqlite checkpointer), and reports how the
+image job polls fared when they hit another worker.
+
+    cd backend && python -m benchmarks.bench_workers --workers 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.harness import free_port
+
+# Entry point for the worker processes: stubs installed before the app is built
+STUB_APP = "benchmarks.bench_workers:app"
+if os.getenv("BENCH_WORKERS_STUB_LATENCY") is not None:
+    from benchmarks import stubs
+
+    stubs.install(latency=float(os.environ["BENCH_WORKERS_STUB_LATENCY"]), router_latency=0)
+    from graphs import get_graph
+    from image_jobs import image_jobs
+    from main import app
+
+    image_jobs.transport = stubs.image_transport("0.05")
+
+    @app.get("/bench/threads/{thread_id}")
+    async def bench_thread_length(thread_id: str):
+        state = await get_graph().aget_state({"configurable": {"thread_id": thread_id}})
+        return {"messages": len(state.values.get("messages", []))}
+
+
+async def wait_ready(base_url: str):
+    for _ in range(600):
+        try:
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                if (await client.get("/health")).status_code == 200:
+                    return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def conversation(base_url: str, i: int, turns: int, latencies: list) -> int:
+    """Run one thread's turns; returns how many messages the thread should hold."""
+    thread_id = f"workers-{i}"
+    sent = 0
+
+    async def turn(n):
+        nonlocal sent
+        # A new client per turn: no keep-alive, so the OS spreads turns over the workers
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            start = time.perf_counter()
+            r = await client.post("/chat", json={"message": f"thread {i} turn {n}", "thread_id": thread_id,
+                                                 "cache": False})
+            latencies.append(time.perf_counter() - start)
+            if r.status_code == 200:
+                sent += 1
+
+    for n in range(0, turns // 2):
+        await turn(n)
+    for n in range(turns // 2, turns, 2):
+        await asyncio.gather(turn(n), turn(n + 1))
+    return sent * 2
+
+
+async def drive(base_url: str, args) -> dict:
+    await wait_ready(base_url)
+    latencies = []
+    start = time.perf_counter()
+    expected = await asyncio.gather(*(conversation(base_url, i, args.turns, latencies)
+                                      for i in range(args.threads)))
+    wall = time.perf_counter() - start
+
+    # Each check is a fresh connection too, so it may be answered by any worker
+    intact = 0
+    for i, want in enumerate(expected):
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            r = await client.get(f"/bench/threads/workers-{i}")
+        intact += r.json()["messages"] == want
+
+    polls_found = 0
+    for i in range(args.polls):
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            job = (await client.post("/generate-image", json={"prompt": f"poll {i}"})).json()["job"]
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            polls_found += (await client.get(job["status_url"])).status_code == 200
+
+    return {
+        "turns/s": round(len(latencies) / wall, 1),
+        "p50 ms": round(statistics.median(latencies) * 1000),
+        "threads intact": f"{intact}/{args.threads}",
+        "job polls found": f"{polls_found}/{args.polls}",
+    }
+
+
+def serve(args, store: str, data: str) -> subprocess.Popen:
+    env = {
+        **{k: v for k, v in os.environ.items() if k not in ("GOOGLE_API_KEY", "GROQ_API_KEY")},
+        "BENCH_WORKERS_STUB_LATENCY": str(args.latency),
+        "STATE_STORE": store,
+        "STATE_STORE_PATH": os.path.join(data, "state.sqlite"),
+        "CHECKPOINT_DB": os.path.join(data, "checkpoints.sqlite"),
+        "IMAGE_CACHE_DIR": os.path.join(data, "images"),
+        "LOG_LEVEL": "ERROR",
+        "WEB_CONCURRENCY": str(args.workers),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", STUB_APP, "--port", str(args.port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        env=env,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rows = {}
+    for store in ("memory", "sqlite"):
+        args.port = free_port()
+        with tempfile.TemporaryDirectory() as data:
+            server = serve(args, store, data)
+            try:
+                rows[store] = asyncio.run(drive(f"http://127.0.0.1:{args.port}", args))
+            finally:
+                server.terminate()
+                server.wait()
+
+    columns = list(rows["memory"])
+    print(f"{args.workers} workers, {args.threads} threads x {args.turns} turns")
+    print(f"{'STATE_STORE':<14}" + "".join(f"{c:>18}" for c in columns))
+    for store, row in rows.items():
+        print(f"{store:<14}" + "".join(f"{row[c]!s:>18}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Synthetic inputs for the benchmarks.
+"""
+import random
+
+
+def make_pdf(pages: int, words_per_page: int = 300, seed: int = 0) -> bytes:
+    """
+    Build a valid multi-page PDF with `words_per_page` pseudo-random words of
+    Helvetica text per page, without any PDF-writing dependency.
+    """
+    rng = random.Random(seed)
+    vocab = [
+        "latency", "throughput", "cache", "vector", "index", "token", "model", "graph",
+        "router", "thread", "memory", "request", "stream", "budget", "search", "python",
+        "document", "summary", "answer", "question", "page", "chunk", "score", "queue",
+    ]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        words = [rng.choice(vocab) for _ in range(words_per_page)]
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        text = "\n".join(f"({line}) Tj T*" for line in [f"Page {p + 1}"] + lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td\n{text}\nET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def make_image(seed: int, width: int = 800, height: int = 600, fmt: str = "PNG") -> bytes:
+    """A distinct (by seed) gradient image, so each one gets its own cache entry."""
+    import io
+
+    from PIL import Image
+
+    rng = random.Random(seed)
+    base = [rng.randrange(256) for _ in range(3)]
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    image.paste(tuple(base), (0, 0, width // 3, height // 3))
+    out = io.BytesIO()
+    image.save(out, format=fmt)
+    return out.getvalue()
+
+
+def long_thread(n: int) -> list:
+    """n messages of alternating questions and answers, with stable ids."""
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    messages = []
+    for i in range(n // 2):
+        messages.append(HumanMessage(content=f"question {i}", id=f"h{i}"))
+        messages.append(AIMessage(content=f"answer {i}", id=f"a{i}"))
+    return messages
+
+
+def _image(text: str) -> list:
+    return [{"type": "text", "text": text}, {"type": "image", "image_id": "fixture"}]
+
+
+def _pdf(text: str) -> list:
+    return [{"type": "text", "text": text}, {"type": "pdf", "doc_id": "fixture"}]
+
+
+def _explicit(prompt: str) -> list:
+    return [{"type": "text", "text": f"Generate image: {prompt}"}, {"type": "image_request", "prompt": prompt}]
+
+
+# Labelled router inputs: (message content, expected route). A mix of inputs
+# the cheap tiers settle and borderline phrasings that fall through to the LLM.
+ROUTING_CASES = [
+    # Plain chat
+    ("hi", "chatbot"),
+    ("thanks, that helped!", "chatbot"),
+    ("good evening bob", "chatbot"),
+    ("what is the capital of japan", "chatbot"),
+    ("explain how transformers work in machine learning", "chatbot"),
+    ("who won the football world cup in 2018", "chatbot"),
+    ("search the web for today's headlines", "chatbot"),
+    ("write a haiku about autumn", "chatbot"),
+    ("how do I center a div with css", "chatbot"),
+    ("translate 'good night' to spanish", "chatbot"),
+    ("what did I ask you a minute ago?", "chatbot"),
+    ("summarize our conversation so far", "chatbot"),
+    ("recommend three sci-fi novels", "chatbot"),
+    ("what's the difference between a list and a tuple", "chatbot"),
+    ("tell me about the history of photography", "chatbot"),
+    ("which camera is best for portrait photos?", "chatbot"),
+    ("how do I resize an image in python with pillow", "chatbot"),
+    ("what makes a good logo design?", "chatbot"),
+    ("who painted the mona lisa", "chatbot"),
+    ("describe the process of photosynthesis", "chatbot"),
+    ("can you explain what an svg icon is", "chatbot"),
+    ("what is the weather like in paris in spring", "chatbot"),
+    ("How do I create a docker image?", "chatbot"),
+    ("make the art of cooking simple", "chatbot"),
+    ("draw a comparison between rust and go", "chatbot"),
+    # Image generation
+    ("generate an image of a red fox in the snow", "image_generation"),
+    ("draw a dragon sleeping on a pile of gold", "image_generation"),
+    ("create a logo for a coffee shop called bean there", "image_generation"),
+    ("make me a picture of a sunset over the mountains", "image_generation"),
+    ("Generate image: a cat astronaut floating in space", "image_generation"),
+    ("paint a portrait of my dog dressed as a king", "image_generation"),
+    ("render a 3d icon of a rocket", "image_generation"),
+    ("sketch a cottage by a lake at dawn", "image_generation"),
+    ("I'd love a painting of a lighthouse in a storm", "image_generation"),
+    ("show me what a cyberpunk tokyo street would look like", "image_generation"),
+    ("visualize a cozy reading nook with warm lighting", "image_generation"),
+    ("can you design a poster for our jazz night", "image_generation"),
+    ("a watercolor of cherry blossoms, please", "image_generation"),
+    # Attachments and explicit requests
+    (_image("what's in this picture?"), "vision"),
+    (_image("read the text on this sign"), "vision"),
+    (_image("generate a caption for this photo"), "vision"),
+    (_image(""), "vision"),
+    (_pdf("summarize this document"), "pdf"),
+    (_pdf("what does section 3 say about pricing?"), "pdf"),
+    (_pdf("draw up a list of the key dates"), "pdf"),
+    (_explicit("a lighthouse at night"), "image_generation"),
+    (_explicit("hello"), "image_generation"),
+]
@@ -0,0 +1,32 @@
+"""
+Helpers shared by the benchmarks.
+"""
+import asyncio
+import contextlib
+import socket
+
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def running_server(app):
+    """
+    Serve `app` with uvicorn on a free local port and yield its base URL.
+    Unlike httpx's ASGI transport this does not buffer streamed bodies.
+    """
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
@@ -0,0 +1,249 @@
+"""
+Deterministic local stand-ins for the hosted models, used by the benchmarks.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+import zlib
+from typing import Any, AsyncIterator, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import BaseTool
+from pydantic import PrivateAttr
+
+# Shared by every stub so a seeded run (`install(seed=...)`) is repeatable
+rng = random.Random(0)
+
+
+def latency_sampler(spec):
+    """
+    Seconds-per-call sampler from a distribution spec: a number (fixed),
+    "uniform:LOW:HIGH", "lognormal:MEDIAN:SIGMA" or "exp:MEAN".
+    """
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    kind, *args = str(spec).split(":")
+    args = [float(a) for a in args]
+    if kind == "uniform":
+        return lambda: rng.uniform(args[0], args[1])
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(math.log(args[0]), args[1])
+    if kind == "exp":
+        return lambda: rng.expovariate(1 / args[0])
+    return lambda: float(kind)
+
+
+class StubAPIError(Exception):
+    """Provider-style error carrying an HTTP status (429, 503, ...)."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"stub provider error {status_code}")
+        self.status_code = status_code
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model that sleeps for `latency` seconds and returns a canned reply.
+    When streamed, the first token arrives after `latency` and each further
+    word after `token_latency`.
+
+    With `blocking=True` the async path sleeps synchronously, which reproduces
+    the old behaviour of calling `graph.invoke` inside an async endpoint.
+    """
+
+    latency: float = 0.2
+    reply: str = "stub reply"
+    token_latency: float = 0.0
+    blocking: bool = False
+    # Fault injection for model-pool tests: a share of calls fail with
+    # `error_status`, and a share take `tail_latency` instead of `latency`.
+    error_rate: float = 0.0
+    error_status: int = 429
+    tail_rate: float = 0.0
+    tail_latency: float = 0.0
+    # Latency distribution spec (see latency_sampler); replaces `latency` when set
+    latency_dist: str = ""
+    # Share of user turns answered with a call to one of `tool_names` first
+    tool_call_rate: float = 0.0
+    tool_names: List[str] = ["duckduckgo_results_json", "wikipedia"]
+    # Provider capacity: async calls beyond `capacity` in flight fail with `error_status`
+    capacity: int = 0
+    peak_in_flight: int = 0
+    _in_flight: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool calls are simulated through `tool_call_rate`; the bound model is the stub itself
+        return self
+
+    def _tool_call(self, messages: List[BaseMessage]) -> Optional[dict]:
+        """A tool call for this turn, if it is a user turn picked by `tool_call_rate`."""
+        if not self.tool_call_rate or not messages or not isinstance(messages[-1], HumanMessage):
+            return None
+        if rng.random() >= self.tool_call_rate:
+            return None
+        query = messages[-1].content if isinstance(messages[-1].content, str) else "stub query"
+        return {"name": rng.choice(self.tool_names), "args": {"query": query[:60]}, "id": uuid.uuid4().hex}
+
+    def _result(self, messages: List[BaseMessage] = ()) -> ChatResult:
+        call = self._tool_call(list(messages))
+        message = AIMessage(content="", tool_calls=[call]) if call else AIMessage(content=self.reply)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _tokens(self) -> List[str]:
+        words = self.reply.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _faults(self) -> float:
+        """Raise an injected error, or return this call's latency."""
+        if self.error_rate and random.random() < self.error_rate:
+            raise StubAPIError(self.error_status)
+        if self.tail_rate and random.random() < self.tail_rate:
+            return self.tail_latency
+        if self.latency_dist:
+            return latency_sampler(self.latency_dist)()
+        return self.latency
+
+    async def _sleep(self, seconds: float):
+        if self.blocking:
+            time.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._faults() + self.token_latency * (len(self._tokens()) - 1))
+        return self._result(messages)
+
+    def _enter(self):
+        self._in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+        if self.capacity and self._in_flight > self.capacity:
+            self._in_flight -= 1
+            raise StubAPIError(self.error_status)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self._enter()
+        try:
+            await self._sleep(self._faults() + self.token_latency * (len(self._tokens()) - 1))
+        finally:
+            self._in_flight -= 1
+        return self._result(messages)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self._enter()
+        try:
+            first = self._faults()
+            call = self._tool_call(messages)
+            if call:
+                await self._sleep(first)
+                yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}
+                ]))
+                return
+            for i, token in enumerate(self._tokens()):
+                await self._sleep(first if i == 0 else self.token_latency)
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+                if run_manager:
+                    await run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+        finally:
+            self._in_flight -= 1
+
+
+def stub_router(route: str = "chatbot", latency: float = 0.05, blocking: bool = False):
+    """Stand-in for `structured_router_llm` that always picks `route`."""
+    from graphs import RouterDecision
+
+    def decide(_):
+        time.sleep(latency)
+        return RouterDecision(route=route, reasoning="stub")
+
+    async def adecide(_):
+        if blocking:
+            time.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+        return RouterDecision(route=route, reasoning="stub")
+
+    return RunnableLambda(decide, afunc=adecide)
+
+
+class StubTool(BaseTool):
+    """Search/Wikipedia stand-in: waits a sampled latency and returns a canned result."""
+
+    name: str
+    description: str = "Stub search tool. Input: a search query."
+    latency: str = "0.05"
+    result_chars: int = 1500
+
+    def _text(self, query: str) -> str:
+        return f"{self.name} results for {query!r}: " + ("lorem ipsum dolor sit amet " * 80)[:self.result_chars]
+
+    def _run(self, query: str) -> str:
+        time.sleep(latency_sampler(self.latency)())
+        return self._text(query)
+
+    async def _arun(self, query: str) -> str:
+        await asyncio.sleep(latency_sampler(self.latency)())
+        return self._text(query)
+
+
+def image_transport(latency="0", make=None) -> httpx.MockTransport:
+    """
+    httpx transport standing in for Pollinations and image hosts: every GET
+    waits a sampled latency and returns `make(url)` (a distinct PNG by default).
+    """
+    from benchmarks.fixtures import make_image
+
+    sample = latency_sampler(latency)
+    make = make or (lambda url: make_image(zlib.crc32(url.encode()), 512, 512))
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(sample())
+        # vision_images connects to the checked IP; the Host header keeps the original URL apart
+        url = request.url.copy_with(netloc=request.headers["host"].encode())
+        return httpx.Response(200, content=make(str(url)), headers={"content-type": "image/png"})
+
+    return httpx.MockTransport(handler)
+
+
+async def public_resolver(host: str, port: int) -> list:
+    """Stand-in DNS for the stub image hosts, so vision_images' public-address check passes."""
+    return ["93.184.216.34"]
+
+
+def install(latency: float = 0.2, router_latency: float = 0.05, blocking: bool = False,
+            reply: str = "stub reply", token_latency: float = 0.0, latency_dist: str = "",
+            tool_call_rate: float = 0.0, tool_latency: str = "0.05", seed: int = None):
+    """
+    Register stubs in place of the hosted models and search tools used by
+    `graphs` and return the module. The real models and tools are never
+    built, so no API keys or network are needed.
+    """
+    import graphs
+    from registry import registry
+
+    if seed is not None:
+        rng.seed(seed)
+    model = dict(latency=latency, blocking=blocking, reply=reply, token_latency=token_latency,
+                 latency_dist=latency_dist, tool_call_rate=tool_call_rate)
+    for name in ("text_model", "vision_model", "router_model", "summary_model", "rerank_model"):
+        registry.override(name, StubChatModel(**model))
+    registry.override("structured_router_llm", stub_router(latency=router_latency, blocking=blocking))
+    registry.override("search", StubTool(name="duckduckgo_results_json", latency=str(tool_latency)))
+    registry.override("wikipedia", StubTool(name="wikipedia", latency=str(tool_latency)))
+    registry.reset("tools", "tool_executor")   # rebuilt around the stub tools
+    return graphs
@@ -0,0 +1,270 @@
+import asyncio
+import os
+import sqlite3
+import time
+from collections import OrderedDict, defaultdict
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from state_store import STATE_STORE
+
+# -------------------------------
+# Checkpointer Settings
+# -------------------------------
+# Workers sharing a state store also need a checkpointer they all see
+CHECKPOINTER = os.getenv("CHECKPOINTER", "memory" if STATE_STORE == "memory" else "sqlite")   # "memory" | "sqlite"
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "./checkpoints.sqlite")
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "10000"))
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(24 * 3600)))
+# Checkpoints kept per thread; the graph only ever resumes from the latest one.
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "4"))
+
+
+# -------------------------------
+# In-memory: LRU + TTL + pruning
+# -------------------------------
+class BoundedInMemorySaver(InMemorySaver):
+    """
+    InMemorySaver that holds at most `max_threads` threads (least recently
+    used are evicted), drops threads idle for longer than `ttl_seconds`, and
+    keeps only the latest `keep_last` checkpoints per thread.
+    """
+
+    def __init__(self, *, max_threads: int = None, ttl_seconds: float = None,
+                 keep_last: int = None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.keep_last = keep_last
+        self.evictions = 0
+        self._last_access = OrderedDict()     # thread_id -> monotonic time
+        # Per-thread key indexes so eviction doesn't scan every stored blob.
+        self._blob_keys = defaultdict(set)
+        self._write_keys = defaultdict(set)
+
+    def _expired(self, thread_id: str, now: float) -> bool:
+        seen = self._last_access.get(thread_id)
+        return bool(self.ttl_seconds) and seen is not None and now - seen > self.ttl_seconds
+
+    def _touch(self, thread_id: str):
+        now = time.monotonic()
+        self._last_access[thread_id] = now
+        self._last_access.move_to_end(thread_id)
+        while self._last_access:
+            oldest = next(iter(self._last_access))
+            over_capacity = self.max_threads and len(self._last_access) > self.max_threads
+            if not over_capacity and not self._expired(oldest, now):
+                break
+            self.delete_thread(oldest)
+            self.evictions += 1
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id in self._last_access:
+            if self._expired(thread_id, time.monotonic()):
+                self.delete_thread(thread_id)
+                self.evictions += 1
+                return None
+            self._touch(thread_id)
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        self._blob_keys[thread_id].update(
+            (thread_id, checkpoint_ns, k, v) for k, v in new_versions.items()
+        )
+        if self.keep_last:
+            self._prune(thread_id, checkpoint_ns)
+        self._touch(thread_id)
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        super().put_writes(config, writes, task_id, task_path)
+        c = config["configurable"]
+        self._write_keys[c["thread_id"]].add(
+            (c["thread_id"], c.get("checkpoint_ns", ""), c["checkpoint_id"])
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.storage.pop(thread_id, None)
+        for key in self._write_keys.pop(thread_id, ()):
+            self.writes.pop(key, None)
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+        self._last_access.pop(thread_id, None)
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.keep_last:
+            return
+        # Checkpoint ids are uuid6, so lexical order is creation order.
+        ids = sorted(checkpoints)
+        for checkpoint_id in ids[:-self.keep_last]:
+            del checkpoints[checkpoint_id]
+            key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes.pop(key, None)
+            self._write_keys[thread_id].discard(key)
+
+        live = set()
+        for checkpoint_id in ids[-self.keep_last:]:
+            saved = self.serde.loads_typed(checkpoints[checkpoint_id][0])
+            live.update(
+                (thread_id, checkpoint_ns, ch, v) for ch, v in saved["channel_versions"].items()
+            )
+        stale = [k for k in self._blob_keys[thread_id] if k[1] == checkpoint_ns and k not in live]
+        for key in stale:
+            self.blobs.pop(key, None)
+            self._blob_keys[thread_id].discard(key)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "threads": len(self.storage),
+            "checkpoints": sum(len(ns) for t in self.storage.values() for ns in t.values()),
+            "blobs": len(self.blobs),
+            "evictions": self.evictions,
+        }
+
+
+# -------------------------------
+# SQLite (WAL): persistent across restarts
+# -------------------------------
+class PersistentSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver usable from async graphs: the async methods run the sync
+    implementation in a worker thread, so the saver isn't tied to one event
+    loop and can be built at import time. Adds the same keep-last pruning
+    and TTL eviction (by last write) as the in-memory backend.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, *, ttl_seconds: float = None,
+                 keep_last: int = None, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.ttl_seconds = ttl_seconds
+        self.keep_last = keep_last
+        self.evictions = 0
+        self._puts = 0
+
+    @classmethod
+    def from_path(cls, path: str, **kwargs) -> "PersistentSqliteSaver":
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Other workers may hold the write lock on the same file
+        conn.execute("PRAGMA busy_timeout=5000")
+        return cls(conn, **kwargs)
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        # Called by cursor() with self.lock already held.
+        super().setup()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_access "
+            "(thread_id TEXT PRIMARY KEY, last_write REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS thread_access_last_write ON thread_access(last_write)"
+        )
+        self.conn.commit()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT INTO thread_access (thread_id, last_write) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET last_write = excluded.last_write",
+                (thread_id, time.time()),
+            )
+            if self.keep_last:
+                self._prune(cur, thread_id, checkpoint_ns)
+        self._puts += 1
+        if self.ttl_seconds and self._puts % 100 == 0:
+            self.evict_expired()
+        return result
+
+    def _prune(self, cur, thread_id: str, checkpoint_ns: str):
+        keep = (
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT ?"
+        )
+        args = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep_last)
+        for table in ("checkpoints", "writes"):
+            cur.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"AND checkpoint_id NOT IN ({keep})",
+                args,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_access WHERE thread_id = ?", (thread_id,))
+
+    def evict_expired(self) -> int:
+        """Delete threads whose last write is older than the TTL."""
+        cutoff = time.time() - self.ttl_seconds
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT thread_id FROM thread_access WHERE last_write < ?", (cutoff,))
+            expired = [row[0] for row in cur.fetchall()]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        self.evictions += len(expired)
+        return len(expired)
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def stats(self) -> dict:
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT COUNT(*) FROM thread_access")
+            threads = cur.fetchone()[0]
+            cur.execute("SELECT COUNT(*) FROM checkpoints")
+            checkpoints = cur.fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "evictions": self.evictions,
+        }
+
+
+def build_checkpointer(backend: str = None):
+    """
+    Build the checkpointer selected by `backend` (defaults to $CHECKPOINTER).
+    """
+    backend = backend or CHECKPOINTER
+    if backend == "memory":
+        return BoundedInMemorySaver(
+            max_threads=CHECKPOINT_MAX_THREADS,
+            ttl_seconds=CHECKPOINT_TTL_SECONDS,
+            keep_last=CHECKPOINT_KEEP_LAST,
+        )
+    if backend == "sqlite":
+        return PersistentSqliteSaver.from_path(
+            CHECKPOINT_DB,
+            ttl_seconds=CHECKPOINT_TTL_SECONDS,
+            keep_last=CHECKPOINT_KEEP_LAST,
+        )
+    raise ValueError(f"Unknown CHECKPOINTER backend: {backend!r}")
@@ -0,0 +1,130 @@
+import asyncio
+import os
+from collections import Counter
+
+from admission import current_user
+from response_cache import normalize
+
+# -------------------------------
+# Request Coalescing (single-flight)
+# -------------------------------
+# Concurrent requests that map to the same key share one graph execution: the
+# first ("leader") runs it, the others wait for its result. Keys come from a
+# per-endpoint key function; a key of None means the request can't be shared
+# (e.g. a chat turn on an existing thread, whose answer depends on history).
+# Keys are scoped to the caller's JWT subject, so one user never receives an
+# answer produced for another, and each user's requests still pass through
+# that user's admission limits.
+# The execution runs as its own task, so a leader whose client disconnects
+# doesn't cancel it for the requests waiting on it.
+COALESCE_ENABLED = os.getenv("COALESCE", "on") != "off"
+# Endpoints to coalesce, e.g. "chat,pdf" (default: every endpoint with a key function)
+COALESCE_ENDPOINTS = {e.strip() for e in os.getenv("COALESCE_ENDPOINTS", "").split(",") if e.strip()}
+
+
+def chat_key(message: str, thread_id: str = None, context=None, cache=None):
+    """Standalone questions only: a turn on an existing thread depends on its history."""
+    if thread_id:
+        return None
+    settings = tuple(sorted(context.model_dump(exclude_none=True).items())) if context else ()
+    return normalize(message), settings, cache
+
+
+def vision_key(question: str, image_ids: list, thread_id: str = None):
+    if thread_id:
+        return None
+    return tuple(image_ids), normalize(question)
+
+
+def pdf_key(doc_id: str, query: str = None, thread_id: str = None):
+    if thread_id:
+        return None
+    return doc_id, normalize(query or "")
+
+
+def image_key(params: dict, thread_id: str = None):
+    # The image doesn't depend on the thread, so even requests on threads share it (per user)
+    return tuple(sorted(params.items()))
+
+
+KEY_FUNCTIONS = {
+    "chat": chat_key,
+    "vision": vision_key,
+    "pdf": pdf_key,
+    "generate-image": image_key,
+}
+
+
+class SingleFlight:
+    """
+    `await single_flight.do(endpoint, key, fn)` returns (result, shared):
+    the result of `fn()` run once per key among concurrent callers, and
+    whether this caller got another request's result.
+    """
+
+    def __init__(self, key_functions: dict = None):
+        self.key_functions = dict(KEY_FUNCTIONS if key_functions is None else key_functions)
+        self._inflight = {}
+        self.requests = Counter()
+        self.executions = Counter()
+        self.coalesced = Counter()
+
+    def register(self, endpoint: str, key_function):
+        """Install (or, with None, remove) the key function of an endpoint."""
+        if key_function is None:
+            self.key_functions.pop(endpoint, None)
+        else:
+            self.key_functions[endpoint] = key_function
+
+    def key(self, endpoint: str, **request):
+        """The coalescing key for a request (per user), or None if it must run on its own."""
+        key_function = self.key_functions.get(endpoint)
+        if not COALESCE_ENABLED or key_function is None \
+                or (COALESCE_ENDPOINTS and endpoint not in COALESCE_ENDPOINTS):
+            return None
+        key = key_function(**request)
+        return None if key is None else (endpoint, current_user.get(), key)
+
+    async def do(self, endpoint: str, key, fn) -> tuple:
+        self.requests[endpoint] += 1
+        if key is None:
+            self.executions[endpoint] += 1
+            return await fn(), False
+
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.coalesced[endpoint] += 1
+            return await asyncio.shield(task), True
+
+        self.executions[endpoint] += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task), False
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()   # retrieved here in case every caller went away
+
+    def stats(self) -> dict:
+        total = sum(self.requests.values())
+        return {
+            "enabled": COALESCE_ENABLED,
+            "in_flight": len(self._inflight),
+            "dedup_ratio": round(sum(self.coalesced.values()) / total, 4) if total else 0.0,
+            "endpoints": {
+                endpoint: {
+                    "requests": self.requests[endpoint],
+                    "executions": self.executions[endpoint],
+                    "coalesced": self.coalesced[endpoint],
+                    "dedup_ratio": round(self.coalesced[endpoint] / self.requests[endpoint], 4)
+                    if self.requests[endpoint] else 0.0,
+                }
+                for endpoint in self.requests
+            },
+        }
+
+
+single_flight = SingleFlight()
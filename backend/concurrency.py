@@ -0,0 +1,61 @@
+import asyncio
+import os
+
+# -------------------------------
+# Per-backend concurrency limits
+# -------------------------------
+# Each model backend (Groq text, the small helper models, Gemini vision,
+# Pollinations images) gets its own cap on in-flight calls, so a burst on one
+# backend can't exhaust the provider quota or starve requests that only need
+# another one.
+BACKEND_LIMITS = {
+    "text": int(os.getenv("TEXT_MODEL_CONCURRENCY", "16")),
+    "small": int(os.getenv("SMALL_MODEL_CONCURRENCY", "32")),   # router / summary / rerank models
+    "vision": int(os.getenv("VISION_MODEL_CONCURRENCY", "8")),
+    "image": int(os.getenv("IMAGE_GEN_CONCURRENCY", "8")),
+}
+
+
+class BackendLimiter:
+    """
+    Async context manager that bounds concurrent calls to one model backend.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self._semaphore = None
+        self._loop = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the loop they first wait on; rebuild one per
+        # loop so the limiter also works across separate asyncio.run() calls.
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._loop = loop
+        return self._semaphore
+
+    async def __aenter__(self):
+        await self._get_semaphore().acquire()
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.in_flight -= 1
+        self._semaphore.release()
+        return False
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "peak": self.peak}
+
+
+limiters = {name: BackendLimiter(name, limit) for name, limit in BACKEND_LIMITS.items()}
+
+
+def limit(backend: str) -> BackendLimiter:
+    """Return the limiter guarding calls to the given backend."""
+    return limiters[backend]
@@ -1,34 +1,90 @@
-from langchain_community.utilities import GoogleSerperAPIWrapper
-from langchain_community.tools import WikipediaQueryRun, DuckDuckGoSearchResults
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.utilities import WikipediaAPIWrapper
-from langchain_groq import ChatGroq
-from langgraph.checkpoint.memory import InMemorySaver
+from checkpointing import build_checkpointer
+from state_store import build_state_store
+from response_cache import CachedTool
+from model_pool import ModelPool
+from registry import registry
 from dotenv import load_dotenv
 import os
 
 # Load environment variables
 load_dotenv()
 
+# Everything below is registered as a lazy factory (see registry.py): provider
+# SDKs are imported, API keys checked and clients created on first use, or at
+# app startup, never at import.
+
 # API keys should be set in .env file
-if not os.getenv('GOOGLE_API_KEY') or not os.getenv('GROQ_API_KEY'):
-    raise ValueError("Missing required environment variables. Please check your .env file.")
+def require_key(name: str) -> str:
+    key = os.getenv(name)
+    if not key:
+        raise ValueError(f"Missing required environment variable {name}. Please check your .env file.")
+    return key
 
 # -------------------------------
 # Models
 # -------------------------------
 # google_model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.7)
-text_model = ChatGroq(model="llama-3.3-70b-versatile")
-vision_model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.6)
+def groq_model(model: str):
+    from langchain_groq import ChatGroq
+    require_key("GROQ_API_KEY")
+    return ChatGroq(model=model)
+
+def google_model(model: str):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    require_key("GOOGLE_API_KEY")
+    return ChatGoogleGenerativeAI(model=model, temperature=0.6)
+
+# Each pool is a weighted "provider:model[:weight]" list with failover between
+# entries (see model_pool.py), e.g. TEXT_MODELS="groq:llama-3.3-70b-versatile:3,google:gemini-2.5-flash:1"
+PROVIDERS = {
+    "groq": groq_model,
+    "google": google_model,
+}
+
+# Helper steps (routing, history summaries, PDF reranking) run on a small,
+# fast model; each can be pointed elsewhere with its own *_MODELS variable.
+SMALL_MODELS = os.getenv("SMALL_MODELS", "groq:llama-3.1-8b-instant")
+MODEL_SPECS = {
+    "text": os.getenv("TEXT_MODELS", "groq:llama-3.3-70b-versatile"),
+    "vision": os.getenv("VISION_MODELS", "google:gemini-2.5-flash"),
+    "router": os.getenv("ROUTER_MODELS", SMALL_MODELS),
+    "summary": os.getenv("SUMMARY_MODELS", SMALL_MODELS),
+    "rerank": os.getenv("RERANK_MODELS", SMALL_MODELS),
+}
+
+for _name, _spec in MODEL_SPECS.items():
+    # registered as "text_model", "vision_model", ...
+    registry.register(f"{_name}_model", lambda name=_name, spec=_spec: ModelPool.from_spec(name, spec, PROVIDERS))
+
+
+def models() -> dict:
+    """Model pools built so far, by name (unbuilt or stubbed ones are left out)."""
+    built = registry.built()
+    return {name: built[f"{name}_model"] for name in MODEL_SPECS
+            if isinstance(built.get(f"{name}_model"), ModelPool)}
 
 # -------------------------------
 # Tools
 # -------------------------------
-wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
-search = DuckDuckGoSearchResults()
-tools = [search, wikipedia]
+@registry.register("wikipedia")
+def wikipedia():
+    from langchain_community.tools import WikipediaQueryRun
+    from langchain_community.utilities import WikipediaAPIWrapper
+    return WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
+
+@registry.register("search")
+def search():
+    from langchain_community.tools import DuckDuckGoSearchResults
+    return DuckDuckGoSearchResults()
+
+@registry.register("tools")
+def tools():
+    # Results are cached by normalized query (see response_cache.py)
+    return [CachedTool(registry.get("search")), CachedTool(registry.get("wikipedia"))]
 
 # -------------------------------
 # Memory Saver
 # -------------------------------
-checkpointer = InMemorySaver()
+# Backend, thread cap, TTL and pruning come from CHECKPOINTER / CHECKPOINT_* env vars
+registry.register("checkpointer", build_checkpointer)
+registry.register("state_store", build_state_store)
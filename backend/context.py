@@ -0,0 +1,195 @@
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+# -------------------------------
+# Conversation Context Management
+# -------------------------------
+# The chat model gets a token-budgeted view of the thread instead of the whole
+# history: the last CONTEXT_KEEP_TURNS turns verbatim, older turns folded into
+# a rolling summary kept in State, and tool output from earlier turns dropped.
+# The summary is extended incrementally (previous summary + newly folded
+# messages), never rebuilt from the full history.
+#
+# Strategies:
+#   summarize  keep recent turns, fold older ones into the summary (default)
+#   window     keep recent turns, drop older ones (no extra model call)
+#   full       send everything (previous behaviour), only sanitised
+CONTEXT_STRATEGY = os.getenv("CONTEXT_STRATEGY", "summarize")
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "400"))
+# Older turns are folded in batches of this many, so the summary costs one
+# extra model call every few turns rather than one per turn.
+CONTEXT_FOLD_TURNS = int(os.getenv("CONTEXT_FOLD_TURNS", "2"))
+# Prompt token budget per model backend (see concurrency.BACKEND_LIMITS)
+CONTEXT_BUDGETS = {
+    "text": int(os.getenv("TEXT_CONTEXT_TOKENS", "6000")),
+    "vision": int(os.getenv("VISION_CONTEXT_TOKENS", "8000")),
+}
+STRATEGIES = ("summarize", "window", "full")
+
+
+def settings_for(backend: str, overrides: dict = None) -> dict:
+    """
+    Effective settings for a model backend, with a thread's overrides
+    (State["context_settings"]) applied on top of the defaults.
+    """
+    settings = {
+        "strategy": CONTEXT_STRATEGY,
+        "keep_turns": CONTEXT_KEEP_TURNS,
+        "max_tokens": CONTEXT_BUDGETS.get(backend, CONTEXT_BUDGETS["text"]),
+    }
+    settings.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    if settings["strategy"] not in STRATEGIES:
+        raise ValueError(f"Unknown context strategy: {settings['strategy']!r}")
+    settings["keep_turns"] = max(1, int(settings["keep_turns"]))
+    return settings
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English; close enough for budgeting
+    return len(text) // 4 + 1
+
+
+def text_of(content) -> str:
+    """
+    Plain-text view of message content. Attachments become short placeholders
+    so raw references (PDF ids, image URLs, image requests) never reach the
+    chat model.
+    """
+    if isinstance(content, str):
+        return content
+    parts = []
+    for c in content:
+        if isinstance(c, str):
+            parts.append(c)
+        elif not isinstance(c, dict):
+            continue
+        elif c.get("type") == "text":
+            parts.append(c.get("text", ""))
+        elif c.get("type") == "pdf":
+            parts.append(f"[PDF attached: {c.get('filename') or 'document'}]")
+        elif c.get("type") in ("image_url", "image"):
+            parts.append("[Image attached]")
+        elif c.get("type") == "image_request":
+            parts.append(f"[Image requested: {c.get('prompt', '')}]")
+    return " ".join(p for p in parts if p)
+
+
+def message_tokens(msg) -> int:
+    return estimate_tokens(text_of(msg.content))
+
+
+def sanitize(msg):
+    """Copy of `msg` with list content flattened to text."""
+    if isinstance(msg.content, str):
+        return msg
+    return msg.model_copy(update={"content": text_of(msg.content)})
+
+
+def split_turns(messages: list) -> list:
+    """Group messages into turns, each starting at a HumanMessage."""
+    turns = []
+    for msg in messages:
+        if isinstance(msg, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(msg)
+    return turns
+
+
+def without_tool_traffic(turn: list) -> list:
+    """
+    A finished turn without its tool calls and results: only the question and
+    the final answer matter once the turn is over.
+    """
+    kept = []
+    for msg in turn:
+        if isinstance(msg, ToolMessage):
+            continue
+        if isinstance(msg, AIMessage) and msg.tool_calls:
+            if not text_of(msg.content).strip():
+                continue
+            msg = msg.model_copy(update={"tool_calls": [], "invalid_tool_calls": []})
+        kept.append(msg)
+    return kept
+
+
+def unsummarized(messages: list, summary_through: str = None) -> list:
+    """Messages after the last one already folded into the summary."""
+    if not summary_through:
+        return messages
+    for i, msg in enumerate(messages):
+        if msg.id == summary_through:
+            return messages[i + 1:]
+    return messages
+
+
+def plan(messages: list, summary: str = "", summary_through: str = None, settings: dict = None) -> dict:
+    """
+    Decide what the model sees for `messages`.
+
+    Returns {"recent": [...], "to_fold": [...], "fold_through": id}: `recent`
+    are the sanitised messages to send verbatim; `to_fold` are older messages
+    not yet in the summary (the caller folds them in for the summarize
+    strategy, otherwise they are simply dropped) and `fold_through` is the id
+    of the last original message they cover.
+    """
+    settings = settings or settings_for("text")
+    if settings["strategy"] == "full":
+        turns = split_turns(messages)
+        recent = [m for t in turns[:-1] for m in without_tool_traffic(t)] + (turns[-1] if turns else [])
+        return {"recent": [sanitize(m) for m in recent], "to_fold": [], "fold_through": None}
+
+    turns = split_turns(unsummarized(messages, summary_through))
+    budget = settings["max_tokens"] - estimate_tokens(summary or "")
+
+    # The current turn (including its in-progress tool loop) always goes in
+    # verbatim; earlier turns are added newest-first while they fit.
+    current = [sanitize(m) for m in turns[-1]] if turns else []
+    used = sum(message_tokens(m) for m in current)
+    kept_turns = []
+    for turn in reversed(turns[:-1]):
+        if len(kept_turns) + 1 >= settings["keep_turns"]:
+            break
+        turn = [sanitize(m) for m in without_tool_traffic(turn)]
+        cost = sum(message_tokens(m) for m in turn)
+        if used + cost > budget:
+            break
+        kept_turns.insert(0, turn)
+        used += cost
+
+    older = turns[:len(turns) - 1 - len(kept_turns)] if turns else []
+    fold_through = older[-1][-1].id if older else None
+    older = [[sanitize(m) for m in without_tool_traffic(t)] for t in older]
+    recent = [m for t in kept_turns for m in t] + current
+    pending = [m for t in older for m in t]
+
+    if settings["strategy"] == "summarize" and len(older) < CONTEXT_FOLD_TURNS \
+            and used + sum(message_tokens(m) for m in pending) <= budget:
+        # Not enough to fold yet and it still fits: keep it verbatim for now
+        return {"recent": pending + recent, "to_fold": [], "fold_through": None}
+    return {"recent": recent, "to_fold": pending, "fold_through": fold_through}
+
+
+def summary_prompt(summary: str, to_fold: list) -> list:
+    """Messages asking the model to extend `summary` with `to_fold`."""
+    lines = "\n".join(
+        f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {text_of(m.content)}"
+        for m in to_fold
+    )
+    return [
+        SystemMessage(content=(
+            "You maintain a running summary of a conversation between a user and an assistant.\n"
+            "Extend the existing summary with the new lines. Keep names, facts, decisions, user "
+            "preferences and open questions; drop greetings and filler.\n"
+            f"Reply with the updated summary only, at most {CONTEXT_SUMMARY_TOKENS} tokens."
+        )),
+        HumanMessage(content=(
+            f"**Existing summary:**\n{summary or 'None yet.'}\n\n"
+            f"**New lines:**\n{lines}"
+        )),
+    ]
+
+
+def summary_message(summary: str):
+    return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from pdf_extraction import PageCache, PDFTooLarge, iter_pages
+
+# -------------------------------
+# Content-Addressed Document Store
+# -------------------------------
+# Uploads are written once under their SHA-256; conversation state only ever
+# holds a small reference ({"type": "pdf", "doc_id": ...}). Extracted page text
+# and metadata are cached next to the blob, so re-uploading a PDF is free.
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "./data/documents")
+
+
+def _atomic_write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class DocumentStore:
+    """
+    Blob store keyed by SHA-256, with a per-document text and metadata cache.
+    """
+
+    def __init__(self, root: str = DOCUMENT_STORE_DIR):
+        self.root = root
+        self.pages = PageCache(os.path.join(root, "pages"))
+
+    def _path(self, kind: str, doc_id: str, suffix: str = "") -> str:
+        return os.path.join(self.root, kind, doc_id[:2], doc_id + suffix)
+
+    def blob_path(self, doc_id: str) -> str:
+        return self._path("blobs", doc_id)
+
+    def put(self, data: bytes, filename: str = None) -> dict:
+        """
+        Store `data` (a no-op if it is already stored) and return the
+        reference to put in a message.
+        """
+        doc_id = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self.blob_path(doc_id)):
+            _atomic_write(self.blob_path(doc_id), data)
+        return {"type": "pdf", "doc_id": doc_id, "filename": filename, "size": len(data)}
+
+    def put_file(self, fileobj, filename: str = None, max_bytes: int = None) -> dict:
+        """
+        Like `put`, for an uploaded (spooled) file: copied to the store in
+        chunks while hashing, never read into memory as a whole. Raises
+        PDFTooLarge past `max_bytes`.
+        """
+        digest, size = hashlib.sha256(), 0
+        incoming = os.path.join(self.root, "incoming")
+        os.makedirs(incoming, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                fileobj.seek(0)
+                for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise PDFTooLarge(f"PDF exceeds {max_bytes} bytes.")
+                    digest.update(chunk)
+                    out.write(chunk)
+            doc_id = digest.hexdigest()
+            if not os.path.exists(self.blob_path(doc_id)):
+                os.makedirs(os.path.dirname(self.blob_path(doc_id)), exist_ok=True)
+                os.replace(tmp, self.blob_path(doc_id))
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return {"type": "pdf", "doc_id": doc_id, "filename": filename, "size": size}
+
+    def get_bytes(self, doc_id: str) -> bytes:
+        with open(self.blob_path(doc_id), "rb") as f:
+            return f.read()
+
+    def metadata(self, doc_id: str) -> dict:
+        path = self._path("meta", doc_id, ".json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def iter_page_texts(self, doc_id: str):
+        """
+        Yield the document's page texts in order as they are extracted (or
+        straight from the page cache). CPU/IO-bound: run it off the event loop.
+        Raises PDFTooLarge / parser errors for unusable files.
+        """
+        pages = chars = 0
+        for text in iter_pages(self.blob_path(doc_id), doc_id, self.pages):
+            pages += 1
+            chars += len(text)
+            yield text
+        if not self.metadata(doc_id):
+            _atomic_write(self._path("meta", doc_id, ".json"), json.dumps({
+                "doc_id": doc_id,
+                "size": os.path.getsize(self.blob_path(doc_id)),
+                "pages": pages,
+                "chars": chars,
+                "extracted_at": time.time(),
+            }).encode("utf-8"))
+
+    def page_texts(self, doc_id: str) -> list:
+        return list(self.iter_page_texts(doc_id))
+
+    def extracted_text(self, doc_id: str) -> str:
+        return "\n".join(self.page_texts(doc_id))
+
+    def artifact_dir(self, doc_id: str) -> str:
+        """Directory for derived per-document artifacts (e.g. search indexes)."""
+        return self._path("derived", doc_id)
+
+
+document_store = DocumentStore()
@@ -0,0 +1,91 @@
+import logging
+import os
+import re
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+# -------------------------------
+# Local CPU Embeddings
+# -------------------------------
+# A feature-hashing bag-of-words embedder: no model download, no network,
+# deterministic across processes (crc32 instead of the salted builtin hash).
+# Set EMBEDDING_MODEL to a sentence-transformers model name to use that on CPU
+# for document embeddings instead (optional dependency).
+EMBEDDING_DIM = 512
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "hashing")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "for", "and", "or", "is", "are",
+    "be", "me", "my", "i", "you", "your", "it", "this", "that", "with", "please",
+    "can", "could", "would", "will", "some", "at", "by", "from", "as",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    L2-normalised hashed unigram + bigram vector for `text`.
+    """
+    vec = np.zeros(dim, dtype=np.float32)
+    tokens = tokenize(text)
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vec[h % dim] += 1.0 if (h >> 31) == 0 else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+@lru_cache(maxsize=4096)
+def cached_embedding(text: str) -> np.ndarray:
+    """Memoised `embed_text`; treat the returned array as read-only."""
+    return embed_text(text)
+
+
+def embed_batch(texts: list, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Embed many texts into one (n, dim) float32 matrix."""
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        out[i] = embed_text(text, dim)
+    return out
+
+
+@lru_cache(maxsize=1)
+def _sentence_model():
+    if EMBEDDING_MODEL == "hashing":
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.warning("sentence-transformers is not installed; using hashing embeddings")
+        return None
+    return SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+
+
+def sentence_model_loaded() -> bool:
+    """True when EMBEDDING_MODEL names a sentence-transformers model that loaded."""
+    return _sentence_model() is not None
+
+
+def embed_documents(texts: list, batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+    """
+    Embed texts in batches with the configured model; rows are L2-normalised,
+    so inner product is cosine similarity.
+    """
+    model = _sentence_model()
+    if model is not None:
+        vectors = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+    return np.concatenate(
+        [embed_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    ) if texts else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
@@ -1,30 +1,47 @@
-from langchain_community.utilities import GoogleSerperAPIWrapper
-from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import tools_condition
 from typing import Annotated, List, Dict, Any
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
-from langchain_community.tools import WikipediaQueryRun, DuckDuckGoSearchResults
 from langgraph.graph.message import add_messages
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_community.utilities import WikipediaAPIWrapper
-import io
-import PyPDF2
-from config import text_model, vision_model, wikipedia, search, tools, checkpointer
-import requests
+import config  # registers the model, tool and checkpointer factories
+from registry import registry
+import asyncio
+import logging
+from concurrency import limit
+import routing
+import context
+import response_cache
+from tool_executor import ToolExecutor, tool_rounds, TOOL_MAX_ITERATIONS
+from streaming import INTERNAL_TAG
+from documents import document_store
+from vision_images import vision_images, ImageRejected
+import retrieval
+import metrics
+from image_jobs import image_jobs, image_params, image_path, QueueFull
+from admission import current_user
 from typing import Literal
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 
+logger = logging.getLogger(__name__)
+
 # -------------------------------
 # State Definition
 # -------------------------------
 class State(TypedDict, total=False):
+    # add_messages appends: nodes return only their new messages, never the full list
     messages: Annotated[list, add_messages]
     image_url: str                 # for Vision node
+    image_ids: list                # last images asked about on this thread (vision image store keys)
     generated_image_url: str       # for Image Generation node
+    document_id: str               # last PDF queried on this thread (document store key)
     image_prompt: str   
+    image_job_id: str              # background fetch job for the last generated image
+    summary: str                   # rolling summary of turns folded out of the chat context
+    summary_through: str           # id of the last message covered by `summary`
+    context_settings: dict         # per-thread overrides for context.settings_for
+    cache_enabled: bool            # False opts the thread out of the response/tool caches
 
 workflow = StateGraph(State)
 
@@ -42,11 +59,26 @@ class RouterDecision(BaseModel):
         ..., description="Short explanation of why this node was chosen."
     )
 
-# ✅ Wrap your model with structured output
-structured_router_llm = text_model.with_structured_output(RouterDecision)
+# ✅ Wrap your model with structured output (the small router model, not the chat model)
+registry.register("structured_router_llm",
+                  lambda: registry.get("router_model").with_structured_output(RouterDecision))
+
+def content_preview(content: list, limit: int = 100) -> str:
+    """
+    Short text view of multimodal content, without stringifying attachments.
+    """
+    parts = []
+    for c in content:
+        if isinstance(c, str):
+            parts.append(c)
+        elif isinstance(c, dict) and c.get("type") == "text":
+            parts.append(c.get("text", ""))
+        elif isinstance(c, dict):
+            parts.append(f"[{c.get('type', 'attachment').upper()}]")
+    return " ".join(parts)[:limit]
 
 # ✅ Fixed Router function
-def router_node(state: State) -> str:
+async def router_node(state: State) -> str:
     """
     Smart router that correctly identifies simple conversations vs special tasks.
     """
@@ -54,6 +86,7 @@ def router_node(state: State) -> str:
     
     has_image = False
     has_pdf = False
+    image_request = False
     user_text = ""
     
     # Extract content and detect attachments
@@ -71,10 +104,21 @@ def router_node(state: State) -> str:
                 elif c.get("type") == "pdf" or "pdf_content" in c:
                     text_parts.append("[PDF_ATTACHED]")
                     has_pdf = True
+                elif c.get("type") == "image_request":
+                    image_request = True
         user_text = " ".join(text_parts)
     else:
         user_text = str(last_msg.content)
     
+    # Cheap tiers first: explicit requests, attachments, image-generation keywords, local classifier
+    route, tier = routing.fast_route(
+        user_text, has_image=has_image, has_pdf=has_pdf, image_request=image_request
+    )
+    if route:
+        routing.record(route, tier)
+        logger.info(f"⚡ Fast route ({tier}): {route}", extra={"route": route, "tier": tier})
+        return route
+    
     # Build recent conversation context (last 3 messages for efficiency)
     conversation_history = ""
     if len(state["messages"]) > 1:
@@ -82,7 +126,7 @@ def router_node(state: State) -> str:
         history_parts = []
         for msg in recent_msgs:
             role = "User" if isinstance(msg, HumanMessage) else "Assistant"
-            content = msg.content if isinstance(msg.content, str) else str(msg.content)[:100]
+            content = msg.content if isinstance(msg.content, str) else content_preview(msg.content)
             history_parts.append(f"{role}: {content}")
         conversation_history = "\n".join(history_parts)
     
@@ -118,42 +162,34 @@ def router_node(state: State) -> str:
     ])
     
     try:
-        decision: RouterDecision = (prompt | structured_router_llm).invoke({
-            "history": conversation_history if conversation_history else "No previous messages",
-            "message": user_text
-        })
+        async with limit("small"):
+            decision: RouterDecision = await (prompt | registry.get("structured_router_llm")).ainvoke({
+                "history": conversation_history if conversation_history else "No previous messages",
+                "message": user_text
+            })
         
-        # Validation: Force correct routing based on attachments
-        if has_image and decision.route != "vision":
-            print(f"⚠️ Correcting route: Image attached, forcing vision node")
-            decision.route = "vision"
-        elif has_pdf and decision.route != "pdf":
-            print(f"⚠️ Correcting route: PDF attached, forcing pdf node")
-            decision.route = "pdf"
+        # Attachments never reach this point, so the LLM can't pick their nodes
+        if decision.route in ("vision", "pdf"):
+            logger.warning(f"⚠️ Correcting route: no attachment for {decision.route}, using chatbot",
+                           extra={"route": decision.route})
+            decision.route = "chatbot"
         
-        print(f"🔀 Routing to: {decision.route}")
-        print(f"💭 Reason: {decision.reasoning}")
+        routing.record(decision.route, "llm")
+        logger.info(f"🔀 Routing to: {decision.route}",
+                    extra={"route": decision.route, "tier": "llm", "reasoning": decision.reasoning})
         
         return decision.route
         
     except Exception as e:
-        print(f"⚠️ Router error: {e}")
-        print(f"📝 User text was: {user_text[:100]}")
-        
-        # Smart fallback based on attachments
-        if has_image:
-            print("Fallback: Image detected, routing to vision")
-            return "vision"
-        elif has_pdf:
-            print("Fallback: PDF detected, routing to pdf")
-            return "pdf"
-        else:
-            print("Fallback: Routing to chatbot")
-            return "chatbot"
+        # Attachments were handled by the fast path, so fall back to chat
+        routing.record("chatbot", "llm_error")
+        logger.warning(f"⚠️ Router error, falling back to chatbot: {e}",
+                       extra={"route": "chatbot", "tier": "llm_error", "user_text": user_text[:100]})
+        return "chatbot"
 # -------------------------------
 # Chat Node
 # -------------------------------
-def chat_node(state: State):
+async def chat_node(state: State):
     system_prompt = SystemMessage(content=(
         "You are **Bob 🤖**, the user’s friendly, helpfulassistant.\n\n"
         "- Always warm, approachable, and polite — greet the user with friendliness.\n"
@@ -166,27 +202,94 @@ def chat_node(state: State):
         "- Keep answers clear, well-structured, and tailored to the query.\n"
     ))
 
-    messages = [system_prompt] + state["messages"]
-    response = text_model.invoke(messages)
+    # Standalone questions (first turn of a thread) don't depend on history, so
+    # their final answers can be shared across the user's threads
+    question = None
+    if state.get("cache_enabled", True) and response_cache.RESPONSE_CACHE_ENABLED \
+            and sum(isinstance(m, HumanMessage) for m in state["messages"]) == 1:
+        question = context.text_of(state["messages"][0].content)
+        if isinstance(state["messages"][-1], HumanMessage):
+            cached = response_cache.chat_cache.get(question, scope=current_user.get())
+            if cached is not None:
+                logger.info("💾 Response cache hit", extra={"cache": "chat"})
+                return {"messages": [AIMessage(content=cached)]}
+
+    # Token-budgeted view of the thread: recent turns verbatim, older ones summarised
+    settings = context.settings_for("text", state.get("context_settings"))
+    summary = state.get("summary", "")
+    view = context.plan(state["messages"], summary, state.get("summary_through"), settings)
+    updates = {}
+
+    if view["to_fold"]:
+        if settings["strategy"] == "summarize":
+            try:
+                async with limit("small"):
+                    folded = await registry.get("summary_model").ainvoke(
+                        context.summary_prompt(summary, view["to_fold"]), config={"tags": [INTERNAL_TAG]}
+                    )
+                summary = folded.content if isinstance(folded.content, str) else context.text_of(folded.content)
+                logger.info(f"🧾 Folded {len(view['to_fold'])} messages into the summary",
+                            extra={"folded": len(view["to_fold"])})
+            except Exception as e:
+                # Keep the old summary; the older turns just fall out of the window
+                logger.warning(f"⚠️ Summary update failed: {e}")
+        updates = {"summary": summary, "summary_through": view["fold_through"]}
+
+    messages = [system_prompt] + ([context.summary_message(summary)] if summary else []) + view["recent"]
+    # Offer the tools until the turn has used its tool rounds; then the model must
+    # answer. The tools stay bound past the limit (with tool_choice="none"): the
+    # turn's tool calls and results are still in the messages, and providers
+    # reject tool traffic sent to a model without tools.
+    rounds = tool_rounds(state["messages"])
+    tools = registry.get("tools")
+    if rounds < TOOL_MAX_ITERATIONS:
+        model = registry.get("text_model").bind_tools(tools)
+    else:
+        logger.warning(f"⚠️ Tool round limit ({TOOL_MAX_ITERATIONS}) reached, answering without tools")
+        model = registry.get("text_model").bind_tools(tools, tool_choice="none")
+    async with limit("text"):
+        response = await model.ainvoke(messages)
 
-    return {"messages": state["messages"] + [response]}
+    if question and not response.tool_calls and isinstance(response.content, str) and response.content:
+        response_cache.chat_cache.put(question, response.content, scope=current_user.get())
+
+    return {"messages": [response], **updates}
 
 
 # -------------------------------
 # Vision Node
 # -------------------------------
-def vision_node(state: State):
+async def vision_node(state: State):
     last_msg = state["messages"][-1]
 
-    question, image_url = None, None
-    for c in last_msg.content:
-        if c.get("type") == "text":
-            question = c["text"]
-        elif c.get("type") == "image_url":
-            image_url = c["image_url"]
-
-    if not image_url:
-        image_url = state.get("image_url", "")
+    question, image_ids = None, []
+    try:
+        for c in last_msg.content:
+            if c.get("type") == "text":
+                question = c["text"]
+            elif c.get("type") == "image":
+                image_ids.append(c.get("image_id"))  # already processed, in the image store
+            elif c.get("type") == "image_url":
+                # Raw URLs (older clients, legacy checkpoints) go through the same pipeline
+                image_ids.append(await vision_images.prepare(c["image_url"]))
+    except ImageRejected as e:
+        return {"messages": [AIMessage(content=f"⚠️ Could not use this image: {str(e)}")]}
+
+    # Follow-up questions reuse the thread's processed images
+    image_ids = image_ids or state.get("image_ids", [])
+    if not image_ids:
+        return {"messages": [AIMessage(content="⚠️ No image provided. Please attach an image.")]}
+
+    question = question or (
+        "Please describe this image in detail." if len(image_ids) == 1 else "Please describe these images in detail."
+    )
+    use_cache = state.get("cache_enabled", True) and response_cache.RESPONSE_CACHE_ENABLED
+    cache_key = f"{' '.join(image_ids)} {question}"
+    if use_cache:
+        cached = response_cache.vision_cache.get(cache_key)
+        if cached is not None:
+            logger.info("💾 Vision answer cache hit", extra={"cache": "vision"})
+            return {"messages": [AIMessage(content=cached)], "image_ids": image_ids}
 
     system_prompt = SystemMessage(content=(
         "You are a **Professional Image Analyst 🖼️**.\n"
@@ -203,49 +306,93 @@ def vision_node(state: State):
         "- always give the consize response."
     ))
 
+    # Downscaled JPEGs, encoded only here at the model boundary
+    data_urls = await asyncio.gather(*(asyncio.to_thread(vision_images.data_url, i) for i in image_ids))
     vision_message = HumanMessage(content=[
-        {"type": "text", "text": question or "Please describe this image in detail."},
-        {"type": "image_url", "image_url": image_url}
+        {"type": "text", "text": question},
+        *({"type": "image_url", "image_url": url} for url in data_urls)
     ])
 
-    response = vision_model.invoke([system_prompt, vision_message])
+    async with limit("vision"):
+        response = await registry.get("vision_model").ainvoke([system_prompt, vision_message])
+
+    if use_cache and isinstance(response.content, str) and response.content:
+        response_cache.vision_cache.put(cache_key, response.content)
 
-    return {"messages": state["messages"] + [response]}
+    return {"messages": [response], "image_ids": image_ids}
 
 
 # -------------------------------
-# PDF Query Node
+# PDF Reranker
 # -------------------------------
-import io
+class RerankDecision(BaseModel):
+    passages: List[int] = Field(
+        ..., description="Numbers of the passages that help answer the question, most relevant first."
+    )
+
+registry.register("rerank_llm", lambda: registry.get("rerank_model").with_structured_output(RerankDecision))
 
-def pdf_query_node(state: State):
+async def rerank_chunks(query: str, chunks: list, order: list) -> list:
+    """
+    Reorder the retrieved chunk indices with the small rerank model. Passages
+    it picks come first, the rest keep their vector order; on any failure the
+    vector order is returned unchanged.
+    """
+    listing = "\n\n".join(f"[{n}] {chunks[i]['text'][:600]}" for n, i in enumerate(order, start=1))
+    try:
+        async with limit("small"):
+            decision: RerankDecision = await registry.get("rerank_llm").ainvoke([
+                SystemMessage(content="You rank document passages by how well they answer a question. "
+                                      "Return only the numbers of the useful passages, best first."),
+                HumanMessage(content=f"Question: {query}\n\nPassages:\n{listing}"),
+            ])
+    except Exception as e:
+        logger.warning(f"⚠️ Rerank failed, keeping vector order: {e}")
+        return order
+    picked = [order[n - 1] for n in dict.fromkeys(decision.passages) if 1 <= n <= len(order)]
+    logger.info(f"🔎 Reranked {len(order)} chunks, {len(picked)} picked",
+                extra={"candidates": len(order), "picked": len(picked)})
+    return picked + [i for i in order if i not in picked]
+
+
+# -------------------------------
+# PDF Query Node
+# -------------------------------
+async def pdf_query_node(state: State):
     last_msg = state["messages"][-1]
 
-    pdf_content, query = None, None
+    doc_id, query = None, None
     for c in last_msg.content:
         if c.get("type") == "pdf":
-            pdf_content = c.get("pdf_content")  # PDF passed as bytes
+            doc_id = c.get("doc_id")  # reference into the document store
+            if not doc_id and c.get("pdf_content"):
+                # Legacy checkpoints carried raw bytes; move them into the store
+                doc_id = (await asyncio.to_thread(document_store.put, c["pdf_content"]))["doc_id"]
         elif c.get("type") == "text":
             query = c["text"]
 
-    if not pdf_content:
-        return {"messages": state["messages"] + [
+    if not doc_id:
+        return {"messages": [
             SystemMessage(content="⚠️ No PDF content provided. Please upload a valid PDF file.")
         ]}
 
-    extracted_text = ""
     try:
-        pdf_file = io.BytesIO(pdf_content)
-        reader = PyPDF2.PdfReader(pdf_file)
-        for page in reader.pages:
-            extracted_text += page.extract_text() or ""
+        # Chunks, embeds and indexes the PDF on first use; later questions load the index
+        rerank = retrieval.PDF_RERANK and query and not retrieval.is_summary_query(query)
+        k = retrieval.RERANK_CANDIDATES if rerank else retrieval.TOP_K
+        with metrics.timed("pdf_retrieval"):
+            chunks, order = await asyncio.to_thread(retrieval.candidates, doc_id, query or "", k)
+        if rerank and len(order) > 1:
+            with metrics.timed("pdf_rerank"):
+                order = await rerank_chunks(query, chunks, order)
+        excerpts = retrieval.excerpts(chunks, order)
     except Exception as e:
-        extracted_text = f"⚠️ Error reading PDF: {str(e)}"
+        excerpts = f"⚠️ Error reading PDF: {str(e)}"
 
     # ✅ Enhanced System Prompt
     system_prompt = SystemMessage(content=(
         "You are a **Smart PDF Assistant 📄**.\n"
-        "Your job is to carefully read the extracted PDF text and provide responses that are:\n\n"
+        "Your job is to carefully read the PDF excerpts (each tagged with its page) and provide responses that are:\n\n"
         "1.Always directly address the user's query.\n"
         "2.Use bullet points, short paragraphs, or numbered lists.\n"
         "3.Highlight key points, main ideas, and important details.\n"
@@ -258,24 +405,25 @@ def pdf_query_node(state: State):
 
     # Build the PDF query message
     pdf_message = HumanMessage(content=f"""
-📄 **Extracted PDF Content** (truncated for analysis):
-{extracted_text[:4000]}
+📄 **Relevant PDF Excerpts**:
+{excerpts}
 
 ❓ **User Query**: {query or "Summarize the PDF in detail."}
 """)
 
-    response = text_model.invoke([system_prompt, pdf_message])
+    async with limit("text"):
+        response = await registry.get("text_model").ainvoke([system_prompt, pdf_message])
 
-    return {"messages": state["messages"] + [response]}
+    return {"messages": [response], "document_id": doc_id}
 
 
 
-import urllib.parse
 from langchain_core.messages import AIMessage
 
-def image_generation_node(state: State):
+async def image_generation_node(state: State):
     """
-    Generate an image from a text prompt using Pollinations API.
+    Generate an image from a text prompt using Pollinations API. The fetch runs
+    as a background job; the node returns as soon as it is queued (or cached).
     """
     last_msg = state["messages"][-1]
 
@@ -289,45 +437,66 @@ def image_generation_node(state: State):
         for c in last_msg.content:
             if isinstance(c, dict) and c.get("type") == "text":
                 prompt = c.get("text", prompt)
-
-    # ✅ URL-encode the prompt for safety
-    encoded_prompt = urllib.parse.quote_plus(prompt)
-
-    # Pollinations API URL
-    image_url = f"https://pollinations.ai/p/{encoded_prompt}?width={width}&height={height}&seed={seed}&model={model}"
+        for c in last_msg.content:
+            # Explicit parameters from /generate-image take precedence
+            if isinstance(c, dict) and c.get("type") == "image_request":
+                prompt = c.get("prompt", prompt)
+                width = c.get("width", width)
+                height = c.get("height", height)
+                seed = c.get("seed", seed)
+                model = c.get("model", model)
 
     try:
-        # Optional: download locally (can be removed if not needed)
-        response = requests.get(image_url, timeout=10)
-        with open("generated_image.jpg", "wb") as f:
-            f.write(response.content)
-        print("✅ Image Downloaded")
-    except Exception as e:
+        job = await image_jobs.submit(image_params(prompt, width, height, seed, model))
+        logger.info(f"🖼️ Image job {job['job_id']}: {job['status']}",
+                    extra={"image_job_id": job["job_id"], "status": job["status"]})
+    except QueueFull as e:
         return {
-            "messages": state["messages"] + [
+            "messages": [
                 AIMessage(content=f"⚠️ Image generation failed: {str(e)}")
             ]
         }
 
+    # Served from the image cache, so the client never waits on Pollinations itself
+    image_url = image_path(job["key"])
     return {
-        "messages": state["messages"] + [
+        "messages": [
             AIMessage(content=f"🖼️ Here’s your image for **'{prompt}'**:\n{image_url}")
         ],
         "generated_image_url": image_url,
-        "image_prompt": prompt
+        "image_prompt": prompt,
+        "image_job_id": job["job_id"]
     }
 
+# -------------------------------
+# Tools Node
+# -------------------------------
+# Runs the requested tool calls concurrently, each under its own timeout
+registry.register("tool_executor", lambda: ToolExecutor(registry.get("tools")))
+
+async def tools_node(state: State, config):
+    """
+    Execute the last message's tool calls, with the tool cache bypassed for
+    threads that opted out.
+    """
+    token = response_cache.cache_bypass.set(not state.get("cache_enabled", True))
+    try:
+        return await registry.get("tool_executor")(state, config)
+    finally:
+        response_cache.cache_bypass.reset(token)
+
 # -------------------------------
 # Graph Construction
 # -------------------------------
-workflow.add_node("chatbot", chat_node)
-workflow.add_node("vision", vision_node)
-workflow.add_node("tools", ToolNode(tools))
-workflow.add_node("pdf", pdf_query_node)
-workflow.add_node("image_generation", image_generation_node)  # ✅ new node
+# Every node (and the router) is timed and error-counted per endpoint (metrics.py)
+workflow.add_node("chatbot", metrics.instrument("chatbot", chat_node))
+workflow.add_node("vision", metrics.instrument("vision", vision_node))
+workflow.add_node("tools", metrics.instrument("tools", tools_node))
+workflow.add_node("pdf", metrics.instrument("pdf", pdf_query_node))
+workflow.add_node("image_generation", metrics.instrument("image_generation", image_generation_node))  # ✅ new node
 
 # Conditional routing from START
-workflow.add_conditional_edges(START, router_node, {
+workflow.add_conditional_edges(START, metrics.instrument("router", router_node), {
     "chatbot": "chatbot",
     "vision": "vision",
     "pdf": "pdf",
@@ -344,5 +513,11 @@ workflow.add_edge("chatbot", END)
 workflow.add_edge("pdf", END)
 workflow.add_edge("image_generation", END)  # ✅ new edge
 
-# Compile graph with checkpointer
-graph = workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
+# Compile graph with checkpointer (on first use, see registry.py); every model
+# call inside it reports latency, tokens and cost to metrics.model_metrics
+registry.register("graph", lambda: workflow.compile(checkpointer=registry.get("checkpointer"))
+                  .with_config(callbacks=[metrics.model_metrics]))
+
+def get_graph():
+    """The compiled graph, built on first call."""
+    return registry.get("graph")
@@ -0,0 +1,346 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+
+import httpx
+
+from concurrency import limit
+from registry import registry
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Image Generation Jobs
+# -------------------------------
+# Generation is submitted as a job and fetched from Pollinations by a bounded
+# pool of async workers sharing one pooled HTTP client. Results land in a disk
+# cache keyed by (prompt, width, height, seed, model), so an identical request
+# is answered from disk, and identical in-flight requests share one job. The
+# cache keeps at most IMAGE_CACHE_MAX_BYTES, evicting the least recently used
+# images. Replies link the image as served from that cache
+# (/generate-image/images/<key>), which waits for a job still in flight.
+# With a shared state store (STATE_STORE=sqlite) every job's status is also
+# written there, so another worker can answer the status poll.
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "./data/images")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "4"))
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", "256"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "120"))
+IMAGE_JOB_TTL_SECONDS = float(os.getenv("IMAGE_JOB_TTL_SECONDS", "3600"))
+POLLINATIONS_URL = os.getenv("POLLINATIONS_URL", "https://pollinations.ai/p")
+IMAGE_BATCH_MAX = int(os.getenv("IMAGE_BATCH_MAX", "16"))
+
+
+class QueueFull(Exception):
+    """The image job queue is at capacity; `retry_after` estimates when it has room."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def image_params(prompt: str, width: int = 512, height: int = 512, seed: int = 42, model: str = "flux") -> dict:
+    return {"prompt": prompt, "width": int(width), "height": int(height), "seed": int(seed), "model": model}
+
+
+def cache_key(params: dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def pollinations_url(params: dict) -> str:
+    encoded_prompt = urllib.parse.quote_plus(params["prompt"])
+    return (
+        f"{POLLINATIONS_URL}/{encoded_prompt}?width={params['width']}&height={params['height']}"
+        f"&seed={params['seed']}&model={params['model']}"
+    )
+
+
+def image_path(key: str) -> str:
+    """Where the API serves the cached image for `key`."""
+    return f"/generate-image/images/{key}"
+
+
+class ImageCache:
+    """
+    Disk cache of generated images: <root>/<key[:2]>/<key> plus <key>.json,
+    bounded to `max_bytes` with least-recently-used eviction. The LRU order
+    starts from the files' modification times, and `touch` bumps them, so it
+    survives restarts.
+    """
+
+    def __init__(self, root: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._sizes = None       # key -> bytes, least recently used first (loaded lazily)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def _index(self) -> dict:
+        if self._sizes is None:
+            found = []
+            if os.path.isdir(self.root):
+                for shard in os.scandir(self.root):
+                    if shard.is_dir():
+                        found.extend((entry.stat().st_mtime, entry.name, entry.stat().st_size)
+                                     for entry in os.scandir(shard.path)
+                                     if entry.is_file() and "." not in entry.name)
+            self._sizes = {key: size for _, key, size in sorted(found)}
+            self._bytes = sum(self._sizes.values())
+        return self._sizes
+
+    def touch(self, key: str):
+        """Mark `key` as just used."""
+        with self._lock:
+            sizes = self._index()
+            if key in sizes:
+                sizes[key] = sizes.pop(key)
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, sizes: dict):
+        while self._bytes > self.max_bytes and len(sizes) > 1:
+            key = next(iter(sizes))
+            self._bytes -= sizes.pop(key)
+            for suffix in ("", ".json"):
+                try:
+                    os.remove(self.path(key) + suffix)
+                except FileNotFoundError:
+                    pass
+            self.evictions += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            sizes = self._index()
+            return {"images": len(sizes), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "evictions": self.evictions}
+
+    def content_type(self, key: str) -> str:
+        try:
+            with open(self.path(key) + ".json", "r", encoding="utf-8") as f:
+                return json.load(f).get("content_type", "image/jpeg")
+        except FileNotFoundError:
+            return "image/jpeg"
+
+    def put(self, key: str, data: bytes, content_type: str, params: dict):
+        directory = os.path.dirname(self.path(key))
+        os.makedirs(directory, exist_ok=True)
+        meta = json.dumps({"content_type": content_type, "params": params, "created": time.time()})
+        for suffix, payload in ((".json", meta.encode("utf-8")), ("", data)):
+            fd, tmp = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, self.path(key) + suffix)
+        with self._lock:
+            sizes = self._index()
+            self._bytes += len(data) - sizes.pop(key, 0)
+            sizes[key] = len(data)
+            self._evict(sizes)
+
+
+class ImageJobQueue:
+    """
+    Bounded queue of image fetch jobs served by IMAGE_WORKERS asyncio tasks.
+    Workers and the HTTP client are created lazily on the running loop.
+    """
+
+    def __init__(self, cache: ImageCache, workers: int = IMAGE_WORKERS, maxsize: int = IMAGE_QUEUE_SIZE):
+        self.cache = cache
+        self.num_workers = workers
+        self.maxsize = maxsize
+        self.jobs = {}             # job_id -> job dict
+        self._inflight = {}        # cache key -> job_id of a queued/running job
+        self._done_events = {}     # job_id -> asyncio.Event set when the job finishes
+        self._queue = None
+        self._workers = []
+        self._client = None
+        self._loop = None
+        # Optional httpx transport override (benchmarks plug in a local stub)
+        self.transport = None
+        self._fetch_seconds = 5.0          # moving average of a fetch, for Retry-After
+        self.stats = {"submitted": 0, "cache_hits": 0, "deduplicated": 0, "fetched": 0, "failed": 0}
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._inflight.clear()
+        self._done_events.clear()
+        self._client = httpx.AsyncClient(
+            timeout=IMAGE_FETCH_TIMEOUT,
+            follow_redirects=True,
+            transport=self.transport,
+            limits=httpx.Limits(max_connections=self.num_workers, max_keepalive_connections=self.num_workers),
+        )
+        # A fresh context: started from inside a request, the workers would
+        # otherwise log and count every later fetch under that request's
+        # endpoint and thread_id
+        self._workers = [loop.create_task(self._worker(), context=contextvars.Context())
+                         for _ in range(self.num_workers)]
+
+    def _new_job(self, key: str, params: dict, status: str) -> dict:
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "key": key,
+            "params": params,
+            "source_url": pollinations_url(params),
+            "status": status,
+            "error": None,
+            "created": time.time(),
+            "finished": time.time() if status == "done" else None,
+        }
+        self.jobs[job["job_id"]] = job
+        if status != "done":
+            self._done_events[job["job_id"]] = asyncio.Event()
+        return job
+
+    def _expire_jobs(self):
+        cutoff = time.time() - IMAGE_JOB_TTL_SECONDS
+        for job_id in [j for j, job in self.jobs.items() if job["finished"] and job["finished"] < cutoff]:
+            del self.jobs[job_id]
+
+    async def _publish(self, job: dict):
+        store = registry.get("state_store")
+        if store.shared:
+            await asyncio.to_thread(store.put, "image_jobs", job["job_id"], job, IMAGE_JOB_TTL_SECONDS)
+
+    async def submit(self, params: dict) -> dict:
+        """
+        Return a job for `params` without waiting for the image: already
+        `done` on a cache hit, the existing job if one is in flight, otherwise
+        a newly queued job. Raises QueueFull when the queue is at capacity.
+        """
+        return (await self.submit_many([params]))[0]
+
+    async def submit_many(self, params_list: list) -> list:
+        """
+        `submit` for several images, all or nothing: raises QueueFull before
+        queuing any job when the new ones don't all fit.
+        """
+        self._ensure_started()
+        self._expire_jobs()
+        keys = [cache_key(params) for params in params_list]
+        new = {key for key in keys if key not in self._inflight and not self.cache.exists(key)}
+        if len(new) > self.maxsize - self._queue.qsize():
+            retry_after = self._fetch_seconds * (self._queue.qsize() + len(new)) / self.num_workers
+            raise QueueFull("Image generation queue is full; try again shortly.", retry_after)
+
+        jobs, published = [], []
+        for key, params in zip(keys, params_list):
+            self.stats["submitted"] += 1
+            if self.cache.exists(key):
+                self.stats["cache_hits"] += 1
+                self.cache.touch(key)
+                job = self._new_job(key, params, "done")
+            elif key in self._inflight:
+                self.stats["deduplicated"] += 1
+                jobs.append(self.jobs[self._inflight[key]])
+                continue
+            else:
+                job = self._new_job(key, params, "queued")
+                self._inflight[key] = job["job_id"]
+                self._queue.put_nowait(job)
+            jobs.append(job)
+            published.append(job)
+        await asyncio.gather(*(self._publish(job) for job in published))
+        return jobs
+
+    async def wait(self, job: dict, timeout: float = None) -> dict:
+        """Wait for the job to finish (for callers that want the result inline)."""
+        event = self._done_events.get(job["job_id"])
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout or IMAGE_FETCH_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job["status"] = "running"
+            start = time.perf_counter()
+            try:
+                # Workers outlive the request that started them, so no endpoint label
+                with metrics.timed("image_fetch", endpoint="background"):
+                    async with limit("image"):
+                        response = await self._client.get(job["source_url"])
+                response.raise_for_status()
+                content_type = response.headers.get("content-type", "image/jpeg").split(";")[0]
+                if not content_type.startswith("image/"):
+                    raise ValueError(f"Unexpected content type {content_type!r}")
+                await asyncio.to_thread(self.cache.put, job["key"], response.content, content_type, job["params"])
+                job["status"] = "done"
+                self.stats["fetched"] += 1
+                self._fetch_seconds += 0.1 * (time.perf_counter() - start - self._fetch_seconds)
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e) or type(e).__name__
+                self.stats["failed"] += 1
+            finally:
+                job["finished"] = time.time()
+                try:
+                    await self._publish(job)
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not publish image job {job['job_id']}: {e}")
+                self._inflight.pop(job["key"], None)
+                event = self._done_events.pop(job["job_id"], None)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    async def wait_for_key(self, key: str, timeout: float = None):
+        """Wait for this worker's in-flight job for `key`, if there is one; returns it (or None)."""
+        job = self.jobs.get(self._inflight.get(key, ""))
+        return await self.wait(job, timeout) if job else None
+
+    async def lookup(self, job_id: str):
+        """A job of this worker, or of any worker through the shared state store."""
+        job = self.jobs.get(job_id)
+        store = registry.get("state_store")
+        if job is None and store.shared:
+            job = await asyncio.to_thread(store.get, "image_jobs", job_id)
+        return job
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "in_flight": len(self._inflight),
+            "workers": self.num_workers,
+            "cache": self.cache.snapshot(),
+        }
+
+
+image_cache = ImageCache()
+image_jobs = ImageJobQueue(image_cache)
+
+
+def public_job(job: dict) -> dict:
+    """The part of a job that is safe to return to clients."""
+    out = {k: job[k] for k in ("job_id", "status", "error", "params", "source_url")}
+    out["status_url"] = f"/generate-image/jobs/{job['job_id']}"
+    out["image_url"] = image_path(job["key"]) if job["status"] == "done" else None
+    return out
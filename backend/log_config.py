@@ -0,0 +1,66 @@
+import json
+import logging
+import os
+import time
+
+from metrics import current_endpoint, current_thread
+
+# -------------------------------
+# Structured Logging
+# -------------------------------
+# Every record carries the request's endpoint and thread id (from the metrics
+# context variables) plus any `extra={...}` fields, rendered as key=value
+# pairs after the message (LOG_FORMAT=text) or as one JSON object per line
+# (LOG_FORMAT=json) for log shippers.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "endpoint"):
+            record.endpoint = current_endpoint.get()
+        if not hasattr(record, "thread_id"):
+            record.thread_id = current_thread.get()
+        return True
+
+
+def fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _STANDARD and v is not None}
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{record.levelname}:{record.name}:{record.getMessage()}"
+        extra = " ".join(f"{k}={v}" for k, v in fields(record).items() if not (k == "endpoint" and v == "none"))
+        line = f"{line} [{extra}]" if extra else line
+        if record.exc_info:
+            line = f"{line}\n{self.formatException(record.exc_info)}"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **fields(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(fmt: str = LOG_FORMAT, level: str = LOG_LEVEL):
+    """Replace the root handlers with one structured stderr handler."""
+    handler = logging.StreamHandler()
+    handler.addFilter(ContextFilter())
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -1,19 +1,67 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from models import ChatRequest, VisionRequest, PDFRequest
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Depends
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, PlainTextResponse
+from models import ChatRequest, VisionRequest, PDFRequest, ImageBatchRequest
 from langchain_core.messages import HumanMessage, SystemMessage
-from graphs import graph
+from graphs import get_graph
+from config import models
+from registry import registry
+from streaming import stream_graph, SSE_HEADERS
+from concurrency import limiters
+import routing
+import response_cache
+from documents import document_store
+from pdf_extraction import PDF_MAX_BYTES, PDFTooLarge, shutdown_pool
+from vision_images import vision_images, ImageRejected, VISION_MAX_BYTES, VISION_MAX_IMAGES
+from uploads import UploadSizeLimit
+from coalescing import single_flight
+from thread_locks import thread_locks, ThreadBusy
+from admission import scheduler, current_user, Rejected
+import metrics
+from metrics import MetricsMiddleware, thread_usage
+from log_config import configure_logging
+from auth.auth_routes import router as auth_router
+from auth.hashing import hash_pool
+from auth.token import request_user, claims_cache
+from pydantic import ValidationError
+from image_jobs import image_jobs, image_cache, image_params, public_job, QueueFull, IMAGE_BATCH_MAX
+import asyncio
+import contextlib
+import os
 import uuid
 import logging
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging (structured: endpoint, thread id and extra fields on every record)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build the models, tools and graph once at startup (off the event loop), so
+    the first request doesn't pay for them and missing API keys fail here.
+    """
+    seconds = await asyncio.to_thread(registry.warm)
+    logger.info(f"Components ready in {seconds:.2f}s: {', '.join(registry.built())}")
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 and not registry.get("state_store").shared:
+        logger.warning("⚠️ Several workers without a shared state store (STATE_STORE=sqlite): "
+                       "threads and image jobs are only known to the worker that created them")
+    yield
+    hash_pool.shutdown()
+    shutdown_pool()
+
 # Initialize FastAPI app
-app = FastAPI(title="AI Assistant Backend")
+app = FastAPI(title="AI Assistant Backend", lifespan=lifespan)
+
+# Reject oversized uploads from their Content-Length, before parsing the body
+app.add_middleware(UploadSizeLimit, limits={
+    "/pdf": PDF_MAX_BYTES,
+    "/pdf/stream": PDF_MAX_BYTES,
+    "/vision": VISION_MAX_BYTES * VISION_MAX_IMAGES,
+    "/vision/stream": VISION_MAX_BYTES * VISION_MAX_IMAGES,
+})
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,88 +71,333 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request latency covers the other middleware too
+app.add_middleware(MetricsMiddleware)
+
+app.include_router(auth_router)
+
+
+# -------------------------------
+# Graph Inputs
+# -------------------------------
+def thread_config(thread_id: str = None) -> dict:
+    return {"configurable": {"thread_id": thread_id or str(uuid.uuid4())}}
+
+
+def chat_input(message: str, context_settings=None, cache: bool = None) -> dict:
+    inputs = {"messages": [HumanMessage(content=message)]}
+    if context_settings is not None:
+        inputs["context_settings"] = context_settings.model_dump(exclude_none=True)
+    if cache is not None:
+        inputs["cache_enabled"] = cache
+    return inputs
+
+
+def vision_input(question: str, image_refs: list) -> dict:
+    return {
+        "messages": [
+            HumanMessage(content=[
+                {"type": "text", "text": question},
+                *image_refs  # {"type": "image", "image_id": ...}; processed bytes stay in the image store
+            ])
+        ]
+    }
+
+
+def pdf_input(document_ref: dict, query: str = None) -> dict:
+    return {
+        "messages": [
+            HumanMessage(content=[
+                document_ref,  # {"type": "pdf", "doc_id": ...}; bytes stay in the document store
+                {"type": "text", "text": query or "Summarize the PDF."}
+            ])
+        ]
+    }
+
+
+async def resolve_document(file: UploadFile, config: dict) -> dict:
+    """
+    Store an uploaded PDF (once, keyed by content hash) or fall back to the
+    thread's current document for follow-up questions.
+    """
+    if file is not None:
+        # Copied from the spooled upload in chunks, never read into memory whole
+        try:
+            return await asyncio.to_thread(document_store.put_file, file.file, file.filename, PDF_MAX_BYTES)
+        except PDFTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+    state = await get_graph().aget_state(config)
+    doc_id = state.values.get("document_id")
+    if not doc_id:
+        raise HTTPException(status_code=400, detail="No PDF uploaded for this thread.")
+    return {"type": "pdf", "doc_id": doc_id}
+
+
+async def read_vision_request(request: Request, form) -> tuple:
+    """
+    Parse a /vision request: JSON (VisionRequest) or multipart form data with
+    `question`, `thread_id`, optional `image_url` fields and `files` uploads.
+    Returns (VisionRequest, [UploadFile, ...]).
+    """
+    try:
+        if form is None:
+            return VisionRequest.model_validate(await request.json()), []
+        fields = {
+            "question": form.get("question"),
+            "thread_id": form.get("thread_id") or None,
+            "image_urls": form.getlist("image_url") or None,
+        }
+        body = VisionRequest.model_validate({k: v for k, v in fields.items() if v is not None})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Expected a JSON or multipart/form-data body.")
+    uploads = [f for f in form.getlist("files") + form.getlist("file") if hasattr(f, "file")]
+    return body, uploads
+
+
+async def resolve_images(image_urls: list, uploads: list, config: dict) -> list:
+    """
+    Fetch/decode, validate and downscale every image of the request (once
+    per URL and content), or fall back to the thread's current images for
+    follow-up questions.
+    """
+    if len(image_urls) + len(uploads) > VISION_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {VISION_MAX_IMAGES} images per request.")
+    try:
+        image_ids = await asyncio.gather(
+            *(vision_images.prepare(url) for url in image_urls),
+            *(asyncio.to_thread(vision_images.put_file, upload.file) for upload in uploads),
+        )
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    if not image_ids:
+        state = await get_graph().aget_state(config)
+        image_ids = state.values.get("image_ids", [])
+    if not image_ids:
+        raise HTTPException(status_code=400, detail="No image provided for this thread.")
+    return [{"type": "image", "image_id": image_id} for image_id in image_ids]
+
+
+def vision_form(request: Request):
+    """
+    Async context manager yielding the parsed form of a multipart /vision
+    request (None for JSON); the spooled uploads are closed on exit.
+    """
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        return request.form(max_files=VISION_MAX_IMAGES)
+    return contextlib.nullcontext()
+
+
+def rejected(e: Rejected) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def admission_user(request: Request, claims: dict = Depends(request_user)):
+    """
+    Dependency of the model endpoints: records the caller's JWT subject for
+    the admission scheduler and takes a rate-limit token (429 when out).
+    """
+    user = claims.get("sub") if claims else None
+    current_user.set(user)
+    try:
+        scheduler.check_rate(request.url.path.strip("/").split("/")[0], user)
+    except Rejected as e:
+        raise rejected(e)
+
+
+# State a shared execution leaves behind that the other requests' threads also need
+SHARED_STATE_KEYS = ("document_id", "image_ids", "generated_image_url", "image_prompt", "image_job_id")
+
+
+async def run_graph(endpoint: str, key, inputs: dict, config: dict, node: str) -> dict:
+    """
+    graph.ainvoke through the single-flight layer. A request that got another
+    request's result has the exchange written to its own thread, as if `node`
+    had answered it there, so follow-up questions on that thread work.
+    Writes to a thread hold its turn lock; a 409 means it stayed busy.
+    """
+    thread_id = config["configurable"]["thread_id"]
+    user = current_user.get()
+
+    async def execute():
+        # Only the execution takes an admission slot; coalesced requests just wait for it
+        async with thread_locks.hold(thread_id), scheduler.admit(endpoint, user):
+            return await get_graph().ainvoke(inputs, config=config), thread_id
+
+    try:
+        (result, leader_thread), shared = await single_flight.do(endpoint, key, execute)
+        if shared and leader_thread != thread_id:
+            values = {k: result[k] for k in SHARED_STATE_KEYS if k in result}
+            async with thread_locks.hold(thread_id):
+                await get_graph().aupdate_state(
+                    config, {**inputs, **values, "messages": [*inputs["messages"], result["messages"][-1]]},
+                    as_node=node,
+                )
+    except ThreadBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Rejected as e:
+        raise rejected(e)
+    return result
+
+
+async def held_stream(inputs: dict, config: dict, release):
+    """stream_graph, calling `release` (the turn lock and admission slot) when it ends."""
+    try:
+        async for frame in stream_graph(get_graph(), inputs, config):
+            yield frame
+    finally:
+        await release()
+
+
+async def event_stream(endpoint: str, inputs: dict, config: dict) -> StreamingResponse:
+    """
+    Take the thread's turn lock and then an admission slot before answering,
+    in the same order as run_graph, so a busy thread is a 409 and a full
+    queue a 503, and a stream waiting on its thread holds no slot. Both are
+    released when the stream ends (or, if it never started, after the
+    response).
+    """
+    held = contextlib.AsyncExitStack()
+    try:
+        await held.enter_async_context(thread_locks.hold(config["configurable"]["thread_id"]))
+        held.callback((await scheduler.acquire(endpoint, current_user.get())).release)
+    except ThreadBusy as e:
+        await held.aclose()
+        raise HTTPException(status_code=409, detail=str(e))
+    except Rejected as e:
+        await held.aclose()
+        raise rejected(e)
+    except BaseException:
+        await held.aclose()
+        raise
+    # aclose() empties the stack, so the second call is a no-op
+    return StreamingResponse(
+        held_stream(inputs, config, held.aclose),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(held.aclose),
+    )
+
 
 # -------------------------------
 # FastAPI Endpoints
 # -------------------------------
-@app.post("/chat")
+@app.post("/chat", dependencies=[Depends(admission_user)])
 async def chat_endpoint(request: ChatRequest):
     """
     Endpoint for text-based chat interactions.
     """
     try:
-        thread_id = request.thread_id or str(uuid.uuid4())
-        config = {"configurable": {"thread_id": thread_id}}
+        config = thread_config(request.thread_id)
+        thread_id = config["configurable"]["thread_id"]
 
-        result = graph.invoke({
-            "messages": [HumanMessage(content=request.message)]
-        }, config=config)
+        key = single_flight.key("chat", message=request.message, thread_id=request.thread_id,
+                                context=request.context, cache=request.cache)
+        result = await run_graph("chat", key, chat_input(request.message, request.context, request.cache),
+                                 config, "chatbot")
 
         return JSONResponse({
             "response": result["messages"][-1].content,
             "thread_id": thread_id
         })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in chat_endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/vision")
-async def vision_endpoint(request: VisionRequest):
+@app.post("/vision", dependencies=[Depends(admission_user)])
+async def vision_endpoint(request: Request):
     """
-    Endpoint for vision-based queries with an image URL.
+    Endpoint for vision-based queries. Accepts JSON with `image_url` /
+    `image_urls`, or multipart form data with one or more `files` uploads.
+    Without an image, the question is asked about the thread's last images.
     """
     try:
-        thread_id = request.thread_id or str(uuid.uuid4())
-        config = {"configurable": {"thread_id": thread_id}}
+        async with vision_form(request) as form:
+            body, uploads = await read_vision_request(request, form)
+            config = thread_config(body.thread_id)
+            thread_id = config["configurable"]["thread_id"]
+            image_refs = await resolve_images(body.all_image_urls(), uploads, config)
 
-        vision_result = graph.invoke({
-            "messages": [
-                HumanMessage(content=[
-                    {"type": "text", "text": request.question},
-                    {"type": "image_url", "image_url": request.image_url}
-                ])
-            ]
-        }, config=config)
+        key = single_flight.key("vision", question=body.question, thread_id=body.thread_id,
+                                image_ids=[ref["image_id"] for ref in image_refs])
+        vision_result = await run_graph("vision", key, vision_input(body.question, image_refs), config, "vision")
 
         return JSONResponse({
             "response": vision_result["messages"][-1].content,
+            "image_ids": [ref["image_id"] for ref in image_refs],
             "thread_id": thread_id
         })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in vision_endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/pdf")
-async def pdf_endpoint(query: str = None, file: UploadFile = File(...), thread_id: str = None):
+@app.post("/pdf", dependencies=[Depends(admission_user)])
+async def pdf_endpoint(query: str = None, file: UploadFile = File(None), thread_id: str = None):
     """
-    Endpoint for PDF processing and querying.
+    Endpoint for PDF processing and querying. Without a file, the question is
+    asked about the last PDF uploaded on the thread.
     """
     try:
-        # Read PDF content into memory
-        pdf_content = await file.read()
-
-        thread_id = thread_id or str(uuid.uuid4())
-        config = {"configurable": {"thread_id": thread_id}}
+        key_thread = thread_id
+        config = thread_config(thread_id)
+        thread_id = config["configurable"]["thread_id"]
+        document_ref = await resolve_document(file, config)
 
-        pdf_result = graph.invoke({
-            "messages": [
-                HumanMessage(content=[
-                    {"type": "pdf", "pdf_content": pdf_content},  # Pass content instead of path
-                    {"type": "text", "text": query or "Summarize the PDF."}
-                ])
-            ]
-        }, config=config)
+        key = single_flight.key("pdf", doc_id=document_ref["doc_id"], query=query, thread_id=key_thread)
+        pdf_result = await run_graph("pdf", key, pdf_input(document_ref, query), config, "pdf")
 
         return JSONResponse({
             "response": pdf_result["messages"][-1].content,
+            "document_id": document_ref["doc_id"],
             "thread_id": thread_id
         })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in pdf_endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+# -------------------------------
+# Streaming Endpoints (Server-Sent Events)
+# -------------------------------
+@app.post("/chat/stream", dependencies=[Depends(admission_user)])
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Streaming variant of /chat: pushes tokens as the model produces them.
+    """
+    config = thread_config(request.thread_id)
+    return await event_stream("chat", chat_input(request.message, request.context, request.cache), config)
+
+@app.post("/vision/stream", dependencies=[Depends(admission_user)])
+async def vision_stream_endpoint(request: Request):
+    """
+    Streaming variant of /vision (JSON or multipart).
+    """
+    async with vision_form(request) as form:
+        body, uploads = await read_vision_request(request, form)
+        config = thread_config(body.thread_id)
+        image_refs = await resolve_images(body.all_image_urls(), uploads, config)
+    return await event_stream("vision", vision_input(body.question, image_refs), config)
+
+@app.post("/pdf/stream", dependencies=[Depends(admission_user)])
+async def pdf_stream_endpoint(query: str = None, file: UploadFile = File(None), thread_id: str = None):
+    """
+    Streaming variant of /pdf.
+    """
+    config = thread_config(thread_id)
+    document_ref = await resolve_document(file, config)
+    return await event_stream("pdf", pdf_input(document_ref, query), config)
+
 from fastapi import Body
 
-@app.post("/generate-image")
+@app.post("/generate-image", dependencies=[Depends(admission_user)])
 async def generate_image_endpoint(
     prompt: str = Body(..., embed=True),
     width: int = Body(1024),
@@ -117,29 +410,192 @@ async def generate_image_endpoint(
     Endpoint for AI image generation.
     """
     try:
-        thread_id = thread_id or str(uuid.uuid4())
-        config = {"configurable": {"thread_id": thread_id}}
+        config = thread_config(thread_id)
+        thread_id = config["configurable"]["thread_id"]
 
-        image_result = graph.invoke({
+        # The image_request part routes straight to image_generation (no router
+        # LLM) and carries the parameters through to the node
+        params = image_params(prompt, width, height, seed, model)
+        key = single_flight.key("generate-image", params=params, thread_id=thread_id)
+        image_result = await run_graph("generate-image", key, {
             "messages": [
                 HumanMessage(content=[
                     {"type": "text", "text": f"generate image: {prompt}"},
+                    {"type": "image_request", **params},
                 ])
             ]
-        }, config=config)
+        }, config, "image_generation")
 
         # Pull URL from result
         generated_url = image_result.get("generated_image_url", "")
+        job = image_jobs.get(image_result.get("image_job_id", ""))
 
         return JSONResponse({
             "response": image_result["messages"][-1].content,
             "generated_image_url": generated_url,
+            "job": public_job(job) if job else None,
             "thread_id": thread_id
         })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in generate_image_endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate-image/batch", dependencies=[Depends(admission_user)])
+async def generate_image_batch_endpoint(request: ImageBatchRequest):
+    """
+    Generate N prompts, or one prompt with N seeds, in one call. Jobs run
+    concurrently on the bounded image worker pool; with `wait` the response
+    is returned once every job has finished. Each image takes a rate-limit
+    token, and the batch is queued whole or not at all.
+    """
+    if request.prompts:
+        params = [image_params(p, request.width, request.height, request.seed, request.model)
+                  for p in request.prompts]
+    elif request.prompt and request.seeds:
+        params = [image_params(request.prompt, request.width, request.height, s, request.model)
+                  for s in request.seeds]
+    else:
+        raise HTTPException(status_code=422, detail="Provide `prompts`, or `prompt` with `seeds`.")
+    user = current_user.get()
+    most = min(IMAGE_BATCH_MAX, scheduler.max_cost(user))
+    if len(params) > most:
+        raise HTTPException(status_code=422, detail=f"At most {most:g} images per batch.")
+
+    try:
+        # admission_user took the first token
+        scheduler.check_rate("generate-image", user, cost=len(params) - 1)
+        jobs = await image_jobs.submit_many(params)
+    except Rejected as e:
+        raise rejected(e)
+    except QueueFull as e:
+        raise rejected(Rejected(503, str(e), e.retry_after))
+    if request.wait:
+        await asyncio.gather(*(image_jobs.wait(job) for job in jobs))
+
+    return JSONResponse({"jobs": [public_job(job) for job in jobs]})
+
+@app.get("/generate-image/jobs/{job_id}")
+async def image_job_status(job_id: str):
+    """
+    Status of an image generation job; `image_url` is set once it is done.
+    """
+    job = await image_jobs.lookup(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown image job.")
+    return JSONResponse(public_job(job))
+
+@app.get("/generate-image/images/{key}")
+async def generated_image(key: str):
+    """
+    Serve a generated image from the content-addressed cache, waiting for
+    the job if it is still being generated.
+    """
+    if not key.isalnum():
+        raise HTTPException(status_code=404, detail="Image not found.")
+    if not image_cache.exists(key):
+        job = await image_jobs.wait_for_key(key)
+        if job and job["status"] == "failed":
+            raise HTTPException(status_code=502, detail=f"Image generation failed: {job['error']}")
+        if not image_cache.exists(key):
+            raise HTTPException(status_code=404, detail="Image not found.")
+    image_cache.touch(key)
+    return FileResponse(image_cache.path(key), media_type=image_cache.content_type(key))
+
+@app.get("/stats")
+async def stats_endpoint():
+    """
+    Runtime counters of this worker: router tier usage, per-backend
+    concurrency, model pool health, checkpointer size.
+    """
+    return JSONResponse({
+        "router": routing.stats(),
+        "backends": {name: limiter.stats() for name, limiter in limiters.items()},
+        "models": {name: pool.stats() for name, pool in models().items()},
+        "checkpointer": get_graph().checkpointer.stats(),
+        "coalescing": single_flight.stats(),
+        "auth": {"hashing": hash_pool.stats(), "token_cache": claims_cache.stats()},
+        "response_cache": response_cache.stats(),
+        "vision_images": vision_images.stats,
+        "tools": registry.get("tool_executor").stats(),
+        "image_jobs": image_jobs.snapshot(),
+        "state_store": registry.get("state_store").stats(),
+        "thread_locks": thread_locks.stats(),
+        "admission": scheduler.stats(),
+        "worker": os.getpid(),
+        "components": registry.stats(),
+    })
+
+# -------------------------------
+# Metrics (Prometheus text format)
+# -------------------------------
+@metrics.collector
+def cache_metrics():
+    caches = response_cache.stats()
+    return [("response_cache_lookups_total", "counter", "Response and tool cache lookups by result.", [
+        ({"cache": name, "result": result}, caches[name][result])
+        for name in ("chat", "tools", "vision") for result in ("exact_hits", "semantic_hits", "misses")
+    ])]
+
+@metrics.collector
+def tool_metrics():
+    executor = registry.built().get("tool_executor")
+    if executor is None:
+        return []
+    tools = executor.stats()
+    return [
+        ("tool_calls_total", "counter", "Tool calls by outcome.", [
+            ({"tool": name, "outcome": outcome}, tools[name][outcome])
+            for name in tools for outcome in ("ok", "timeout", "error")
+        ]),
+        ("tool_call_seconds_sum", "counter", "Total tool call time.", [
+            ({"tool": name}, tools[name]["latency"]["sum"]) for name in tools
+        ]),
+    ]
+
+@metrics.collector
+def thread_lock_metrics():
+    locks = thread_locks.stats()
+    return [("thread_lock_events_total", "counter", "Per-thread turn lock acquisitions, waits and timeouts.", [
+        ({"event": event}, locks[event]) for event in ("acquired", "waited", "timeouts")
+    ])]
+
+@metrics.collector
+def admission_metrics():
+    stats = scheduler.stats()
+    return [
+        ("admission_queue_depth", "gauge", "Graph executions waiting for a slot.", [
+            ({"kind": kind}, stats["queue_depth"].get(kind, 0)) for kind in ("chat", "vision", "pdf", "generate-image")
+        ]),
+        ("admission_in_flight", "gauge", "Graph executions holding a slot.", [({}, stats["in_flight"])]),
+    ]
+
+@metrics.collector
+def image_job_metrics():
+    jobs = image_jobs.snapshot()
+    return [("image_jobs_total", "counter", "Image generation jobs by outcome.", [
+        ({"outcome": outcome}, jobs[outcome]) for outcome in ("submitted", "cache_hits", "deduplicated", "fetched", "failed")
+    ])]
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Latency histograms, token and cost counters, route decisions, cache hits
+    and error counts, in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/threads/{thread_id}")
+async def thread_metrics(thread_id: str):
+    """
+    Tokens, cost, node time and errors of one recently active thread.
+    """
+    usage = thread_usage.get(thread_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="No metrics for this thread.")
+    return JSONResponse(usage)
+
 @app.get("/health")
 async def health_check():
     """
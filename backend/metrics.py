@@ -0,0 +1,427 @@
+import asyncio
+import bisect
+import contextlib
+import inspect
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+import context
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Metrics
+# -------------------------------
+# Process-local counters and histograms, labelled like Prometheus series and
+# rendered in its text format by GET /metrics (no client library needed).
+# Graph nodes are wrapped with `instrument`, model calls are observed by the
+# `model_metrics` callback handler attached to the compiled graph, and the
+# HTTP layer by MetricsMiddleware, which also sets the endpoint label for
+# everything that runs inside the request.
+#
+# Series are labelled by endpoint, node and model only; per-thread figures
+# would be unbounded as labels, so they are kept in a small LRU table
+# (GET /metrics/threads/{thread_id}) and on every log record instead.
+METRICS_MAX_THREADS = int(os.getenv("METRICS_MAX_THREADS", "1000"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# USD per million tokens, "model=input/output,...", for the cost counter
+MODEL_PRICES = os.getenv(
+    "MODEL_PRICES",
+    "llama-3.3-70b-versatile=0.59/0.79,llama-3.1-8b-instant=0.05/0.08,gemini-2.5-flash=0.30/2.50",
+)
+# Share of requests profiled with pyinstrument (optional dependency); 0 disables
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./data/profiles")
+
+# Request-scoped labels, read by the node wrapper, the model callback and log records
+current_endpoint = ContextVar("current_endpoint", default="none")
+current_thread = ContextVar("current_thread", default=None)
+
+
+def parse_prices(spec: str) -> dict:
+    prices = {}
+    for item in (part.strip() for part in spec.split(",")):
+        if "=" in item and "/" in item:
+            model, rates = item.rsplit("=", 1)
+            prompt, completion = rates.split("/", 1)
+            prices[model.strip()] = (float(prompt) / 1e6, float(completion) / 1e6)
+    return prices
+
+
+PRICES = parse_prices(MODEL_PRICES)
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram (Prometheus style)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += n
+            cumulative[str(bound)] = running
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "avg": round(self.total / self.count, 4) if self.count else 0.0,
+            "buckets": cumulative,
+        }
+
+
+# -------------------------------
+# Metric Families
+# -------------------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self.values[key] += amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            if key not in self.series:
+                self.series[key] = LatencyHistogram(self.buckets)
+            self.series[key].observe(seconds)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self.series.items())
+        for key, hist in series:
+            running = 0
+            for bound, n in zip(list(self.buckets) + ["+Inf"], hist.counts):
+                running += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {hist.total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {hist.count}")
+        return lines
+
+
+HTTP_LATENCY = Histogram("http_request_seconds", "HTTP request latency.", ("endpoint", "method", "status"))
+NODE_LATENCY = Histogram("graph_node_seconds", "Graph node latency.", ("node", "endpoint"))
+NODE_ERRORS = Counter("graph_node_errors_total", "Graph node exceptions.", ("node", "endpoint", "error"))
+MODEL_LATENCY = Histogram("model_call_seconds", "Model call latency.", ("model", "node", "endpoint"))
+MODEL_ERRORS = Counter("model_errors_total", "Failed model calls.", ("model", "node", "endpoint", "error"))
+MODEL_TOKENS = Counter("model_tokens_total", "Model tokens (estimated where the provider reports none).",
+                       ("model", "node", "endpoint", "direction"))
+MODEL_COST = Counter("model_cost_usd_total", "Model cost from MODEL_PRICES.", ("model", "endpoint"))
+ROUTE_DECISIONS = Counter("route_decisions_total", "Router decisions by tier.", ("route", "tier", "endpoint"))
+STEP_LATENCY = Histogram("step_seconds", "Timed steps inside nodes and background jobs.", ("step", "endpoint"))
+ADMISSION_WAIT = Histogram("admission_wait_seconds", "Time graph executions waited for a slot.", ("kind",))
+ADMISSION_DECISIONS = Counter("admission_decisions_total", "Admission outcomes (admitted, rate_limited, "
+                              "queue_full, displaced, timeout).", ("kind", "outcome"))
+
+FAMILIES = [HTTP_LATENCY, NODE_LATENCY, NODE_ERRORS, MODEL_LATENCY, MODEL_ERRORS, MODEL_TOKENS, MODEL_COST,
+            ROUTE_DECISIONS, STEP_LATENCY, ADMISSION_WAIT, ADMISSION_DECISIONS]
+
+# Functions returning [(name, type, help, [(labels dict, value), ...]), ...]
+# for figures other modules already keep (cache hits, tool outcomes, ...)
+collectors = []
+
+
+def collector(fn):
+    collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    lines = []
+    for family in FAMILIES:
+        lines.extend(family.render())
+    for fn in collectors:
+        try:
+            families = fn()
+        except Exception as e:
+            logger.warning(f"Metrics collector {fn.__name__} failed: {e}")
+            continue
+        for name, kind, help, samples in families:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def timed(step: str, endpoint: str = None):
+    """Time a step inside a node (PDF retrieval, an image fetch, ...) into STEP_LATENCY."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STEP_LATENCY.observe(time.perf_counter() - start, step=step, endpoint=endpoint or current_endpoint.get())
+
+
+# -------------------------------
+# Per-thread Usage
+# -------------------------------
+class ThreadUsage:
+    """
+    Tokens, cost, node time and errors of the most recently active threads
+    (LRU), with node errors broken down by endpoint.
+    """
+
+    def __init__(self, max_threads: int = METRICS_MAX_THREADS):
+        self.max_threads = max_threads
+        self._threads = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, thread_id, endpoint: str, **amounts):
+        if not thread_id:
+            return
+        with self._lock:
+            usage = self._threads.get(thread_id)
+            if usage is None:
+                usage = self._threads[thread_id] = {
+                    "tokens_in": 0, "tokens_out": 0, "cost_usd": 0.0, "model_calls": 0, "model_errors": 0,
+                    "node_seconds": 0.0, "errors": 0, "errors_by_endpoint": {},
+                }
+            self._threads.move_to_end(thread_id)
+            usage["last_endpoint"] = endpoint
+            if amounts.get("errors"):
+                usage["errors_by_endpoint"][endpoint] = usage["errors_by_endpoint"].get(endpoint, 0) + amounts["errors"]
+            for key, amount in amounts.items():
+                usage[key] += amount
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+
+    def get(self, thread_id: str):
+        with self._lock:
+            usage = self._threads.get(thread_id)
+            if usage is None:
+                return None
+            return {**usage, "node_seconds": round(usage["node_seconds"], 4), "cost_usd": round(usage["cost_usd"], 6),
+                    "errors_by_endpoint": dict(usage["errors_by_endpoint"])}
+
+
+thread_usage = ThreadUsage()
+
+
+# -------------------------------
+# Node Instrumentation
+# -------------------------------
+def instrument(name: str, fn):
+    """
+    Wrap a graph node (or routing function) to time it and count its errors
+    by endpoint, and to tag log records inside it with the thread id.
+    """
+    takes_config = "config" in inspect.signature(fn).parameters
+
+    # Not functools.wraps: LangGraph reads the wrapper's own signature to pass `config`
+    async def node(state, config):
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        endpoint = current_endpoint.get()
+        token = current_thread.set(thread_id)
+        start = time.perf_counter()
+        try:
+            return await (fn(state, config) if takes_config else fn(state))
+        except Exception as e:
+            NODE_ERRORS.inc(node=name, endpoint=endpoint, error=type(e).__name__)
+            thread_usage.add(thread_id, endpoint, errors=1)
+            logger.error(f"Node {name} failed: {e}", extra={"node": name, "error": type(e).__name__})
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            NODE_LATENCY.observe(seconds, node=name, endpoint=endpoint)
+            thread_usage.add(thread_id, endpoint, node_seconds=seconds)
+            current_thread.reset(token)
+
+    node.__name__ = getattr(fn, "__name__", name)
+    return node
+
+
+# -------------------------------
+# Model Call Instrumentation
+# -------------------------------
+def _usage(response) -> tuple:
+    """(input, output) tokens the provider reported for an LLMResult, or (None, None)."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None, None
+
+
+class ModelMetrics(BaseCallbackHandler):
+    """
+    Callback handler timing every chat model call made inside the graph and
+    counting its tokens, cost and errors.
+    """
+
+    run_inline = True
+    ignore_chain = True
+    ignore_agent = True
+    ignore_retriever = True
+
+    def __init__(self):
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        self._runs[run_id] = {
+            "start": time.perf_counter(),
+            "model": metadata.get("ls_model_name") or (serialized or {}).get("name") or "unknown",
+            "node": metadata.get("langgraph_node", "none"),
+            "thread_id": metadata.get("thread_id"),
+            "endpoint": current_endpoint.get(),
+            "estimate_in": sum(context.message_tokens(m) for batch in messages for m in batch),
+        }
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        labels = {"model": run["model"], "node": run["node"], "endpoint": run["endpoint"]}
+        MODEL_LATENCY.observe(time.perf_counter() - run["start"], **labels)
+        tokens_in, tokens_out = _usage(response)
+        if tokens_in is None:
+            tokens_in = run["estimate_in"]
+            tokens_out = sum(context.estimate_tokens(g.text) for gs in response.generations for g in gs)
+        MODEL_TOKENS.inc(tokens_in, direction="input", **labels)
+        MODEL_TOKENS.inc(tokens_out, direction="output", **labels)
+        prompt_price, completion_price = PRICES.get(run["model"], (0.0, 0.0))
+        cost = tokens_in * prompt_price + tokens_out * completion_price
+        if cost:
+            MODEL_COST.inc(cost, model=run["model"], endpoint=run["endpoint"])
+        thread_usage.add(run["thread_id"], run["endpoint"], tokens_in=tokens_in, tokens_out=tokens_out,
+                         cost_usd=cost, model_calls=1)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        labels = {"model": run["model"], "node": run["node"], "endpoint": run["endpoint"]}
+        MODEL_LATENCY.observe(time.perf_counter() - run["start"], **labels)
+        MODEL_ERRORS.inc(error=type(error).__name__, **labels)
+        # Failed-over calls may still answer; node errors count what the caller saw
+        thread_usage.add(run["thread_id"], run["endpoint"], model_errors=1)
+
+
+model_metrics = ModelMetrics()
+
+
+# -------------------------------
+# HTTP Middleware (+ sampling profiler hook)
+# -------------------------------
+_profiling = threading.Lock()   # pyinstrument runs one profiler per thread at a time
+
+
+def _profiler():
+    """A pyinstrument Profiler for this request, or None (not sampled, busy, or not installed)."""
+    global PROFILE_SAMPLE_RATE
+    if not PROFILE_SAMPLE_RATE or random.random() >= PROFILE_SAMPLE_RATE or _profiling.locked():
+        return None
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("pyinstrument is not installed; request profiling disabled")
+        PROFILE_SAMPLE_RATE = 0.0
+        return None
+    return Profiler(async_mode="enabled")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency by route and status, and
+    setting the endpoint label for the graph runs inside the request. With
+    PROFILE_SAMPLE_RATE, a sample of requests is profiled to PROFILE_DIR.
+    """
+
+    def __init__(self, app, skip=("/metrics", "/health")):
+        self.app = app
+        self.skip = skip
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = current_endpoint.set(scope["path"])
+        profiler = _profiler()
+        if profiler and _profiling.acquire(blocking=False):
+            profiler.start()
+        else:
+            profiler = None
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            # Route templates (/generate-image/jobs/{job_id}) keep the label set bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_LATENCY.observe(seconds, endpoint=route, method=scope["method"], status=status["code"])
+            current_endpoint.reset(token)
+            if profiler:
+                profiler.stop()
+                _profiling.release()
+                await asyncio.to_thread(self._save, profiler, route, seconds)
+
+    @staticmethod
+    def _save(profiler, route: str, seconds: float):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{seconds * 1000:.0f}ms.html"
+        path = os.path.join(PROFILE_DIR, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+        logger.info(f"Profile written to {path}")
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import ensure_config
+
+try:
+    # Private in langchain_core: the handler behind astream_events and stream_mode="messages"
+    from langchain_core.tracers._streaming import _StreamingCallbackHandler
+except ImportError:
+    _StreamingCallbackHandler = None
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Model Pool (failover, backoff, hedging)
+# -------------------------------
+# A pool holds one or more weighted backends for the same job (e.g. two Groq
+# models plus Gemini as a fallback for text). Each call goes to the backend
+# with the best EWMA latency per unit of weight, adjusted for its in-flight
+# calls. 429s, 5xx and connection errors put the backend in a cooldown with
+# exponential backoff (or the provider's Retry-After) and fail over to the
+# next backend; any other error (a 400, a parse error) is raised at once.
+# Optionally, once a call has run past the backend's tail latency, a hedged
+# copy is sent to the next backend and the first answer wins. Calls whose
+# tokens stream to a client are never hedged, so the streamed tokens and the
+# final answer come from the same call.
+#
+# Backends are configured as "provider:model[:weight]" lists, e.g.
+#   TEXT_MODELS="groq:llama-3.3-70b-versatile:3,google:gemini-2.5-flash:1"
+MODEL_MAX_ATTEMPTS = int(os.getenv("MODEL_MAX_ATTEMPTS", "4"))
+MODEL_BACKOFF_BASE = float(os.getenv("MODEL_BACKOFF_BASE", "0.5"))
+MODEL_BACKOFF_MAX = float(os.getenv("MODEL_BACKOFF_MAX", "8"))
+MODEL_EWMA_ALPHA = float(os.getenv("MODEL_EWMA_ALPHA", "0.2"))
+# "off", "auto" (hedge after the backend's observed p95) or a number of seconds
+MODEL_HEDGE = os.getenv("MODEL_HEDGE", "off")
+MODEL_HEDGE_MIN_SAMPLES = int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", "20"))
+
+
+def is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return "ratelimit" in text or "rate limit" in text or "resource_exhausted" in text or " 429" in text
+
+
+def is_transient(error: Exception) -> bool:
+    """Rate limits, 5xx and connection/timeout errors: worth a cooldown and another backend."""
+    if is_rate_limited(error):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    name = type(error).__name__
+    return isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name
+
+
+def streams_tokens(config) -> bool:
+    """
+    True when a handler on the call streams its tokens (astream_events,
+    stream_mode="messages"). If langchain_core no longer has the handler
+    class, every call counts as streamed, so nothing is hedged.
+    """
+    if _StreamingCallbackHandler is None:
+        return True
+    callbacks = ensure_config(config).get("callbacks")
+    handlers = getattr(callbacks, "handlers", callbacks) or []
+    return any(isinstance(h, _StreamingCallbackHandler) for h in handlers)
+
+
+def retry_after(error: Exception):
+    """Seconds from a Retry-After header on the error's response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Backend:
+    """One model behind a pool, with its latency and error statistics."""
+
+    def __init__(self, name: str, model, weight: float = 1.0):
+        self.name = name
+        self.model = model
+        self.weight = weight
+        self.ewma = None
+        self.samples = deque(maxlen=200)
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.failures_in_row = 0
+        self.counts = {"calls": 0, "errors": 0, "rate_limited": 0, "hedges_started": 0, "hedges_won": 0}
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.ewma = seconds if self.ewma is None else MODEL_EWMA_ALPHA * seconds + (1 - MODEL_EWMA_ALPHA) * self.ewma
+        self.failures_in_row = 0
+
+    def p95(self):
+        if len(self.samples) < MODEL_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def cool_down(self, error: Exception):
+        self.failures_in_row += 1
+        delay = retry_after(error)
+        if delay is None:
+            delay = min(MODEL_BACKOFF_MAX, MODEL_BACKOFF_BASE * 2 ** (self.failures_in_row - 1))
+            delay *= random.uniform(0.5, 1.0)
+        self.cooldown_until = time.monotonic() + delay
+
+    def score(self) -> float:
+        # Unmeasured backends score 0 so each gets tried early
+        return (self.ewma or 0.0) * (1 + self.in_flight) / self.weight
+
+    def snapshot(self) -> dict:
+        return {
+            **self.counts,
+            "weight": self.weight,
+            "ewma_ms": round(self.ewma * 1000, 1) if self.ewma is not None else None,
+            "p95_ms": round(self.p95() * 1000, 1) if self.p95() is not None else None,
+            "in_flight": self.in_flight,
+            "cooling_down": self.cooldown_until > time.monotonic(),
+        }
+
+
+class ModelPool(Runnable):
+    """
+    Runnable that sends each call to one of several backends. `bind_tools`
+    and `with_structured_output` return pools over the wrapped backends that
+    share the same statistics, so the pool can stand in for a chat model.
+    """
+
+    def __init__(self, name: str, backends: list, runnables: dict = None,
+                 hedge: str = MODEL_HEDGE, max_attempts: int = MODEL_MAX_ATTEMPTS):
+        self.name = name
+        self.backends = backends
+        self.runnables = runnables or {b.name: b.model for b in backends}
+        self.hedge = hedge
+        self.max_attempts = max_attempts
+
+    @classmethod
+    def from_spec(cls, name: str, spec: str, providers: dict, **kwargs) -> "ModelPool":
+        """
+        Build a pool from "provider:model[:weight],..." using `providers`
+        (provider name -> factory taking the model name).
+        """
+        backends = []
+        for item in (part.strip() for part in spec.split(",")):
+            if not item:
+                continue
+            parts = item.split(":")
+            provider, weight = parts[0], 1.0
+            if len(parts) > 2 and parts[-1].replace(".", "", 1).isdigit():
+                weight = float(parts.pop())
+            model_name = ":".join(parts[1:])
+            if provider not in providers:
+                raise ValueError(f"Unknown model provider {provider!r} in {spec!r}")
+            backends.append(Backend(f"{provider}:{model_name}", providers[provider](model_name), weight))
+        if not backends:
+            raise ValueError(f"No backends configured for the {name} model pool")
+        return cls(name, backends, **kwargs)
+
+    def _derive(self, wrap) -> "ModelPool":
+        runnables = {b.name: wrap(self.runnables[b.name]) for b in self.backends}
+        return ModelPool(self.name, self.backends, runnables, hedge=self.hedge, max_attempts=self.max_attempts)
+
+    def bind_tools(self, tools, **kwargs) -> "ModelPool":
+        return self._derive(lambda model: model.bind_tools(tools, **kwargs))
+
+    def with_structured_output(self, schema, **kwargs) -> "ModelPool":
+        return self._derive(lambda model: model.with_structured_output(schema, **kwargs))
+
+    def _ranked(self, exclude=()) -> list:
+        """Backends in the order to try them: ready ones by score, then cooling down."""
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b.name not in exclude]
+        ready = sorted((b for b in candidates if b.cooldown_until <= now), key=lambda b: (b.score(), -b.weight))
+        cooling = sorted((b for b in candidates if b.cooldown_until > now), key=lambda b: b.cooldown_until)
+        return ready + cooling
+
+    def _hedge_after(self, backend: Backend):
+        if self.hedge == "off":
+            return None
+        if self.hedge == "auto":
+            return backend.p95()
+        return float(self.hedge)
+
+    async def _call(self, backend: Backend, input, config, **kwargs):
+        backend.in_flight += 1
+        backend.counts["calls"] += 1
+        start = time.perf_counter()
+        try:
+            result = await self.runnables[backend.name].ainvoke(input, config, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            backend.counts["errors"] += 1
+            if is_rate_limited(e):
+                backend.counts["rate_limited"] += 1
+            if is_transient(e):
+                backend.cool_down(e)
+            raise
+        finally:
+            backend.in_flight -= 1
+        backend.observe(time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, primary: Backend, spare, input, config, called: list, **kwargs):
+        """Call `primary`, hedged to `spare`; every backend called is appended to `called`."""
+        called.append(primary.name)
+        threshold = self._hedge_after(primary) if spare and not streams_tokens(config) else None
+        if threshold is None:
+            return await self._call(primary, input, config, **kwargs)
+
+        first = asyncio.ensure_future(self._call(primary, input, config, **kwargs))
+        done, _ = await asyncio.wait({first}, timeout=threshold)
+        if done:
+            return first.result()
+
+        spare.counts["hedges_started"] += 1
+        called.append(spare.name)
+        second = asyncio.ensure_future(self._call(spare, input, config, **kwargs))
+        pending, error = {first, second}, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            spare.counts["hedges_won"] += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        tried, last_error = set(), None
+        for attempt in range(self.max_attempts):
+            ranked = self._ranked(exclude=tried) or self._ranked()
+            primary = ranked[0]
+            wait = primary.cooldown_until - time.monotonic()
+            if wait > 0:
+                # Every backend is rate-limited: back off until the first one is free
+                await asyncio.sleep(wait)
+            called = []
+            try:
+                return await self._hedged(primary, ranked[1] if len(ranked) > 1 else None, input, config,
+                                          called, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                last_error = e
+                # A failed hedge failed on both backends: neither gets the retry
+                tried.update(called)
+                if len(tried) >= len(self.backends):
+                    tried.clear()
+                logger.warning(f"{self.name} backend {', '.join(called)} failed ({type(e).__name__}: {e}); "
+                               f"attempt {attempt + 1}/{self.max_attempts}")
+        raise last_error
+
+    def invoke(self, input, config=None, **kwargs):
+        # Sync path (no hedging): try backends in order
+        last_error = None
+        for backend in self._ranked()[:self.max_attempts]:
+            try:
+                return self.runnables[backend.name].invoke(input, config, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                last_error = e
+                backend.cool_down(e)
+        raise last_error
+
+    def stats(self) -> dict:
+        return {"hedge": self.hedge, "backends": {b.name: b.snapshot() for b in self.backends}}
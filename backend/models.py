@@ -1,17 +1,40 @@
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
 
 # -------------------------------
 # Pydantic Models for Request Validation
 # -------------------------------
+class ContextSettings(BaseModel):
+    """Per-thread overrides for how much history the chat model sees."""
+    strategy: Optional[Literal["summarize", "window", "full"]] = None
+    keep_turns: Optional[int] = Field(None, ge=1)
+    max_tokens: Optional[int] = Field(None, ge=256)
+
 class ChatRequest(BaseModel):
     message: str
     thread_id: str = None
+    context: Optional[ContextSettings] = None   # stored on the thread; later requests inherit it
+    cache: Optional[bool] = None                # False opts the thread out of response caching
 
 class VisionRequest(BaseModel):
     question: str
-    image_url: str
+    image_url: Optional[str] = None           # omit both to ask about the thread's last images
+    image_urls: Optional[List[str]] = None    # several images in one question
     thread_id: str = None
 
+    def all_image_urls(self) -> List[str]:
+        return ([self.image_url] if self.image_url else []) + (self.image_urls or [])
+
 class PDFRequest(BaseModel):
     query: str
-    thread_id: str = None
\ No newline at end of file
+    thread_id: str = None
+
+class ImageBatchRequest(BaseModel):
+    prompts: Optional[List[str]] = None   # N prompts ...
+    prompt: Optional[str] = None          # ... or one prompt with N seeds
+    seeds: Optional[List[int]] = None
+    width: int = 1024
+    height: int = 1024
+    seed: int = 42
+    model: str = "flux"
+    wait: bool = True                     # return once all images are fetched
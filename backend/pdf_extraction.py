@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import PyPDF2
+
+# -------------------------------
+# Parallel PDF Text Extraction
+# -------------------------------
+# Pages are parsed in a process pool in fixed-size batches and yielded in page
+# order as soon as each batch finishes, so chunking/embedding can start before
+# the whole file is parsed. Page text is cached per document hash, so a PDF is
+# only ever parsed once.
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(os.cpu_count() or 1, 8))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Below this many pages the pool's overhead isn't worth it; parse inline.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PDFTooLarge(ValueError):
+    """The PDF exceeds the configured page or byte limit."""
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: workers must not inherit the server's threads and sockets
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+@lru_cache(maxsize=4)
+def _reader(path: str, mtime: float) -> PyPDF2.PdfReader:
+    # Parsing the xref/page tree is a large share of the cost; each process
+    # keeps the readers of the last few files instead of re-opening per batch.
+    return PyPDF2.PdfReader(path)
+
+
+def _extract_range(path: str, start: int, end: int) -> list:
+    """Text of pages [start, end) of the PDF at `path` (also runs in workers)."""
+    reader = _reader(path, os.path.getmtime(path))
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+class PageCache:
+    """
+    Per-page text cache: <root>/<doc_id[:2]>/<doc_id>/<page>.txt, plus a
+    `count` file once every page of the document is present.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _dir(self, doc_id: str) -> str:
+        return os.path.join(self.root, doc_id[:2], doc_id)
+
+    def page_count(self, doc_id: str):
+        try:
+            with open(os.path.join(self._dir(doc_id), "count"), "r") as f:
+                return int(f.read())
+        except FileNotFoundError:
+            return None
+
+    def get(self, doc_id: str, page: int):
+        try:
+            with open(os.path.join(self._dir(doc_id), f"{page}.txt"), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, doc_id: str, name: str, text: str):
+        """Write a file of the document atomically: readers see all of it or none."""
+        directory = self._dir(doc_id)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, os.path.join(directory, name))
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def put(self, doc_id: str, page: int, text: str):
+        self._write(doc_id, f"{page}.txt", text)
+
+    def mark_complete(self, doc_id: str, count: int):
+        self._write(doc_id, "count", str(count))
+
+
+def count_pages(path: str) -> int:
+    return len(_reader(path, os.path.getmtime(path)).pages)
+
+
+def iter_pages(path: str, doc_id: str, cache: PageCache,
+               max_pages: int = PDF_MAX_PAGES, max_bytes: int = PDF_MAX_BYTES):
+    """
+    Yield the text of each page of the PDF at `path`, in order. Cached pages
+    are served from `cache`; the rest are parsed (in parallel for large files)
+    and written back. Raises PDFTooLarge before parsing anything if the file
+    breaks the byte or page limit.
+    """
+    count = cache.page_count(doc_id)
+    if count is not None:
+        cached = [cache.get(doc_id, page) for page in range(count)]
+        if all(text is not None for text in cached):
+            yield from cached
+            return
+        # Pages have gone missing since: a miss, re-extract the gaps below
+
+    size = os.path.getsize(path)
+    if size > max_bytes:
+        raise PDFTooLarge(f"PDF is {size} bytes; the limit is {max_bytes}.")
+    count = count_pages(path)
+    if count > max_pages:
+        raise PDFTooLarge(f"PDF has {count} pages; the limit is {max_pages}.")
+
+    batches = [(s, min(s + PDF_PAGES_PER_TASK, count)) for s in range(0, count, PDF_PAGES_PER_TASK)]
+    parallel = count >= PDF_PARALLEL_MIN_PAGES and PDF_EXTRACT_WORKERS > 1
+    futures = {}
+    if parallel:
+        pool = _get_pool()
+        for start, end in batches:
+            if any(cache.get(doc_id, p) is None for p in range(start, end)):
+                futures[start] = pool.submit(_extract_range, path, start, end)
+
+    try:
+        for start, end in batches:
+            cached = None if start in futures else [cache.get(doc_id, p) for p in range(start, end)]
+            if cached is not None and all(t is not None for t in cached):
+                yield from cached
+                continue
+            texts = futures[start].result() if start in futures else _extract_range(path, start, end)
+            for page, text in zip(range(start, end), texts):
+                cache.put(doc_id, page, text)
+                yield text
+        cache.mark_complete(doc_id, count)
+    finally:
+        # Consumer stopped early (or failed): don't leave batches running
+        for future in futures.values():
+            future.cancel()
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+# -------------------------------
+# Lazy Component Registry
+# -------------------------------
+# Models, tools, the checkpointer and the compiled graph are registered here as
+# factories (config.py, graphs.py) and built once: on first use, or at app
+# startup for WARM_COMPONENTS (main.py's lifespan). Importing those modules
+# therefore imports no provider SDKs, checks no API keys and compiles nothing.
+#
+# `override` injects a ready-made instance instead, e.g. a stub model in the
+# benchmarks. Derived components (a pool's structured-output wrapper, the tool
+# executor) are built from whatever their dependencies resolve to at the time,
+# so override before first use, or `reset` the derived names afterwards.
+WARM_COMPONENTS = [
+    name.strip() for name in os.getenv(
+        "WARM_COMPONENTS",
+        "text_model,vision_model,router_model,summary_model,rerank_model,tool_executor,graph,state_store",
+    ).split(",") if name.strip()
+]
+
+_MISSING = object()
+
+
+class Registry:
+    """
+    Named singletons built by registered factories. `get` builds a component
+    (and, through its factory, its dependencies) at most once, thread-safely.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()   # re-entrant: factories get their dependencies
+        self.build_seconds = {}
+
+    def register(self, name: str, factory=None):
+        """Register `factory` (no arguments) for `name`; without one, returns a decorator."""
+        if factory is None:
+            return lambda f: self.register(name, f)
+        self._factories[name] = factory
+        return factory
+
+    def get(self, name: str):
+        instance = self._instances.get(name, _MISSING)
+        if instance is not _MISSING:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"No component registered as {name!r}")
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self.build_seconds[name] = time.perf_counter() - start
+            return self._instances[name]
+
+    def override(self, name: str, instance):
+        """Use `instance` for `name` from now on instead of building it."""
+        with self._lock:
+            self._instances[name] = instance
+            self.build_seconds.pop(name, None)
+        return instance
+
+    def reset(self, *names: str):
+        """Drop built or overridden instances (all of them without names); the next `get` rebuilds."""
+        with self._lock:
+            for name in names or list(self._instances):
+                self._instances.pop(name, None)
+                self.build_seconds.pop(name, None)
+
+    def built(self) -> dict:
+        """Components built or overridden so far, by name."""
+        return dict(self._instances)
+
+    def warm(self, names=None) -> float:
+        """Build `names` (default WARM_COMPONENTS) now; returns the seconds it took."""
+        start = time.perf_counter()
+        for name in WARM_COMPONENTS if names is None else names:
+            self.get(name)
+        return time.perf_counter() - start
+
+    def stats(self) -> dict:
+        return {
+            "registered": sorted(self._factories),
+            "built": {
+                name: round(self.build_seconds[name] * 1000, 1) if name in self.build_seconds else "override"
+                for name in self._instances
+            },
+        }
+
+
+registry = Registry()
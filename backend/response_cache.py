@@ -0,0 +1,211 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+
+import faiss
+import numpy as np
+from langchain_core.tools import BaseTool
+
+from embeddings import embed_documents, sentence_model_loaded
+
+# -------------------------------
+# Response Cache (exact + semantic)
+# -------------------------------
+# Answers to standalone questions and tool results are cached by normalized
+# text, within a scope (the chat cache is scoped per user). Lookups try an
+# exact match first, then (where enabled) the nearest cached query of the same
+# scope in a FAISS index of sentence embeddings, accepted only above a
+# cosine-similarity threshold. The semantic layer needs a real sentence model
+# (EMBEDDING_MODEL): the hashing embedder drops pronouns and negations as
+# stopwords, so "what is my name" would match "what is your name". Entries
+# expire after a TTL and the least recently used are evicted beyond a size
+# limit.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "on") != "off"
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(6 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+TOOL_CACHE_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", str(3600)))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+
+# Set for the duration of a graph step whose thread opted out of caching
+cache_bypass = ContextVar("cache_bypass", default=False)
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a query."""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub("", text.lower())).strip()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU + TTL cache keyed by (scope, normalized text), with an
+    optional semantic layer (`similarity` = None disables it; so does the
+    lack of a sentence-embedding model).
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int, similarity: float = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries = OrderedDict()    # (scope, key) -> (value, expires_at, vector id)
+        self._keys_by_id = {}            # vector id -> (scope, key)
+        self._next_id = 0
+        self._index = None               # built on the first semantic put, sized to the model
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def _drop(self, key: tuple):
+        _, _, vector_id = self._entries.pop(key)
+        if vector_id is not None:
+            self._index.remove_ids(np.array([vector_id], dtype=np.int64))
+            del self._keys_by_id[vector_id]
+
+    def _vector(self, key: str):
+        """Sentence embedding of `key`, or None when the semantic layer is off."""
+        if not self.similarity or not sentence_model_loaded():
+            return None
+        return embed_documents([key])[0].reshape(1, -1)
+
+    def _live(self, key: tuple, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < now:
+            self._drop(key)
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def get(self, text: str, scope: str = None):
+        """Cached value for `text` (or a close enough query) in `scope`, else None."""
+        key = (scope, normalize(text))
+        now = time.time()
+        with self._lock:
+            value = self._live(key, now)
+            if value is not None:
+                self.stats["exact_hits"] += 1
+                return value
+            semantic = self._index is not None and self._index.ntotal
+        vector = self._vector(key[1]) if semantic else None
+        with self._lock:
+            if vector is not None and self._index.ntotal:
+                scores, ids = self._index.search(vector, min(8, self._index.ntotal))
+                for score, vector_id in zip(scores[0], ids[0]):
+                    if vector_id < 0 or score < self.similarity:
+                        break
+                    match = self._keys_by_id.get(int(vector_id))
+                    if match is None or match[0] != scope:
+                        continue
+                    value = self._live(match, now)
+                    if value is not None:
+                        self.stats["semantic_hits"] += 1
+                        return value
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, text: str, value, scope: str = None):
+        key = (scope, normalize(text))
+        if not key[1]:
+            return
+        vector = self._vector(key[1])
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            vector_id = None
+            if vector is not None:
+                if self._index is None:
+                    self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+                vector_id = self._next_id
+                self._next_id += 1
+                self._index.add_with_ids(vector, np.array([vector_id], dtype=np.int64))
+                self._keys_by_id[vector_id] = key
+            self._entries[key] = (value, time.time() + self.ttl_seconds, vector_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "semantic": self._index is not None,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def enabled() -> bool:
+    return RESPONSE_CACHE_ENABLED and not cache_bypass.get()
+
+
+# Chat answers (per user) match semantically; tool results only by normalized query
+chat_cache = ResponseCache("chat", RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_SIMILARITY)
+tool_cache = ResponseCache("tools", TOOL_CACHE_TTL_SECONDS, TOOL_CACHE_MAX_ENTRIES)
+# Vision answers by (image hash, normalized question)
+vision_cache = ResponseCache("vision", RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES)
+
+
+def stats() -> dict:
+    return {
+        "enabled": RESPONSE_CACHE_ENABLED,
+        "chat": chat_cache.snapshot(),
+        "tools": tool_cache.snapshot(),
+        "vision": vision_cache.snapshot(),
+    }
+
+
+# -------------------------------
+# Cached Tools
+# -------------------------------
+class CachedTool(BaseTool):
+    """
+    Wraps a tool so results are served from `tool_cache` by normalized
+    arguments (e.g. the same Wikipedia or search query asked twice).
+    """
+
+    inner: BaseTool
+
+    def __init__(self, inner: BaseTool, **kwargs):
+        super().__init__(
+            inner=inner, name=inner.name, description=inner.description,
+            args_schema=inner.args_schema, **kwargs
+        )
+
+    def _key(self, kwargs: dict) -> str:
+        return f"{self.name} " + " ".join(f"{k} {v}" for k, v in sorted(kwargs.items()))
+
+    def _run(self, **kwargs):
+        key = self._key(kwargs)
+        if enabled():
+            cached = tool_cache.get(key)
+            if cached is not None:
+                return cached
+        result = self.inner.invoke(kwargs)
+        if enabled():
+            tool_cache.put(key, result)
+        return result
+
+    async def _arun(self, **kwargs):
+        key = self._key(kwargs)
+        if enabled():
+            cached = tool_cache.get(key)
+            if cached is not None:
+                return cached
+        result = await self.inner.ainvoke(kwargs)
+        if enabled():
+            tool_cache.put(key, result)
+        return result
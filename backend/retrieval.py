@@ -0,0 +1,183 @@
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+
+import faiss
+import numpy as np
+
+from documents import document_store, _atomic_write
+from embeddings import embed_documents, EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE
+
+# -------------------------------
+# PDF Retrieval (chunk -> embed -> FAISS)
+# -------------------------------
+CHUNK_WORDS = int(os.getenv("PDF_CHUNK_WORDS", "180"))
+CHUNK_OVERLAP = int(os.getenv("PDF_CHUNK_OVERLAP", "30"))
+TOP_K = int(os.getenv("PDF_TOP_K", "8"))
+# Rough budget for excerpts sent to the model (~4 characters per token).
+CONTEXT_TOKENS = int(os.getenv("PDF_CONTEXT_TOKENS", "3000"))
+# Optional second pass: the small rerank model reorders the nearest
+# PDF_RERANK_CANDIDATES chunks before they are packed into the budget.
+PDF_RERANK = os.getenv("PDF_RERANK", "off").lower() in ("1", "on", "true", "yes")
+RERANK_CANDIDATES = int(os.getenv("PDF_RERANK_CANDIDATES", "16"))
+
+_SUMMARY_RE = re.compile(r"\b(summar|overview|tl;?dr|outline|key points)", re.I)
+_build_locks = {}        # doc_id -> [threading.Lock, users], dropped when the last user is done
+_build_locks_guard = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def chunk_page(page_no: int, text: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> list:
+    """
+    Split one page into overlapping word windows. Chunks never span pages,
+    so every chunk can cite its page number.
+    """
+    chunks = []
+    words = text.split()
+    for start in range(0, len(words), max(size - overlap, 1)):
+        chunks.append({"page": page_no, "text": " ".join(words[start:start + size])})
+        if start + size >= len(words):
+            break
+    return chunks
+
+
+def chunk_pages(pages, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> list:
+    return [c for page_no, text in enumerate(pages, start=1) for c in chunk_page(page_no, text, size, overlap)]
+
+
+class DocumentIndex:
+    """
+    FAISS inner-product index over one document's chunks.
+    """
+
+    def __init__(self, index, chunks: list):
+        self.index = index
+        self.chunks = chunks
+
+    @classmethod
+    def build(cls, pages) -> "DocumentIndex":
+        """
+        Index pages as they arrive from `pages` (any iterable): chunks are
+        embedded and added in batches while later pages are still parsing.
+        """
+        index, chunks, pending = None, [], []
+
+        def flush():
+            nonlocal index
+            vectors = embed_documents([c["text"] for c in pending])
+            if index is None:
+                index = faiss.IndexFlatIP(vectors.shape[1])
+            index.add(vectors)
+            chunks.extend(pending)
+            pending.clear()
+
+        for page_no, text in enumerate(pages, start=1):
+            pending.extend(chunk_page(page_no, text))
+            if len(pending) >= EMBEDDING_BATCH_SIZE:
+                flush()
+        if pending:
+            flush()
+        if index is None:
+            index = faiss.IndexFlatIP(embed_documents([""]).shape[1])
+        return cls(index, chunks)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        _atomic_write(os.path.join(directory, "chunks.json"), json.dumps(self.chunks).encode("utf-8"))
+        _atomic_write(os.path.join(directory, "index.faiss"), faiss.serialize_index(self.index).tobytes())
+
+    @classmethod
+    def load(cls, directory: str) -> "DocumentIndex":
+        with open(os.path.join(directory, "chunks.json"), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        with open(os.path.join(directory, "index.faiss"), "rb") as f:
+            index = faiss.deserialize_index(np.frombuffer(f.read(), dtype=np.uint8))
+        return cls(index, chunks)
+
+    def search(self, query: str, k: int = TOP_K) -> list:
+        if not self.chunks:
+            return []
+        k = min(k, len(self.chunks))
+        scores, ids = self.index.search(embed_documents([query]), k)
+        return [(float(s), int(i)) for s, i in zip(scores[0], ids[0]) if i >= 0]
+
+
+@lru_cache(maxsize=32)
+def get_index(doc_id: str) -> DocumentIndex:
+    """
+    Load the persisted index for a document, building (and persisting) it on
+    first use. Concurrent first requests for one document build it once.
+    """
+    model_tag = re.sub(r"[^A-Za-z0-9_.-]", "_", EMBEDDING_MODEL)
+    directory = os.path.join(document_store.artifact_dir(doc_id), f"faiss-{model_tag}")
+    with _build_locks_guard:
+        entry = _build_locks.setdefault(doc_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            if os.path.exists(os.path.join(directory, "index.faiss")):
+                return DocumentIndex.load(directory)
+            index = DocumentIndex.build(document_store.iter_page_texts(doc_id))
+            index.save(directory)
+            return index
+    finally:
+        with _build_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _build_locks[doc_id]
+
+
+def _pack(chunks: list, order: list, budget: int) -> list:
+    picked, used = [], 0
+    for i in order:
+        cost = estimate_tokens(chunks[i]["text"])
+        if used + cost > budget:
+            continue
+        picked.append(i)
+        used += cost
+    return sorted(picked)
+
+
+def is_summary_query(query: str) -> bool:
+    return bool(_SUMMARY_RE.search(query or ""))
+
+
+def candidates(doc_id: str, query: str, k: int = TOP_K, budget: int = CONTEXT_TOKENS) -> tuple:
+    """
+    (chunks, order): the document's chunks and the indices worth sending for
+    `query`, best first. Summary-style queries get chunks spread evenly across
+    the document instead of the nearest neighbours.
+    """
+    index = get_index(doc_id)
+    chunks = index.chunks
+    if not chunks:
+        return chunks, []
+
+    if is_summary_query(query):
+        per_chunk = max(estimate_tokens(c["text"]) for c in chunks)
+        n = max(1, min(len(chunks), budget // per_chunk))
+        order = [round(j * (len(chunks) - 1) / max(n - 1, 1)) for j in range(n)]
+    else:
+        order = [i for _, i in index.search(query, k)]
+    return chunks, order
+
+
+def excerpts(chunks: list, order: list, budget: int = CONTEXT_TOKENS) -> str:
+    """The chunks in `order` that fit `budget`, in document order with page labels."""
+    return "\n\n".join(
+        f"[Page {chunks[i]['page']}] {chunks[i]['text']}" for i in _pack(chunks, order, budget)
+    )
+
+
+def retrieve(doc_id: str, query: str, k: int = TOP_K, budget: int = CONTEXT_TOKENS) -> str:
+    """
+    Excerpts relevant to `query` within `budget` tokens, in document order and
+    labelled with page numbers.
+    """
+    chunks, order = candidates(doc_id, query, k, budget)
+    return excerpts(chunks, order, budget)
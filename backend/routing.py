@@ -0,0 +1,151 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from embeddings import embed_text, cached_embedding
+import metrics
+
+# -------------------------------
+# Tiered Fast-Path Router
+# -------------------------------
+# Tier 0 "explicit":   the endpoint already knows the node (/generate-image).
+# Tier 1 "attachment": an attached image/PDF decides the route outright.
+# Tier 2 "keyword":    explicit image-generation phrasing ("generate an image of ...").
+# Tier 3 "local":      nearest labelled example over hashed embeddings (a class
+#                      mean blurs short phrases like "hi" into noise).
+# Tier 4 "llm":        the structured router LLM, only for inputs the tiers above
+#                      can't call with confidence ("llm_error" if it fails).
+TIERS = ("explicit", "attachment", "keyword", "local", "llm", "llm_error")
+
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.15"))
+# The nearest example must be at least this similar before the local tier picks its class.
+# A low similarity to every class means "not sure", which is the LLM tier's call.
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "0.35"))
+
+_IMAGE_NOUNS = (
+    r"(image|images|picture|pictures|pic|photo|photos|drawing|painting|illustration|"
+    r"logo|artwork|portrait|wallpaper|sketch|poster|render|icon)"
+)
+# Only an imperative at the start of the message: "create a docker image" or
+# "make the art of cooking simple" mention pictures without asking for one.
+IMAGE_INTENT_PATTERNS = [
+    re.compile(r"^\s*generate image\s*:", re.I),
+    re.compile(
+        r"^\s*(please\s+)?(generate|create|draw|paint|sketch|render|design|make|produce|imagine)\s+"
+        r"(me\s+)?((an?|the|some|\d+)\s+)?" + _IMAGE_NOUNS + r"\b",
+        re.I,
+    ),
+    re.compile(
+        r"^\s*(please\s+)?(draw|paint|sketch)\s+(me\s+)?(an?|the|some)\s+"
+        r"(?!(comparison|conclusion|distinction|parallel|line|blank|lesson)s?\b)\w+",
+        re.I,
+    ),
+]
+# Questions ("how do I create an image in gimp?") are left to the later tiers
+QUESTION_RE = re.compile(
+    r"(\?\s*$)|^\s*(how|what|why|when|where|which|who|whom|whose|is|are|can|could|would|should|do|does|did)\b",
+    re.I,
+)
+
+EXAMPLES = {
+    "chatbot": [
+        "hi", "hello", "hey there", "salam", "good morning", "thanks a lot", "thank you",
+        "how are you", "what is python", "who is the founder of google",
+        "explain quantum physics", "search for the latest news", "tell me a joke",
+        "what's the weather today", "how do i reverse a list in python",
+        "summarize our conversation", "what did i ask before", "translate this to french",
+        "write an email to my manager", "give me tips for studying",
+        "what is the capital of france", "recommend a good book",
+        "compare python and javascript", "help me plan a trip",
+    ],
+    "image_generation": [
+        "generate an image of a sunset", "create a picture of mountains",
+        "draw a cat wearing a hat", "make a logo for my bakery",
+        "paint a portrait of a knight", "illustration of a dragon flying",
+        "render a futuristic city skyline", "design a poster for a concert",
+        "an artwork of a forest at night", "sketch a house by the lake",
+        "image of a robot playing guitar", "picture of a dog on the beach",
+        "wallpaper with neon colours", "photo realistic image of a car",
+    ],
+}
+
+counters = Counter()
+route_counts = Counter()
+
+
+@lru_cache(maxsize=1)
+def _examples():
+    """(labels, matrix): one row per labelled example, label by row."""
+    labels = [label for label, texts in EXAMPLES.items() for _ in texts]
+    matrix = np.stack([embed_text(t) for texts in EXAMPLES.values() for t in texts])
+    return labels, matrix
+
+
+def class_scores(text: str) -> dict:
+    """Per class, the cosine similarity of `text` to its nearest example."""
+    vec = cached_embedding(text.strip().lower())
+    labels, matrix = _examples()
+    scores = dict.fromkeys(EXAMPLES, 0.0)
+    if vec.any():
+        for label, score in zip(labels, matrix @ vec):
+            scores[label] = max(scores[label], float(score))
+    return scores
+
+
+def keyword_route(text: str):
+    if QUESTION_RE.search(text):
+        return None
+    if any(p.search(text) for p in IMAGE_INTENT_PATTERNS):
+        return "image_generation"
+    return None
+
+
+def local_route(text: str):
+    """
+    Nearest-example decision, or None when the best score is too low or the
+    margin over the other class too thin to trust.
+    """
+    ranked = sorted(class_scores(text).items(), key=lambda kv: kv[1], reverse=True)
+    (best, best_score), (_, runner_up) = ranked[0], ranked[1]
+    if best_score >= ROUTER_MIN_SCORE and best_score - runner_up >= ROUTER_MIN_MARGIN:
+        return best
+    return None
+
+
+def fast_route(text: str, has_image: bool = False, has_pdf: bool = False,
+               image_request: bool = False):
+    """
+    Try the cheap tiers in order. Returns (route, tier) or (None, None) when
+    the message needs the LLM router.
+    """
+    if image_request:
+        return "image_generation", "explicit"
+    if has_image:
+        return "vision", "attachment"
+    if has_pdf:
+        return "pdf", "attachment"
+    route = keyword_route(text)
+    if route:
+        return route, "keyword"
+    route = local_route(text)
+    if route:
+        return route, "local"
+    return None, None
+
+
+def record(route: str, tier: str):
+    counters[tier] += 1
+    route_counts[route] += 1
+    metrics.ROUTE_DECISIONS.inc(route=route, tier=tier, endpoint=metrics.current_endpoint.get())
+
+
+def stats() -> dict:
+    total = sum(counters.values())
+    return {
+        "tiers": {tier: counters[tier] for tier in TIERS},
+        "routes": dict(route_counts),
+        "llm_share": (counters["llm"] + counters["llm_error"]) / total if total else 0.0,
+    }
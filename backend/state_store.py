@@ -0,0 +1,189 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+
+# -------------------------------
+# Shared State Store
+# -------------------------------
+# Small key/value records and leases that every worker process has to agree
+# on: image job status (a job submitted on one worker is polled on another)
+# and the per-thread turn locks (thread_locks.py). Conversation state itself
+# lives in the checkpointer, and documents and images in their on-disk
+# content-addressed stores, so those only need CHECKPOINTER=sqlite and a data
+# directory every worker can see.
+#
+#   memory   one process (the default; uvicorn without --workers)
+#   sqlite   one file shared by every worker on the host (WAL mode)
+#
+# The interface maps onto Redis one-to-one (GET / SET PX / DEL, SET NX PX for
+# `acquire`, a compare-and-delete script for `release`), which is the backend
+# to add for workers spread over several hosts.
+STATE_STORE = os.getenv("STATE_STORE", "memory")                   # "memory" | "sqlite"
+STATE_STORE_PATH = os.getenv("STATE_STORE_PATH", "./data/state.sqlite")
+STATE_STORE_BUSY_TIMEOUT = float(os.getenv("STATE_STORE_BUSY_TIMEOUT", "5"))
+
+
+class StateStore(ABC):
+    """
+    JSON values by (namespace, key) with an optional TTL, plus leases: named
+    locks held by one owner until released or expired. Calls are blocking;
+    async callers run them with asyncio.to_thread.
+    """
+
+    backend = None
+    shared = False      # visible to other processes
+
+    @abstractmethod
+    def get(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, value, ttl: float = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take (or, for its current owner, extend) the lease `name` for `ttl` seconds."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def release(self, name: str, owner: str):
+        """Drop the lease `name` if `owner` still holds it."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemoryStateStore(StateStore):
+    backend = "memory"
+
+    def __init__(self):
+        self._values = {}       # (namespace, key) -> (value, expires_at or None)
+        self._leases = {}       # name -> (owner, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str):
+        with self._lock:
+            value, expires = self._values.get((namespace, key), (None, None))
+            if expires is not None and expires < time.time():
+                del self._values[(namespace, key)]
+                return None
+            return value
+
+    def put(self, namespace: str, key: str, value, ttl: float = None):
+        with self._lock:
+            # Stored as JSON so values behave as they would in a shared backend
+            self._values[(namespace, key)] = (json.loads(json.dumps(value)), time.time() + ttl if ttl else None)
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._values.pop((namespace, key), None)
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            holder, expires = self._leases.get(name, (None, 0))
+            if holder not in (None, owner) and expires > now:
+                return False
+            self._leases[name] = (owner, now + ttl)
+            return True
+
+    def release(self, name: str, owner: str):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == owner:
+                del self._leases[name]
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "values": len(self._values), "leases": len(self._leases)}
+
+
+class SqliteStateStore(StateStore):
+    """
+    State store in one SQLite file. WAL mode lets every worker on the host
+    read while one writes; writers wait up to STATE_STORE_BUSY_TIMEOUT.
+    """
+
+    backend = "sqlite"
+    shared = True
+
+    def __init__(self, path: str = STATE_STORE_PATH, busy_timeout: float = STATE_STORE_BUSY_TIMEOUT):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        # Autocommit: every statement, including the lease upsert, is its own transaction
+        self.conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+            "value TEXT NOT NULL, expires REAL, PRIMARY KEY (namespace, key))"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, "
+                          "expires REAL NOT NULL)")
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    def get(self, namespace: str, key: str):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires >= ?)",
+                (namespace, key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, namespace: str, key: str, value, ttl: float = None):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO kv (namespace, key, value, expires) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+                (namespace, key, json.dumps(value), now + ttl if ttl else None),
+            )
+            self._puts += 1
+            if self._puts % 100 == 0:
+                self.conn.execute("DELETE FROM kv WHERE expires < ?", (now,))
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+                (name, owner, now + ttl, now),
+            )
+            return cur.rowcount == 1
+
+    def release(self, name: str, owner: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def stats(self) -> dict:
+        with self._lock:
+            values = self.conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+            leases = self.conn.execute("SELECT COUNT(*) FROM leases WHERE expires >= ?", (time.time(),)).fetchone()[0]
+        return {"backend": self.backend, "path": self.path, "values": values, "leases": leases}
+
+
+def build_state_store(backend: str = None) -> StateStore:
+    """
+    Build the state store selected by `backend` (defaults to $STATE_STORE).
+    """
+    backend = backend or STATE_STORE
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        return SqliteStateStore()
+    raise ValueError(f"Unknown STATE_STORE backend: {backend!r}")
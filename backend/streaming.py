@@ -0,0 +1,73 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Server-Sent Events over LangGraph astream_events
+# -------------------------------
+# Nodes whose model tokens are forwarded to the client as they arrive.
+STREAMING_NODES = {"chatbot", "vision", "pdf"}
+# Nodes reported as a "route" event when the router hands off to them.
+ROUTE_NODES = {"chatbot", "vision", "pdf", "image_generation"}
+# Model calls tagged with this are internal (e.g. history summaries) and never streamed.
+INTERNAL_TAG = "internal"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def chunk_text(content) -> str:
+    """Text of a streamed message chunk (Gemini sends a list of parts)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            c if isinstance(c, str) else c.get("text", "")
+            for c in content
+            if isinstance(c, (str, dict))
+        )
+    return ""
+
+
+async def stream_graph(graph, inputs: dict, config: dict):
+    """
+    Run the graph and yield SSE frames: `start`, `route`, `token`,
+    `tool_start`/`tool_end`, then `done` with the final answer (or `error`).
+    The run is checkpointed under the config's thread_id exactly as
+    `graph.ainvoke` would be.
+    """
+    thread_id = config["configurable"]["thread_id"]
+    yield sse("start", {"thread_id": thread_id})
+
+    try:
+        async for event in graph.astream_events(inputs, config=config, version="v2"):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chain_start" and event["name"] in ROUTE_NODES and node == event["name"]:
+                yield sse("route", {"node": node})
+            elif kind == "on_chat_model_stream" and node in STREAMING_NODES \
+                    and INTERNAL_TAG not in event.get("tags", ()):
+                text = chunk_text(event["data"]["chunk"].content)
+                if text:
+                    yield sse("token", {"node": node, "text": text})
+            elif kind == "on_tool_start":
+                yield sse("tool_start", {"tool": event["name"], "input": event["data"].get("input")})
+            elif kind == "on_tool_end":
+                yield sse("tool_end", {"tool": event["name"]})
+
+        state = await graph.aget_state(config)
+        values = state.values
+        yield sse("done", {
+            "response": values["messages"][-1].content,
+            "generated_image_url": values.get("generated_image_url", ""),
+            "thread_id": thread_id,
+        })
+    except Exception as e:
+        logger.error(f"Error while streaming thread {thread_id}: {str(e)}")
+        yield sse("error", {"detail": str(e), "thread_id": thread_id})
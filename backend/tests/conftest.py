@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+# Every test runs offline: stub models (benchmarks/stubs.py), in-memory
+# checkpoints and throwaway data directories. Set before the app modules are
+# imported, since they read their settings at import.
+_data = tempfile.mkdtemp(prefix="chatbot-tests-")
+for name in ("GOOGLE_API_KEY", "GROQ_API_KEY"):
+    os.environ.pop(name, None)
+os.environ.update({
+    "CHECKPOINTER": "memory",
+    "STATE_STORE": "memory",
+    "AUTH_REQUIRED": "off",
+    "DOCUMENT_STORE_DIR": os.path.join(_data, "documents"),
+    "VISION_CACHE_DIR": os.path.join(_data, "vision"),
+    "IMAGE_CACHE_DIR": os.path.join(_data, "images"),
+    "PROFILE_SAMPLE_RATE": "0",
+})
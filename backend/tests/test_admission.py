@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from admission import Rejected, Scheduler
+
+PRIORITIES = {"chat": 0, "image": 1}
+
+
+def make_scheduler(**kwargs):
+    settings = dict(enabled=True, max_concurrent=1, user_concurrent=0, queue_size=10, max_wait=5,
+                    user_rate=None, global_rate=None, priorities=PRIORITIES)
+    return Scheduler(**{**settings, **kwargs})
+
+
+def test_waiters_start_in_priority_order():
+    scheduler = make_scheduler()
+    started = []
+
+    async def request(kind, name):
+        ticket = await scheduler.acquire(kind)
+        started.append(name)
+        await asyncio.sleep(0.01)
+        ticket.release()
+
+    async def main():
+        first = await scheduler.acquire("chat")
+        tasks = [asyncio.create_task(request(kind, name))
+                 for kind, name in [("image", "image-1"), ("chat", "chat-1"), ("image", "image-2"), ("chat", "chat-2")]]
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["waiting"] == 4
+        first.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert started == ["chat-1", "chat-2", "image-1", "image-2"]
+
+
+def test_full_queue_displaces_lower_priority():
+    scheduler = make_scheduler(queue_size=1)
+
+    async def main():
+        ticket = await scheduler.acquire("chat")
+        image = asyncio.create_task(scheduler.acquire("image"))
+        await asyncio.sleep(0)
+        chat = asyncio.create_task(scheduler.acquire("chat"))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as e:
+            await image
+        assert e.value.status_code == 503
+        # Equal or lower priority doesn't displace: it is turned away
+        with pytest.raises(Rejected):
+            await scheduler.acquire("image")
+        ticket.release()
+        (await chat).release()
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_per_user_cap_lets_other_users_through():
+    scheduler = make_scheduler(max_concurrent=3, user_concurrent=1)
+
+    async def main():
+        alice = await scheduler.acquire("chat", "alice")
+        alice_again = asyncio.create_task(scheduler.acquire("chat", "alice"))
+        await asyncio.sleep(0)
+        assert not alice_again.done()
+        # Bob is not held up behind Alice's queued request
+        bob = await asyncio.wait_for(scheduler.acquire("chat", "bob"), 1)
+        assert scheduler.in_flight == 2
+        alice.release()
+        (await asyncio.wait_for(alice_again, 1)).release()
+        bob.release()
+        assert scheduler.in_flight == 0 and scheduler.stats()["waiting"] == 0
+
+    asyncio.run(main())
+
+
+def test_wait_times_out():
+    scheduler = make_scheduler(max_wait=0.05)
+
+    async def main():
+        ticket = await scheduler.acquire("chat")
+        with pytest.raises(Rejected) as e:
+            await scheduler.acquire("chat")
+        assert e.value.status_code == 503
+        assert scheduler.stats()["waiting"] == 0
+        ticket.release()
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_timeout_after_displacement_reports_the_rejection(monkeypatch):
+    """A waiter displaced just as its wait runs out gets its 503, not an error from the queue."""
+    scheduler = make_scheduler(queue_size=1)
+
+    async def timed_out(awaitable, timeout):
+        awaitable.cancel()
+        raise asyncio.TimeoutError
+
+    async def main():
+        ticket = await scheduler.acquire("chat")
+        waiter = scheduler._enqueue("image", None, PRIORITIES["image"])
+        scheduler._waiting.remove(waiter)
+        waiter.future.set_exception(Rejected(503, "displaced", 1))
+        monkeypatch.setattr(asyncio, "wait_for", timed_out)
+        with pytest.raises(Rejected) as e:
+            await scheduler._wait(waiter)
+        assert str(e.value) == "displaced"
+        ticket.release()
+
+    asyncio.run(main())
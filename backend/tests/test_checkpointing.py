@@ -0,0 +1,73 @@
+import operator
+import time
+from typing import Annotated, TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from checkpointing import BoundedInMemorySaver, PersistentSqliteSaver
+
+
+class Counter(TypedDict):
+    steps: Annotated[list, operator.add]
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(Counter)
+    graph.add_node("step", lambda state: {"steps": [len(state["steps"])]})
+    graph.add_edge(START, "step")
+    graph.add_edge("step", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def run_turns(graph, thread_id, turns):
+    config = {"configurable": {"thread_id": thread_id}}
+    for _ in range(turns):
+        state = graph.invoke({"steps": []}, config)
+    return state
+
+
+def test_memory_saver_keeps_last_checkpoints():
+    saver = BoundedInMemorySaver(keep_last=2)
+    state = run_turns(build_graph(saver), "t", 5)
+    # Every turn still resumes from the latest checkpoint
+    assert state["steps"] == [0, 1, 2, 3, 4]
+    assert len(saver.storage["t"][""]) == 2
+    # Only blobs the kept checkpoints refer to are left
+    live = {(channel, version) for saved in saver.list({"configurable": {"thread_id": "t"}})
+            for channel, version in saved.checkpoint["channel_versions"].items()}
+    assert {(k[2], k[3]) for k in saver.blobs if k[0] == "t"} <= live
+
+
+def test_memory_saver_evicts_least_recently_used_threads():
+    saver = BoundedInMemorySaver(max_threads=2)
+    graph = build_graph(saver)
+    for thread_id in ("a", "b"):
+        run_turns(graph, thread_id, 1)
+    saver.get_tuple({"configurable": {"thread_id": "a"}})     # "a" is now the most recent
+    run_turns(graph, "c", 1)
+    assert set(saver.storage) == {"a", "c"}
+    assert saver.evictions == 1
+    assert not any(k[0] == "b" for k in saver.blobs)
+
+
+def test_memory_saver_drops_idle_threads():
+    saver = BoundedInMemorySaver(ttl_seconds=0.05)
+    graph = build_graph(saver)
+    run_turns(graph, "idle", 1)
+    time.sleep(0.1)
+    assert saver.get_tuple({"configurable": {"thread_id": "idle"}}) is None
+    assert "idle" not in saver.storage
+    # The thread starts over
+    assert run_turns(graph, "idle", 1)["steps"] == [0]
+
+
+def test_sqlite_saver_prunes_and_expires(tmp_path):
+    saver = PersistentSqliteSaver.from_path(str(tmp_path / "checkpoints.sqlite"), keep_last=2, ttl_seconds=60)
+    graph = build_graph(saver)
+    assert run_turns(graph, "t", 5)["steps"] == [0, 1, 2, 3, 4]
+    assert saver.stats()["checkpoints"] == 2
+
+    saver.ttl_seconds = 0
+    time.sleep(0.01)
+    assert saver.evict_expired() == 1
+    assert saver.stats()["threads"] == 0 and saver.stats()["checkpoints"] == 0
@@ -0,0 +1,43 @@
+import asyncio
+
+from admission import current_user
+from coalescing import SingleFlight
+
+
+def test_same_question_from_two_users_runs_twice():
+    flight = SingleFlight()
+    runs = []
+
+    async def ask(user):
+        current_user.set(user)
+        key = flight.key("chat", message="What is the capital of France?")
+
+        async def execute():
+            runs.append(user)
+            await asyncio.sleep(0.05)
+            return f"answer for {user}"
+
+        return await flight.do("chat", key, execute)
+
+    async def main():
+        return await asyncio.gather(ask("alice@example.com"), ask("bob@example.com"), ask("alice@example.com"))
+
+    alice, bob, alice_again = asyncio.run(main())
+    assert sorted(runs) == ["alice@example.com", "bob@example.com"]
+    assert alice == ("answer for alice@example.com", False)
+    assert bob == ("answer for bob@example.com", False)
+    assert alice_again == ("answer for alice@example.com", True)
+
+
+def test_keys_differ_per_user():
+    flight = SingleFlight()
+
+    def key_for(user):
+        token = current_user.set(user)
+        try:
+            return flight.key("chat", message="hi")
+        finally:
+            current_user.reset(token)
+
+    assert key_for("alice@example.com") != key_for("bob@example.com")
+    assert key_for(None) == key_for(None)
@@ -0,0 +1,67 @@
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import context
+
+
+def turn(i, words=10, tools=False):
+    question = HumanMessage(content=f"question {i} " + "word " * words, id=uuid.uuid4().hex)
+    answer = AIMessage(content=f"answer {i} " + "word " * words, id=uuid.uuid4().hex)
+    if not tools:
+        return [question, answer]
+    call = AIMessage(content="", id=uuid.uuid4().hex,
+                     tool_calls=[{"name": "wikipedia", "args": {"query": "x"}, "id": f"call-{i}"}])
+    result = ToolMessage(content="tool output " * 50, tool_call_id=f"call-{i}", id=uuid.uuid4().hex)
+    return [question, call, result, answer]
+
+
+def thread(n, **kwargs):
+    return [m for i in range(n) for m in turn(i, **kwargs)]
+
+
+def settings(**overrides):
+    return context.settings_for("text", {"strategy": "summarize", "keep_turns": 3, "max_tokens": 6000, **overrides})
+
+
+def test_keeps_recent_turns_and_folds_older_ones():
+    messages = thread(6)
+    view = context.plan(messages, settings=settings())
+    assert [m.content for m in view["recent"]] == [m.content for m in messages[-6:]]
+    assert [m.content for m in view["to_fold"]] == [m.content for m in messages[:6]]
+    assert view["fold_through"] == messages[5].id
+
+
+def test_waits_to_fold_until_enough_turns_are_old():
+    # One turn past the window, and it fits the budget: nothing to fold yet
+    messages = thread(4)
+    view = context.plan(messages, settings=settings())
+    assert len(view["recent"]) == len(messages) and not view["to_fold"]
+
+
+def test_folded_turns_are_not_folded_again():
+    messages = thread(8)
+    first = context.plan(messages, settings=settings())
+    again = context.plan(messages, "summary", first["fold_through"], settings=settings())
+    assert not again["to_fold"]
+    assert [m.content for m in again["recent"]] == [m.content for m in messages[-6:]]
+
+
+def test_token_budget_drops_older_turns():
+    messages = thread(3, words=400)
+    view = context.plan(messages, settings=settings(max_tokens=700, strategy="window"))
+    assert [m.content for m in view["recent"]] == [m.content for m in messages[-2:]]
+
+
+def test_earlier_tool_traffic_is_dropped_but_the_current_loop_is_kept():
+    messages = thread(2, tools=True)[:-1]       # second turn still waiting for its answer
+    view = context.plan(messages, settings=settings())
+    kinds = [type(m).__name__ for m in view["recent"]]
+    assert kinds == ["HumanMessage", "AIMessage", "HumanMessage", "AIMessage", "ToolMessage"]
+    assert view["recent"][-2].tool_calls
+
+
+def test_full_strategy_sends_everything():
+    messages = thread(10)
+    view = context.plan(messages, settings=settings(strategy="full"))
+    assert len(view["recent"]) == len(messages) and not view["to_fold"]
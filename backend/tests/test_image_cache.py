@@ -0,0 +1,40 @@
+import os
+import time
+
+from image_jobs import ImageCache
+
+
+def put(cache, key, size=100):
+    cache.put(key, b"x" * size, "image/png", {"prompt": key})
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=300)
+    for key in ("aa1", "bb2", "cc3"):
+        put(cache, key)
+    cache.touch("aa1")
+    put(cache, "dd4")
+    assert not cache.exists("bb2") and not os.path.exists(cache.path("bb2") + ".json")
+    assert all(cache.exists(k) for k in ("aa1", "cc3", "dd4"))
+    assert cache.snapshot() == {"images": 3, "bytes": 300, "max_bytes": 300, "evictions": 1}
+
+
+def test_replacing_an_image_counts_its_size_once(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=1000)
+    put(cache, "aa1", 100)
+    put(cache, "aa1", 200)
+    assert cache.snapshot()["bytes"] == 200
+
+
+def test_lru_order_survives_a_restart(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=300)
+    for key in ("aa1", "bb2", "cc3"):
+        put(cache, key)
+        time.sleep(0.01)
+    cache.touch("aa1")
+
+    restarted = ImageCache(str(tmp_path), max_bytes=300)
+    assert restarted.snapshot()["bytes"] == 300
+    put(restarted, "dd4")
+    assert not restarted.exists("bb2")
+    assert restarted.exists("aa1")
@@ -0,0 +1,32 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks import stubs
+from benchmarks.bench_message_deltas import check_deltas
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    return stubs.install(latency=0, router_latency=0)
+
+
+def test_nodes_return_message_deltas(graphs):
+    assert asyncio.run(check_deltas(graphs, 200)) == []
+
+
+def test_turns_do_not_duplicate_history(graphs):
+    config = {"configurable": {"thread_id": "test-deltas"}}
+
+    async def turns(n):
+        graph = graphs.get_graph()
+        for i in range(n):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"turn {i}")], "cache_enabled": False},
+                                config=config)
+        return (await graph.aget_state(config)).values["messages"]
+
+    messages = asyncio.run(turns(3))
+    assert len(messages) == 6
+    assert [n for n in Counter(m.id for m in messages).values() if n > 1] == []
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from benchmarks.stubs import StubAPIError
+from model_pool import MODEL_BACKOFF_BASE, Backend, ModelPool
+
+
+def backend(name, weight=1.0, latency=0.0, status=None, calls=None, retry_after=None):
+    """A backend answering `name` after `latency` seconds, or failing with `status`."""
+    async def call(input):
+        if calls is not None:
+            calls.append(name)
+        await asyncio.sleep(latency)
+        if status:
+            error = StubAPIError(status)
+            if retry_after is not None:
+                error.response = type("Response", (), {"headers": {"retry-after": retry_after}})()
+            raise error
+        return name
+
+    return Backend(name, RunnableLambda(lambda input: name, afunc=call), weight)
+
+
+def test_fails_over_and_cools_down():
+    calls = []
+    pool = ModelPool("text", [backend("a", 2, status=429, calls=calls), backend("b", 1, calls=calls)], hedge="off")
+    assert asyncio.run(pool.ainvoke("hi")) == "b"
+    assert calls == ["a", "b"]
+    assert pool.stats()["backends"]["a"]["cooling_down"]
+    # While "a" cools down, calls go straight to "b"
+    assert asyncio.run(pool.ainvoke("hi")) == "b"
+    assert calls == ["a", "b", "b"]
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+    pool = ModelPool("text", [backend("a", 2, status=400, calls=calls), backend("b", 1, calls=calls)], hedge="off")
+    with pytest.raises(StubAPIError):
+        asyncio.run(pool.ainvoke("hi"))
+    assert calls == ["a"]
+
+
+def test_backoff_grows_and_honours_retry_after():
+    b = Backend("a", None)
+    delays = []
+    for _ in range(3):
+        b.cool_down(StubAPIError(429))
+        delays.append(b.cooldown_until - time.monotonic())
+    for n, delay in enumerate(delays):
+        assert MODEL_BACKOFF_BASE * 2 ** n * 0.5 - 0.01 <= delay <= MODEL_BACKOFF_BASE * 2 ** n
+
+    error = StubAPIError(429)
+    error.response = type("Response", (), {"headers": {"retry-after": "7"}})()
+    b.cool_down(error)
+    assert 6.9 < b.cooldown_until - time.monotonic() <= 7
+
+
+def test_slow_call_is_hedged_to_the_next_backend():
+    pool = ModelPool("text", [backend("slow", 2, latency=1.0), backend("fast", 1, latency=0.01)], hedge="0.05")
+    start = time.perf_counter()
+    assert asyncio.run(pool.ainvoke("hi")) == "fast"
+    assert time.perf_counter() - start < 0.5
+    stats = pool.stats()["backends"]
+    assert stats["fast"]["hedges_started"] == 1 and stats["fast"]["hedges_won"] == 1
+
+
+def test_failed_hedge_retries_on_a_backend_that_took_no_part():
+    """Both hedged backends failed; the retry skips them even once their cooldown is over."""
+    calls = []
+    pool = ModelPool("text", [
+        backend("a", 3, latency=0.1, status=503, calls=calls, retry_after="0"),
+        backend("b", 2, latency=0.01, status=503, calls=calls, retry_after="0"),
+        backend("c", 1, calls=calls),
+    ], hedge="0.05")
+    assert asyncio.run(pool.ainvoke("hi")) == "c"
+    assert calls == ["a", "b", "c"]
+
+
+def test_never_hedges_without_the_streaming_handler_class(monkeypatch):
+    import model_pool
+
+    assert not model_pool.streams_tokens(None)
+    monkeypatch.setattr(model_pool, "_StreamingCallbackHandler", None)
+    assert model_pool.streams_tokens(None)
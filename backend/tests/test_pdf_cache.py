@@ -0,0 +1,31 @@
+import os
+
+from benchmarks.fixtures import make_pdf
+from pdf_extraction import PageCache, iter_pages
+
+
+def write_pdf(tmp_path, pages):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(make_pdf(pages, words_per_page=20))
+    return str(path)
+
+
+def test_partial_cache_is_re_extracted(tmp_path):
+    path = write_pdf(tmp_path, 4)
+    cache = PageCache(str(tmp_path / "cache"))
+    first = list(iter_pages(path, "doc", cache))
+    assert cache.page_count("doc") == 4
+
+    os.remove(os.path.join(cache._dir("doc"), "2.txt"))
+    assert list(iter_pages(path, "doc", cache)) == first
+    assert cache.get("doc", 2) == first[2]
+
+
+def test_writes_leave_no_temp_files(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put("doc", 0, "page one")
+    cache.put("doc", 0, "page one, again")
+    cache.mark_complete("doc", 1)
+    assert sorted(os.listdir(cache._dir("doc"))) == ["0.txt", "count"]
+    assert cache.get("doc", 0) == "page one, again"
+    assert cache.page_count("doc") == 1
@@ -0,0 +1,39 @@
+import pytest
+
+import routing
+
+
+@pytest.mark.parametrize("text", ["hi", "hello", "thanks", "Thanks!", "good morning", "tell me a joke"])
+def test_small_talk_resolves_locally(text):
+    assert routing.fast_route(text) == ("chatbot", "local")
+
+
+@pytest.mark.parametrize("text", [
+    "generate an image of a red fox in the snow",
+    "draw a dragon sleeping on a pile of gold",
+    "Generate image: a cat astronaut",
+    "please paint a portrait of my dog",
+])
+def test_image_imperatives_use_the_keyword_tier(text):
+    assert routing.fast_route(text) == ("image_generation", "keyword")
+
+
+@pytest.mark.parametrize("text", [
+    "How do I create a docker image?",
+    "make the art of cooking simple",
+    "draw a comparison between rust and go",
+    "can you explain what an svg icon is",
+])
+def test_image_words_in_chat_are_not_image_generation(text):
+    route, _ = routing.fast_route(text)
+    assert route != "image_generation"
+
+
+def test_unsure_messages_go_to_the_llm():
+    assert routing.fast_route("show me what a cyberpunk tokyo street would look like") == (None, None)
+
+
+def test_explicit_and_attachment_tiers_come_first():
+    assert routing.fast_route("hi", image_request=True) == ("image_generation", "explicit")
+    assert routing.fast_route("draw a cat", has_image=True) == ("vision", "attachment")
+    assert routing.fast_route("hi", has_pdf=True) == ("pdf", "attachment")
@@ -0,0 +1,30 @@
+import asyncio
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from auth import models
+from auth.auth_routes import create_user
+from auth.database import _create_schema, build_engine
+
+
+def test_concurrent_signups_create_one_user(tmp_path):
+    async def main():
+        engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+        sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        async with engine.begin() as connection:
+            await connection.run_sync(_create_schema)
+
+        async def signup(i):
+            async with sessions() as db:
+                return await create_user(db, f"user{i}", "race@example.com", "hash")
+
+        results = await asyncio.gather(*(signup(i) for i in range(8)))
+        async with sessions() as db:
+            count = await db.scalar(select(func.count()).select_from(models.User))
+        await engine.dispose()
+        return results, count
+
+    results, count = asyncio.run(main())
+    assert results.count(True) == 1
+    assert count == 1
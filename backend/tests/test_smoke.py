@@ -0,0 +1,24 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_suite import SCENARIOS
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_smoke(scenario, tmp_path):
+    """Each load-test scenario serves its requests without errors (bench_suite --smoke, one small cell)."""
+    output = tmp_path / "results.json"
+    run = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_suite", "--smoke", "--scenarios", scenario,
+         "--concurrency", "2", "--history", "0", "--requests", "6", "--output", str(output)],
+        cwd=BACKEND, capture_output=True, text=True, timeout=300,
+    )
+    assert run.returncode == 0, run.stdout + run.stderr
+    rows = json.loads(output.read_text())["results"]
+    assert rows and all(row["errors"] == 0 and row["requests"] for row in rows)
@@ -0,0 +1,53 @@
+import asyncio
+import uuid
+from typing import Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from benchmarks import stubs
+from registry import registry
+from tool_executor import TOOL_MAX_ITERATIONS
+
+
+class ToolHungryModel(stubs.StubChatModel):
+    """Calls a search tool whenever it may; records what each call was given."""
+
+    tool_choice: Optional[str] = None
+    calls: list = []
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tool_choice": kwargs.get("tool_choice", "auto")})
+
+    def _result(self, messages=()) -> ChatResult:
+        self.calls.append((self.tool_choice, list(messages)))
+        if self.tool_choice == "none":
+            message = AIMessage(content="final answer")
+        else:
+            message = AIMessage(content="", tool_calls=[
+                {"name": "duckduckgo_results_json", "args": {"query": "python news"}, "id": uuid.uuid4().hex}])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def test_tool_loop_stops_at_the_cap():
+    graphs = stubs.install(latency=0, router_latency=0, tool_latency="0")
+    model = registry.override("text_model", ToolHungryModel(latency=0, calls=[]))
+    registry.reset("graph")
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+
+    async def run():
+        graph = registry.get("graph")
+        return await graph.ainvoke({"messages": [HumanMessage(content="search the latest python news")]}, config)
+
+    try:
+        state = asyncio.run(run())
+    finally:
+        registry.reset("graph", "text_model")
+
+    choices = [choice for choice, _ in model.calls]
+    assert choices == ["auto"] * TOOL_MAX_ITERATIONS + ["none"]
+    # The final call still sees the turn's tool calls and results, with the tools bound
+    final_messages = model.calls[-1][1]
+    assert sum(isinstance(m, ToolMessage) for m in final_messages) == TOOL_MAX_ITERATIONS
+    assert state["messages"][-1].content == "final answer"
+    assert graphs.tool_rounds(state["messages"]) == TOOL_MAX_ITERATIONS
@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.fixtures import make_image
+from vision_images import ImageRejected, VisionImageStore
+
+
+def make_store(tmp_path, handler, resolve):
+    store = VisionImageStore(str(tmp_path))
+    store.transport = httpx.MockTransport(handler)
+    store.resolve = resolve
+    return store
+
+
+def test_connects_to_the_checked_address(tmp_path):
+    """A second, different DNS answer can't redirect the connection: it goes to the checked IP."""
+    answers = iter([["93.184.216.34"], ["127.0.0.1"]])
+    seen = []
+
+    async def rebinding_resolver(host, port):
+        return next(answers)
+
+    async def handler(request):
+        seen.append((request.url.host, request.headers["host"]))
+        return httpx.Response(200, content=make_image(1, 64, 64), headers={"content-type": "image/png"})
+
+    store = make_store(tmp_path, handler, rebinding_resolver)
+    data = asyncio.run(store._fetch("http://images.example.com/cat.png"))
+    assert data
+    assert seen == [("93.184.216.34", "images.example.com")]
+
+
+def test_private_hosts_are_refused(tmp_path):
+    async def handler(request):
+        raise AssertionError("no request should reach the network")
+
+    async def private_resolver(host, port):
+        return ["169.254.169.254"]
+
+    store = make_store(tmp_path, handler, private_resolver)
+    with pytest.raises(ImageRejected) as e:
+        asyncio.run(store._fetch("http://metadata.example.com/latest"))
+    assert e.value.status_code == 403
+
+
+def test_redirect_hops_are_checked(tmp_path):
+    async def resolver(host, port):
+        return ["10.0.0.5"] if host == "internal.example.com" else ["93.184.216.34"]
+
+    async def handler(request):
+        assert request.url.host == "93.184.216.34"
+        return httpx.Response(302, headers={"location": "http://internal.example.com/admin"})
+
+    store = make_store(tmp_path, handler, resolver)
+    with pytest.raises(ImageRejected) as e:
+        asyncio.run(store._fetch("http://images.example.com/cat.png"))
+    assert e.value.status_code == 403
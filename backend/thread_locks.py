@@ -0,0 +1,109 @@
+import asyncio
+import contextlib
+import logging
+import os
+import uuid
+
+from registry import registry
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Per-thread turn locks
+# -------------------------------
+# Two turns on the same thread_id running at once both resume from the same
+# checkpoint and the later write silently drops the other's messages. With
+# THREAD_LOCKS on, a turn waits (up to THREAD_LOCK_TIMEOUT seconds) for the
+# thread's previous turn to finish. Within a process that is an asyncio.Lock;
+# with a shared state store it is also a lease in the store, so the turn
+# waits for a turn running on another worker too. The lease is renewed while
+# the turn runs and expires THREAD_LOCK_TTL seconds after a worker dies.
+THREAD_LOCKS = os.getenv("THREAD_LOCKS", "on") == "on"
+THREAD_LOCK_TIMEOUT = float(os.getenv("THREAD_LOCK_TIMEOUT", "60"))
+THREAD_LOCK_TTL = float(os.getenv("THREAD_LOCK_TTL", "30"))
+
+
+class ThreadBusy(Exception):
+    """Another turn on the thread did not finish within the lock timeout."""
+
+
+class ThreadLocks:
+    def __init__(self, enabled: bool = THREAD_LOCKS, timeout: float = THREAD_LOCK_TIMEOUT,
+                 ttl: float = THREAD_LOCK_TTL):
+        self.enabled = enabled
+        self.timeout = timeout
+        self.ttl = ttl
+        self._locks = {}        # thread_id -> [asyncio.Lock, users]
+        self.stats_counts = {"acquired": 0, "waited": 0, "timeouts": 0}
+
+    def _local(self, thread_id: str) -> list:
+        entry = self._locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        return entry
+
+    def _unref(self, thread_id: str, entry: list):
+        entry[1] -= 1
+        if not entry[1]:
+            del self._locks[thread_id]
+
+    async def _lease(self, store, name: str, owner: str, deadline: float):
+        delay = 0.01
+        loop = asyncio.get_running_loop()
+        while not await asyncio.to_thread(store.acquire, name, owner, self.ttl):
+            if loop.time() >= deadline:
+                raise asyncio.TimeoutError
+            await asyncio.sleep(min(delay, max(0.0, deadline - loop.time())))
+            delay = min(delay * 2, 0.5)
+
+    async def _renew(self, store, name: str, owner: str):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            if not await asyncio.to_thread(store.acquire, name, owner, self.ttl):
+                logger.warning(f"⚠️ Lost the lease on {name}", extra={"lease": name})
+                return
+
+    @contextlib.asynccontextmanager
+    async def hold(self, thread_id: str):
+        """Run the body as the only turn on `thread_id`; raises ThreadBusy on timeout."""
+        if not self.enabled:
+            yield
+            return
+
+        store = registry.get("state_store")
+        entry = self._local(thread_id)
+        lock = entry[0]
+        deadline = asyncio.get_running_loop().time() + self.timeout
+        name, owner = f"thread:{thread_id}", f"{os.getpid()}:{uuid.uuid4().hex}"
+        renewer = None
+        try:
+            if entry[1] > 1:
+                self.stats_counts["waited"] += 1
+            try:
+                await asyncio.wait_for(lock.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.stats_counts["timeouts"] += 1
+                raise ThreadBusy(f"Another turn on thread {thread_id} is still running.")
+            try:
+                if store.shared:
+                    try:
+                        await self._lease(store, name, owner, deadline)
+                    except asyncio.TimeoutError:
+                        self.stats_counts["timeouts"] += 1
+                        raise ThreadBusy(f"Another turn on thread {thread_id} is still running.")
+                    renewer = asyncio.create_task(self._renew(store, name, owner))
+                self.stats_counts["acquired"] += 1
+                yield
+            finally:
+                if renewer is not None:
+                    renewer.cancel()
+                    await asyncio.to_thread(store.release, name, owner)
+                lock.release()
+        finally:
+            self._unref(thread_id, entry)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "held": sum(1 for lock, _ in self._locks.values() if lock.locked()),
+                **self.stats_counts}
+
+
+thread_locks = ThreadLocks()
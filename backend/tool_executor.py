@@ -0,0 +1,114 @@
+import asyncio
+import os
+import re
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from metrics import LatencyHistogram
+
+# -------------------------------
+# Parallel Tool Executor
+# -------------------------------
+# Runs every tool call of the model's last message concurrently, each under
+# its own deadline, and compresses results before they enter the history.
+# A slow or failing tool produces an error ToolMessage instead of holding up
+# (or failing) the whole turn.
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "15"))
+# Per-tool overrides, e.g. "duckduckgo_results_json=8,wikipedia=10"
+TOOL_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, seconds in (
+        item.split("=", 1) for item in os.getenv("TOOL_TIMEOUTS", "").split(",") if "=" in item
+    )
+}
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "4000"))
+# chatbot -> tools rounds allowed per turn; after that the model must answer
+TOOL_MAX_ITERATIONS = int(os.getenv("TOOL_MAX_ITERATIONS", "3"))
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_SPACE_RE = re.compile(r"[ \t]+")
+
+
+def compress(text: str, max_chars: int = TOOL_RESULT_MAX_CHARS) -> str:
+    """
+    Collapse whitespace, drop blank and repeated lines, and cut the result to
+    `max_chars` on a word boundary.
+    """
+    seen, lines = set(), []
+    for line in str(text).splitlines():
+        line = _SPACE_RE.sub(" ", line).strip()
+        if line and line not in seen:
+            seen.add(line)
+            lines.append(line)
+    text = "\n".join(lines)
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    cut = cut if cut > max_chars // 2 else max_chars
+    return f"{text[:cut]} … [truncated {len(text) - cut} chars]"
+
+
+def tool_rounds(messages: list) -> int:
+    """Tool-calling model messages in the current turn."""
+    rounds = 0
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            break
+        if isinstance(msg, AIMessage) and msg.tool_calls:
+            rounds += 1
+    return rounds
+
+
+class ToolExecutor:
+    """
+    Drop-in replacement for ToolNode: `await executor(state, config)` returns
+    {"messages": [ToolMessage, ...]} for the last AI message's tool calls.
+    """
+
+    def __init__(self, tools: list, default_timeout: float = TOOL_TIMEOUT_SECONDS,
+                 timeouts: dict = None, max_chars: int = TOOL_RESULT_MAX_CHARS):
+        self.tools = {tool.name: tool for tool in tools}
+        self.default_timeout = default_timeout
+        self.timeouts = TOOL_TIMEOUTS if timeouts is None else timeouts
+        self.max_chars = max_chars
+        self.latency = {name: LatencyHistogram(LATENCY_BUCKETS) for name in self.tools}
+        self.outcomes = {name: {"ok": 0, "timeout": 0, "error": 0} for name in self.tools}
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.default_timeout)
+
+    async def _run(self, call: dict, config: dict) -> ToolMessage:
+        name = call["name"]
+        tool = self.tools.get(name)
+        if tool is None:
+            return ToolMessage(
+                content=f"⚠️ Unknown tool {name!r}. Available: {', '.join(self.tools)}",
+                tool_call_id=call["id"], name=name, status="error",
+            )
+
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(tool.ainvoke(call["args"], config), self.timeout_for(name))
+            content, status, outcome = compress(result, self.max_chars), "success", "ok"
+        except asyncio.TimeoutError:
+            content = f"⚠️ {name} timed out after {self.timeout_for(name):g}s; answer without it."
+            status, outcome = "error", "timeout"
+        except Exception as e:
+            content, status, outcome = f"⚠️ {name} failed: {str(e) or type(e).__name__}", "error", "error"
+        self.latency[name].observe(time.perf_counter() - start)
+        self.outcomes[name][outcome] += 1
+        return ToolMessage(content=content, tool_call_id=call["id"], name=name, status=status)
+
+    async def __call__(self, state: dict, config: dict = None) -> dict:
+        last_msg = state["messages"][-1]
+        calls = getattr(last_msg, "tool_calls", None) or []
+        results = await asyncio.gather(*(self._run(call, config) for call in calls))
+        return {"messages": list(results)}
+
+    def stats(self) -> dict:
+        return {
+            name: {**self.outcomes[name], "timeout_s": self.timeout_for(name), "latency": self.latency[name].snapshot()}
+            for name in self.tools
+        }
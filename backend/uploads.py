@@ -0,0 +1,37 @@
+import json
+
+# -------------------------------
+# Upload Size Limits
+# -------------------------------
+# Multipart bodies are parsed by Starlette into SpooledTemporaryFiles (kept in
+# memory up to 1 MB, then spilled to disk), so uploads never sit in memory as
+# a whole. This middleware additionally rejects bodies whose declared
+# Content-Length is over the route's limit before any of it is read.
+MULTIPART_OVERHEAD = 64 * 1024   # boundaries, headers and small form fields
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware answering 413 for requests to `limits` paths whose
+    Content-Length exceeds the path's byte limit.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.limits:
+            limit = self.limits[scope["path"]] + MULTIPART_OVERHEAD
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if length.isdigit() and int(length) > limit:
+                body = json.dumps({"detail": f"Request body exceeds {limit} bytes."}).encode("utf-8")
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
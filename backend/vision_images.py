@@ -0,0 +1,276 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import ipaddress
+import json
+import os
+import socket
+from collections import OrderedDict
+
+import httpx
+from PIL import Image, UnidentifiedImageError
+
+from documents import _atomic_write
+
+# -------------------------------
+# Vision Input Pipeline
+# -------------------------------
+# Images are fetched once (bounded concurrency, size-capped), validated,
+# downscaled to VISION_MAX_SIDE and re-encoded, then stored under the SHA-256
+# of the original bytes. Messages carry only {"type": "image", "image_id"};
+# the processed bytes are encoded for the model at call time, and follow-up
+# questions reuse them instead of re-sending the full-size image. Only hosts
+# that resolve to public addresses are fetched, on every redirect hop too, and
+# the connection goes to the address that was checked (PinnedTransport), so a
+# user-supplied URL can't reach loopback, private or link-local services
+# (e.g. cloud metadata at 169.254.169.254) from the server, even by answering
+# the second DNS lookup differently.
+VISION_CACHE_DIR = os.getenv("VISION_CACHE_DIR", "./data/vision")
+VISION_MAX_BYTES = int(os.getenv("VISION_MAX_BYTES", str(20 * 1024 * 1024)))
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "1024"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+VISION_FETCH_CONCURRENCY = int(os.getenv("VISION_FETCH_CONCURRENCY", "8"))
+VISION_FETCH_TIMEOUT = float(os.getenv("VISION_FETCH_TIMEOUT", "20"))
+VISION_URL_CACHE_SIZE = int(os.getenv("VISION_URL_CACHE_SIZE", "4096"))
+VISION_MAX_IMAGES = int(os.getenv("VISION_MAX_IMAGES", "8"))     # per request
+
+ALLOWED_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif", "BMP": "image/bmp"}
+# Guard against decompression bombs before downscaling
+Image.MAX_IMAGE_PIXELS = int(os.getenv("VISION_MAX_PIXELS", str(64 * 1024 * 1024)))
+
+
+class ImageRejected(ValueError):
+    """The image could not be fetched, or isn't an acceptable image."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+async def resolve_host(host: str, port: int) -> list:
+    """Addresses `host` resolves to (IP literals resolve to themselves)."""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def process_image(source, max_side: int = VISION_MAX_SIDE) -> tuple:
+    """
+    Validate `source` (bytes or a binary file object) and return
+    (jpeg_bytes, meta). Images larger than `max_side` on either side are
+    downscaled; everything is re-encoded as JPEG (transparency flattened onto
+    white). CPU-bound: run it in a thread.
+    """
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            fmt = img.format
+            if fmt not in ALLOWED_FORMATS:
+                raise ImageRejected(f"Unsupported image type {fmt!r}.", 415)
+            img.seek(0)
+            original = img.size
+            img.draft("RGB", (max_side, max_side))   # cheap JPEG pre-scaling
+            img = img.convert("RGBA") if img.mode in ("P", "LA", "RGBA") else img.convert("RGB")
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+            if img.mode == "RGBA":
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+    except ImageRejected:
+        raise
+    except UnidentifiedImageError:
+        raise ImageRejected("Not a valid image.", 415)
+    except (Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ImageRejected(f"Not a valid image: {str(e) or type(e).__name__}", 415)
+    meta = {
+        "source_type": ALLOWED_FORMATS[fmt],
+        "source_size": list(original),
+
+        "size": list(img.size),
+        "bytes": out.tell(),
+        "mime": "image/jpeg",
+    }
+    return out.getvalue(), meta
+
+
+class PinnedTransport(httpx.AsyncBaseTransport):
+    """
+    Resolves each request's host once, refuses it unless every address is
+    public, then connects to the first checked address. The original host
+    stays in the Host header and, for https, in SNI and certificate checks.
+    Redirects are followed by the client, so every hop comes through here.
+    """
+
+    def __init__(self, resolve, inner: httpx.AsyncBaseTransport):
+        self.resolve = resolve
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        try:
+            addresses = await self.resolve(host, request.url.port or (443 if request.url.scheme == "https" else 80))
+        except (OSError, UnicodeError):
+            raise ImageRejected(f"Could not resolve image host {host!r}.")
+        if not addresses or not all(is_public_address(a) for a in addresses):
+            raise ImageRejected(f"Image host {host!r} is not a public address.", 403)
+        request.url = request.url.copy_with(host=addresses[0].split("%")[0])
+        if request.url.scheme == "https":
+            request.extensions = {**request.extensions, "sni_hostname": host}
+        return await self.inner.handle_async_request(request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class VisionImageStore:
+    """
+    Processed images keyed by the SHA-256 of the original bytes, plus an
+    in-memory URL -> image_id map so a URL is only fetched once.
+    """
+
+    def __init__(self, root: str = VISION_CACHE_DIR):
+        self.root = root
+        self._by_url = OrderedDict()
+        self._semaphore = None
+        self._client = None
+        self._loop = None
+        # Optional httpx transport and resolver overrides (benchmarks plug in local stubs)
+        self.transport = None
+        self.resolve = resolve_host
+        self.stats = {"fetched": 0, "url_hits": 0, "processed": 0, "store_hits": 0, "rejected": 0,
+                      "bytes_in": 0, "bytes_out": 0}
+
+    def _path(self, image_id: str, suffix: str) -> str:
+        return os.path.join(self.root, image_id[:2], image_id + suffix)
+
+    def exists(self, image_id: str) -> bool:
+        return os.path.exists(self._path(image_id, ".jpg"))
+
+    def get_bytes(self, image_id: str) -> bytes:
+        with open(self._path(image_id, ".jpg"), "rb") as f:
+            return f.read()
+
+    def metadata(self, image_id: str) -> dict:
+        with open(self._path(image_id, ".json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def data_url(self, image_id: str) -> str:
+        """The processed image as a data URL, built only when calling the model."""
+        return "data:image/jpeg;base64," + base64.b64encode(self.get_bytes(image_id)).decode("ascii")
+
+    def _store(self, image_id: str, source, size: int) -> str:
+        if self.exists(image_id):
+            self.stats["store_hits"] += 1
+            return image_id
+        processed, meta = process_image(source)
+        meta["source_bytes"] = size
+        _atomic_write(self._path(image_id, ".json"), json.dumps(meta).encode("utf-8"))
+        _atomic_write(self._path(image_id, ".jpg"), processed)
+        self.stats["processed"] += 1
+        self.stats["bytes_in"] += size
+        self.stats["bytes_out"] += len(processed)
+        return image_id
+
+    def put(self, data: bytes) -> str:
+        """Process and store raw image bytes (a no-op if already stored)."""
+        return self._store(hashlib.sha256(data).hexdigest(), data, len(data))
+
+    def put_file(self, fileobj, max_bytes: int = VISION_MAX_BYTES) -> str:
+        """
+        Like `put`, for an uploaded (spooled) file: hashed in chunks and
+        decoded straight from the file, never read into one bytes object.
+        """
+        digest, size = hashlib.sha256(), 0
+        fileobj.seek(0)
+        for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+            size += len(chunk)
+            if size > max_bytes:
+                raise ImageRejected(f"Image exceeds the {max_bytes} byte limit.", 413)
+            digest.update(chunk)
+        fileobj.seek(0)
+        try:
+            return self._store(digest.hexdigest(), fileobj, size)
+        except ImageRejected:
+            self.stats["rejected"] += 1
+            raise
+
+    def _ensure_client(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(VISION_FETCH_CONCURRENCY)
+            inner = self.transport or httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=VISION_FETCH_CONCURRENCY))
+            self._client = httpx.AsyncClient(
+                timeout=VISION_FETCH_TIMEOUT,
+                follow_redirects=True,
+                transport=PinnedTransport(self.resolve, inner),
+            )
+
+    async def _fetch(self, url: str) -> bytes:
+        self._ensure_client()
+        async with self._semaphore:
+            try:
+                async with self._client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    content_type = response.headers.get("content-type", "").split(";")[0].strip()
+                    if content_type and not content_type.startswith("image/") \
+                            and content_type != "application/octet-stream":
+                        raise ImageRejected(f"URL is not an image (content type {content_type!r}).", 415)
+                    declared = int(response.headers.get("content-length") or 0)
+                    if declared > VISION_MAX_BYTES:
+                        raise ImageRejected(f"Image is {declared} bytes; the limit is {VISION_MAX_BYTES}.", 413)
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) > VISION_MAX_BYTES:
+                            raise ImageRejected(f"Image exceeds the {VISION_MAX_BYTES} byte limit.", 413)
+            except httpx.HTTPError as e:
+                raise ImageRejected(f"Could not fetch image: {str(e) or type(e).__name__}")
+        self.stats["fetched"] += 1
+        return bytes(body)
+
+    async def prepare(self, image_url: str) -> str:
+        """
+        Return the image_id for an http(s) or data: URL, fetching and
+        processing it only the first time it is seen.
+        """
+        image_id = self._by_url.get(image_url)
+        if image_id and self.exists(image_id):
+            self._by_url.move_to_end(image_url)
+            self.stats["url_hits"] += 1
+            return image_id
+        try:
+            if image_url.startswith("data:"):
+                header, _, payload = image_url.partition(",")
+                try:
+                    data = base64.b64decode(payload, validate=True) if ";base64" in header else payload.encode()
+                except binascii.Error:
+                    raise ImageRejected("Invalid base64 image data.")
+                if len(data) > VISION_MAX_BYTES:
+                    raise ImageRejected(f"Image exceeds the {VISION_MAX_BYTES} byte limit.", 413)
+            elif image_url.startswith(("http://", "https://")):
+                data = await self._fetch(image_url)
+            else:
+                raise ImageRejected("image_url must be an http(s) or data: URL.")
+            image_id = await asyncio.to_thread(self.put, data)
+        except ImageRejected:
+            self.stats["rejected"] += 1
+            raise
+        if not image_url.startswith("data:"):
+            self._by_url[image_url] = image_id
+            while len(self._by_url) > VISION_URL_CACHE_SIZE:
+                self._by_url.popitem(last=False)
+        return image_id
+
+
+vision_images = VisionImageStore()
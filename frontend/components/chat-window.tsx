@@ -44,9 +44,9 @@ export function ChatWindow({ messages, updateConversationMessages }: ChatWindowP
       const responseText = data.response;
       
       // Look for image URL pattern in the response
-      const urlMatch = responseText.match(/https:\/\/pollinations\.ai\/p\/[^\s]+/);
+      const urlMatch = responseText.match(/\/generate-image\/images\/[A-Za-z0-9]+/);
       if (urlMatch) {
-        imageUrl = urlMatch[0];
+        imageUrl = `${API_BASE_URL}${urlMatch[0]}`;
       }
       
       return {
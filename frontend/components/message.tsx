@@ -20,7 +20,7 @@ export function Message({ message }: MessageProps) {
   // Function to extract clean text without the URL
   const getCleanText = (content: string) => {
     // Remove the image URL from the text
-    return content.replace(/https:\/\/pollinations\.ai\/p\/[^\s]+/, '').trim()
+    return content.replace(/\/generate-image\/images\/[A-Za-z0-9]+/, '').trim()
   }
 
   return (